@@ -1,8 +1,40 @@
+from django import forms
 from django.contrib import admin
-from .models import User, Chat, ChatMessage, Memory, Reminder
+from .models import (
+    User, BriefingState, Chat, ChatArchive, ChatMessage, Memory, MemoryBlob, Reminder, Job, ProviderResponse,
+    WorkspaceImport,
+)
 
 admin.site.register(User)
 admin.site.register(Chat)
 admin.site.register(ChatMessage)
-admin.site.register(Memory)
+admin.site.register(ChatArchive)
+admin.site.register(MemoryBlob)
 admin.site.register(Reminder)
+admin.site.register(Job)
+admin.site.register(ProviderResponse)
+admin.site.register(WorkspaceImport)
+admin.site.register(BriefingState)
+
+
+class MemoryForm(forms.ModelForm):
+    # The full text; the row only keeps its preview (see api.blobs).
+    snippet = forms.CharField(widget=forms.Textarea, required=False, strip=False)
+
+    class Meta:
+        model = Memory
+        fields = ['user', 'title', 'snippet', 'type', 'category']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial['snippet'] = self.instance.snippet
+
+    def save(self, commit=True):
+        self.instance.snippet = self.cleaned_data['snippet']
+        return super().save(commit)
+
+
+@admin.register(Memory)
+class MemoryAdmin(admin.ModelAdmin):
+    form = MemoryForm
@@ -1,5 +1,22 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _reinstall_search_index(sender, using, **kwargs):
+    # SQLite drops triggers when a migration rebuilds api_memory.
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from . import search
+
+    conn = connections[using]
+    if search.INDEX_MIGRATION in MigrationRecorder(conn).applied_migrations():
+        search.install_index(conn)
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
+
+        post_migrate.connect(_reinstall_search_index, sender=self)
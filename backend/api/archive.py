@@ -0,0 +1,118 @@
+"""
+Archival of idle conversations.
+
+``ChatMessage`` holds every message ever sent, so its table and indexes grow
+with all-time history while only recent chats are read. ``archive_chat``
+moves the messages of a chat idle for ``CHAT_ARCHIVE_AFTER_DAYS`` into one
+gzipped JSON blob in ``ChatArchive`` and sets ``Chat.archived``; ``restore``
+moves them back, with their ids and timestamps, the first time the chat is
+opened or written to again (the chat views call it when the flag is set).
+
+Each chat is archived in its own short transaction holding only that chat's
+row lock, so ``manage.py archive_chats`` can run alongside live traffic.
+Workspace exports read archived messages straight from the blobs.
+"""
+
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Chat, ChatArchive, ChatMessage
+
+FORMAT_VERSION = 1
+BATCH_SIZE = 1000
+COLUMNS = ('id', 'role', 'content', 'created_at')
+
+
+def pack(rows):
+    """Compress ``(id, role, content, created_at)`` rows; return ``(blob, raw size)``."""
+    raw = json.dumps({
+        'version': FORMAT_VERSION,
+        'messages': [[pk, role, content, created_at.isoformat()] for pk, role, content, created_at in rows],
+    }, ensure_ascii=False, separators=(',', ':')).encode()
+    return gzip.compress(raw), len(raw)
+
+
+def unpack(data):
+    """The ``(id, role, content, created_at)`` rows of an archive blob, in id order."""
+    payload = json.loads(gzip.decompress(data))
+    if payload.get('version') != FORMAT_VERSION:
+        raise ValueError(f'Unsupported chat archive format {payload.get("version")!r}.')
+    return [(pk, role, content, datetime.fromisoformat(created_at))
+            for pk, role, content, created_at in payload['messages']]
+
+
+def cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 90)
+    return timezone.now() - timedelta(days=days)
+
+
+def idle_chats(before):
+    """Chats not updated since ``before`` that still have messages in ``ChatMessage``."""
+    return Chat.objects.filter(updated_at__lt=before, archived=False).filter(
+        Exists(ChatMessage.objects.filter(chat=OuterRef('pk')))
+    )
+
+
+def archive_chat(chat_id, before):
+    """
+    Archive ``chat_id`` if it is still idle since ``before``. Returns the
+    ``ChatArchive`` written, or ``None`` if the chat was skipped.
+    """
+    with transaction.atomic():
+        # The row lock makes a concurrent write to this chat wait for us.
+        chat = Chat.objects.select_for_update().filter(pk=chat_id, updated_at__lt=before).first()
+        if chat is None:
+            return None
+        rows = list(ChatMessage.objects.filter(chat_id=chat_id).order_by('id').values_list(*COLUMNS))
+        if not rows:
+            return None
+        existing = ChatArchive.objects.filter(chat_id=chat_id).first()
+        if existing is not None:
+            # Messages written without a restore (the admin, say): fold both together.
+            hot = {row[0] for row in rows}
+            rows = sorted([row for row in unpack(existing.data) if row[0] not in hot] + rows)
+        data, raw_size = pack(rows)
+        archive = ChatArchive(
+            chat_id=chat_id, data=data, messages=len(rows), raw_size=raw_size,
+            first_message_at=min(row[3] for row in rows), last_message_at=max(row[3] for row in rows),
+        )
+        archive.save()
+        ChatMessage.objects.filter(chat_id=chat_id, id__lte=rows[-1][0]).delete()
+        Chat.objects.filter(pk=chat_id).update(archived=True)
+    return archive
+
+
+def restore(chat):
+    """Move ``chat``'s archived messages back into ``ChatMessage``; return how many."""
+    with transaction.atomic():
+        archive = ChatArchive.objects.select_for_update().filter(chat_id=chat.pk).first()
+        if archive is None:
+            count = 0  # Restored by a concurrent request.
+        else:
+            hot = set(ChatMessage.objects.filter(chat_id=chat.pk).values_list('id', flat=True))
+            rows = [row for row in unpack(archive.data) if row[0] not in hot]
+            messages = [ChatMessage(id=pk, chat_id=chat.pk, role=role, content=content) for pk, role, content, _ in rows]
+            ChatMessage.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+            # auto_now_add stamped the inserts; put the original times back.
+            for message, row in zip(messages, rows):
+                message.created_at = row[3]
+            ChatMessage.objects.bulk_update(messages, ['created_at'], batch_size=BATCH_SIZE)
+            archive.delete()
+            count = len(messages)
+        Chat.objects.filter(pk=chat.pk).update(archived=False)
+    chat.archived = False
+    return count
+
+
+def archived_messages(archives):
+    """Yield ``(chat_id, id, role, content, created_at)`` from ``archives``, a ChatArchive queryset."""
+    for archive in archives.order_by('chat_id').iterator(chunk_size=1):
+        for row in unpack(archive.data):
+            yield (archive.chat_id, *row)
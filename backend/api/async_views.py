@@ -0,0 +1,240 @@
+"""
+ASGI-native API surface for chats, memories and reminders.
+
+These mirror the DRF views under ``/api/async/`` but are coroutines that use
+Django's async ORM (``aget``, ``acreate``, ``async for``), so under an ASGI
+server a request waiting on the database or on a provider's ``astream``
+holds no worker thread. DRF serializers are still used for validation and
+output: they only touch already-loaded rows, so they are safe to call from
+the event loop.
+"""
+
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from . import archive
+from .authentication import atoken_user
+from .caching import cached_collection
+from .context import build_context
+from .models import Chat, ChatMessage, Memory, Reminder
+from .providers import get_provider
+from .serializers import (
+    ChatSerializer, ChatMessageSerializer, MemoryDetailSerializer, MemorySerializer, ReminderSerializer, row_encoder,
+)
+from .streaming import ReplyStream
+from .views import chat_paginator, message_paginator, memory_paginator, reminder_paginator
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def error(message, code):
+    return JsonResponse({'error': message}, status=code)
+
+
+class _CSRFCheck(CsrfViewMiddleware):
+    def _reject(self, request, reason):
+        return reason
+
+
+async def _authenticate(request):
+    """Token auth first, then the session, as in ``REST_FRAMEWORK`` settings."""
+    scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'token' and key:
+        user = await atoken_user(key.strip())
+        if user is None:
+            return None, 'Invalid token.'
+        if not user.is_active:
+            return None, 'User inactive or deleted.'
+        return user, None
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None, 'Authentication credentials were not provided.'
+    if request.method not in SAFE_METHODS:
+        # Session auth needs CSRF protection; token auth does not.
+        reason = _CSRFCheck(lambda r: None).process_view(request, None, (), {})
+        if reason:
+            return None, f'CSRF Failed: {reason}'
+    return user, None
+
+
+def async_api_view(methods):
+    """
+    Async counterpart of ``@api_view``: checks the method, authenticates the
+    user and exposes ``request.data`` and ``request.query_params``.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return error(f'Method "{request.method}" not allowed.', status.HTTP_405_METHOD_NOT_ALLOWED)
+            user, reason = await _authenticate(request)
+            if user is None:
+                return error(reason, status.HTTP_401_UNAUTHORIZED)
+            request.user = user
+            request.query_params = request.GET
+            request.data = {}
+            if request.body:
+                try:
+                    request.data = json.loads(request.body)
+                except ValueError:
+                    return error('Malformed JSON body.', status.HTTP_400_BAD_REQUEST)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def paginated_response(request, queryset, serializer_class, paginator):
+    columns, encode = row_encoder(serializer_class)
+    queryset = queryset.values(*dict.fromkeys([*columns, paginator.field, 'id']))
+    try:
+        rows, cursors = await paginator.apaginate(request, queryset)
+    except ValueError as exc:
+        return error(str(exc), status.HTTP_400_BAD_REQUEST)
+    return JsonResponse({'results': encode(rows), **cursors})
+
+
+async def create_response(request, serializer_class, **fields):
+    serializer = serializer_class(data=request.data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    model = serializer_class.Meta.model
+    obj = await model.objects.acreate(**serializer.validated_data, **fields)
+    return JsonResponse(serializer_class(obj).data, status=status.HTTP_201_CREATED)
+
+
+async def get_owned(model, **lookup):
+    try:
+        return await model.objects.aget(**lookup)
+    except model.DoesNotExist:
+        return None
+
+
+# ─── Chat Views ──────────────────────────────────────────────────────────────
+
+@async_api_view(['GET', 'POST'])
+@cached_collection('chats')
+async def chat_list(request):
+    if request.method == 'GET':
+        chats = Chat.objects.filter(user=request.user)
+        return await paginated_response(request, chats, ChatSerializer, chat_paginator)
+    return await create_response(request, ChatSerializer, user=request.user)
+
+
+@async_api_view(['GET'])
+async def chat_detail(request, chat_id):
+    chat = await get_owned(Chat, id=chat_id, user=request.user)
+    if chat is None:
+        return error('Chat not found.', status.HTTP_404_NOT_FOUND)
+    return JsonResponse(ChatSerializer(chat).data)
+
+
+@async_api_view(['GET', 'POST'])
+async def chat_messages(request, chat_id):
+    chat = await get_owned(Chat, id=chat_id, user=request.user)
+    if chat is None:
+        return error('Chat not found.', status.HTTP_404_NOT_FOUND)
+    if chat.archived:
+        await sync_to_async(archive.restore)(chat)
+
+    if request.method == 'GET':
+        return await paginated_response(request, chat.messages.all(), ChatMessageSerializer, message_paginator)
+
+    serializer = ChatMessageSerializer(data=request.data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    msg = await ChatMessage.objects.acreate(chat=chat, **serializer.validated_data)
+
+    chat.last_message = msg.content
+    await chat.asave(update_fields=['last_message', 'updated_at'])
+
+    return JsonResponse(ChatMessageSerializer(msg).data, status=status.HTTP_201_CREATED)
+
+
+@async_api_view(['POST'])
+async def chat_stream(request, chat_id=None):
+    if not isinstance(request.data, dict):
+        return error('Body must be a JSON object.', status.HTTP_400_BAD_REQUEST)
+    content = str(request.data.get('content', '')).strip()
+    if not content:
+        return error('Message content is required.', status.HTTP_400_BAD_REQUEST)
+
+    if chat_id is None:
+        # Saved with the reply (ReplyStream.save), so a failed turn leaves no empty chat.
+        chat = Chat(user=request.user, title=content[:30])
+    else:
+        chat = await get_owned(Chat, id=chat_id, user=request.user)
+        if chat is None:
+            return error('Chat not found.', status.HTTP_404_NOT_FOUND)
+        if chat.archived:
+            await sync_to_async(archive.restore)(chat)
+
+    provider = get_provider(request.user)
+    # Memory recall is NumPy work; keep it off the event loop with the ORM reads.
+    history = await sync_to_async(build_context)(chat, content, provider)
+    stream = ReplyStream(chat, content, provider, history)
+    response = StreamingHttpResponse(stream.aevents(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ─── Memory Views ────────────────────────────────────────────────────────────
+
+@async_api_view(['GET', 'POST'])
+@cached_collection('memories')
+async def memory_list(request):
+    if request.method == 'GET':
+        memories = Memory.objects.filter(user=request.user)
+        return await paginated_response(request, memories, MemorySerializer, memory_paginator)
+    return await create_response(request, MemorySerializer, user=request.user)
+
+
+@async_api_view(['GET', 'DELETE'])
+async def memory_detail(request, memory_id):
+    try:
+        # Joined, so the serializer does not query from the event loop.
+        memory = await Memory.objects.select_related('body').aget(id=memory_id, user=request.user)
+    except Memory.DoesNotExist:
+        return error('Memory not found.', status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        return JsonResponse(MemoryDetailSerializer(memory).data)
+    await memory.adelete()
+    return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+# ─── Reminder Views ─────────────────────────────────────────────────────────
+
+@async_api_view(['GET', 'POST'])
+@cached_collection('reminders')
+async def reminder_list(request):
+    if request.method == 'GET':
+        reminders = Reminder.objects.filter(user=request.user)
+        return await paginated_response(request, reminders, ReminderSerializer, reminder_paginator)
+    return await create_response(request, ReminderSerializer, user=request.user)
+
+
+@async_api_view(['PUT', 'PATCH', 'DELETE'])
+async def reminder_detail(request, reminder_id):
+    reminder = await get_owned(Reminder, id=reminder_id, user=request.user)
+    if reminder is None:
+        return error('Reminder not found.', status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'DELETE':
+        await reminder.adelete()
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    serializer = ReminderSerializer(reminder, data=request.data, partial=True)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    for field, value in serializer.validated_data.items():
+        setattr(reminder, field, value)
+    await reminder.asave()
+    return JsonResponse(ReminderSerializer(reminder).data)
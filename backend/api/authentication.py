@@ -0,0 +1,165 @@
+"""
+Cached authentication.
+
+Resolving credentials cost a query on every API request: the token joined to
+its user, or the user behind a session. ``CachedTokenAuthentication`` and
+``CachedModelBackend`` (which serves session logins) keep recently seen users
+in a bounded, process-local LRU for ``AUTH_CACHE_TTL`` seconds, up to
+``AUTH_CACHE_MAX_ENTRIES`` entries.
+
+Each entry remembers the user's ``user`` collection version (``api.caching``)
+and is only used while that version is current. Signal receivers bump it when
+the user is saved (password change, deactivation, settings), logs out or
+loses a token; a save racing the initial load can at worst keep a stale
+entry until its TTL runs out. The versions live in ``caches['default']``, so
+the cache is only enabled when that backend is shared between processes
+(``CACHE_URL``): with a process-local one, a token deleted in one process
+would keep authenticating in the others until the TTL expired. Hits are
+counted in ``api_auth_cache_requests_total``; each one is a query not run.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .caching import acollection_version, collection_version
+from .metrics import auth_cache_requests
+from .models import User
+
+
+def enabled():
+    """Whether users may be cached: a TTL is set and invalidations reach every process."""
+    if getattr(settings, 'AUTH_CACHE_TTL', 300) <= 0:
+        return False
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+class UserCache:
+    """LRU of ``key -> (user, version, expires)``, safe to share between threads."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the ``(user, version)`` cached under ``key``, or ``None``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[:2]
+
+    def set(self, key, user, version):
+        if not enabled():
+            return
+        with self._lock:
+            self._entries[key] = (user, version, time.monotonic() + settings.AUTH_CACHE_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > getattr(settings, 'AUTH_CACHE_MAX_ENTRIES', 10000):
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache()
+
+
+def _hit(kind, key):
+    cached = user_cache.get(key)
+    if cached is not None and cached[1] == collection_version(cached[0].pk, 'user'):
+        auth_cache_requests.inc(kind, 'hit')
+        # A copy, so a request changing its user never touches the shared one.
+        return copy.copy(cached[0])
+    auth_cache_requests.inc(kind, 'miss')
+    return None
+
+
+async def _ahit(kind, key):
+    cached = user_cache.get(key)
+    if cached is not None and cached[1] == await acollection_version(cached[0].pk, 'user'):
+        auth_cache_requests.inc(kind, 'hit')
+        return copy.copy(cached[0])
+    auth_cache_requests.inc(kind, 'miss')
+    return None
+
+
+def _store(key, user):
+    if user is not None:
+        user_cache.set(key, copy.copy(user), collection_version(user.pk, 'user'))
+    return user
+
+
+async def _astore(key, user):
+    if user is not None:
+        user_cache.set(key, copy.copy(user), await acollection_version(user.pk, 'user'))
+    return user
+
+
+# ─── Tokens ─────────────────────────────────────────────────────────────────
+
+def _load_token_user(key):
+    token = Token.objects.select_related('user').filter(key=key).first()
+    return token.user if token else None
+
+
+def token_user(key):
+    """The user owning API token ``key``, or ``None``; active or not."""
+    return _hit('token', ('token', key)) or _store(('token', key), _load_token_user(key))
+
+
+async def atoken_user(key):
+    user = await _ahit('token', ('token', key))
+    if user is None:
+        user = await _astore(('token', key), await sync_to_async(_load_token_user)(key))
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that resolves keys through the user cache."""
+
+    def authenticate_credentials(self, key):
+        user = token_user(key)
+        if user is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        # Unsaved stand-in: nothing reads request.auth beyond its key and user.
+        return user, Token(key=key, user=user)
+
+
+# ─── Sessions ───────────────────────────────────────────────────────────────
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` whose per-request ``get_user`` (session logins) is cached."""
+
+    def get_user(self, user_id):
+        user = _hit('session', ('user', user_id))
+        if user is None:
+            user = _store(('user', user_id), User._default_manager.filter(pk=user_id).first())
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        user = await _ahit('session', ('user', user_id))
+        if user is None:
+            user = await _astore(('user', user_id), await User._default_manager.filter(pk=user_id).afirst())
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,126 @@
+"""
+Batch create/update/delete for user-owned collections.
+
+A batch body looks like::
+
+    {"create": [{...}, ...], "update": [{"id": 1, ...}, ...], "delete": [2, 3]}
+
+Every item is validated with the collection's serializer first; the valid
+ones are then applied inside one transaction with a single ``bulk_create``,
+a single ``bulk_update`` and a single ``DELETE ... WHERE id IN``. The
+response reports a status for every item in request order.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from .models import SyncCounter
+from .signals import bulk_saved
+
+MAX_BATCH_SIZE = 500
+
+
+class BatchError(ValueError):
+    pass
+
+
+def _as_list(data, key):
+    items = data.get(key, [])
+    if not isinstance(items, list):
+        raise BatchError(f'"{key}" must be a list.')
+    return items
+
+
+def parse_batch(data):
+    if not isinstance(data, dict):
+        raise BatchError('Batch body must be an object.')
+    creates = _as_list(data, 'create')
+    updates = _as_list(data, 'update')
+    deletes = _as_list(data, 'delete')
+    if len(creates) + len(updates) + len(deletes) > MAX_BATCH_SIZE:
+        raise BatchError(f'A batch may contain at most {MAX_BATCH_SIZE} operations.')
+    return creates, updates, deletes
+
+
+def _item_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_batch(user, model, serializer_class, data):
+    """Apply a batch for ``user`` and return the per-item results."""
+    creates, updates, deletes = parse_batch(data)
+    owned = model.objects.filter(user=user)
+
+    create_results, new_objects = [], []
+    for item in creates:
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            obj = model(user=user, **serializer.validated_data)
+            new_objects.append(obj)
+            create_results.append({'status': status.HTTP_201_CREATED, 'object': obj})
+        else:
+            create_results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors})
+
+    update_ids = [_item_id(item.get('id')) if isinstance(item, dict) else None for item in updates]
+    existing = owned.in_bulk([i for i in update_ids if i is not None])
+    update_results, changed, fields = [], {}, set()
+    for item, obj_id in zip(updates, update_ids):
+        obj = existing.get(obj_id)
+        if obj is None:
+            update_results.append({'id': obj_id, 'status': status.HTTP_404_NOT_FOUND})
+            continue
+        patch = {k: v for k, v in item.items() if k != 'id'}
+        serializer = serializer_class(obj, data=patch, partial=True)
+        if not serializer.is_valid():
+            update_results.append({'id': obj_id, 'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors})
+            continue
+        for field, value in serializer.validated_data.items():
+            setattr(obj, field, value)
+            fields.add(field)
+        changed[obj_id] = obj
+        update_results.append({'id': obj_id, 'status': status.HTTP_200_OK, 'object': obj})
+
+    delete_ids = [_item_id(value) for value in deletes]
+    found = set(owned.filter(id__in=[i for i in delete_ids if i is not None]).values_list('id', flat=True))
+
+    with transaction.atomic():
+        # Bulk writes skip Model.save(), so stamp sync versions and
+        # updated_at here.
+        stamped = new_objects + list(changed.values())
+        if stamped:
+            first = SyncCounter.reserve(user.pk, len(stamped))
+            now = timezone.now()
+            for offset, obj in enumerate(stamped):
+                obj.version = first + offset
+                obj.updated_at = now
+            if hasattr(model, 'prepare_bulk_write'):
+                # Memory texts go to their blobs (api.blobs) first.
+                fields = model.prepare_bulk_write(stamped, fields)
+        if new_objects:
+            model.objects.bulk_create(new_objects)
+        if changed:
+            model.objects.bulk_update(list(changed.values()), sorted(fields | {'version', 'updated_at'}))
+        if found:
+            owned.filter(id__in=found).delete()
+        if stamped:
+            bulk_saved.send(sender=model, instances=stamped, created=new_objects)
+
+    def render(results):
+        for result in results:
+            obj = result.pop('object', None)
+            if obj is not None:
+                result['data'] = serializer_class(obj).data
+        return results
+
+    return {
+        'create': render(create_results),
+        'update': render(update_results),
+        'delete': [
+            {'id': i, 'status': status.HTTP_204_NO_CONTENT if i in found else status.HTTP_404_NOT_FOUND}
+            for i in delete_ids
+        ],
+    }
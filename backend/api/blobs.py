@@ -0,0 +1,51 @@
+"""
+Compact storage for memory text.
+
+Lists, search results, sync and realtime events carry a ``Memory``'s
+``preview``: the first ``MEMORY_PREVIEW_CHARS`` characters of its text. A
+longer text lives in ``MemoryBlob``, keyed by the SHA-256 of its UTF-8
+bytes, so memories with the same text share one row; ``refs`` counts them
+and the blob is deleted with its last memory (see
+``MemoryBlob.acquire``/``release``). Bodies over ``MEMORY_BLOB_COMPRESS_OVER``
+bytes are stored zlib-compressed when that makes them smaller. The row also
+keeps a longer text in ``search_text`` for the search index (api.search),
+which nothing else reads.
+
+The full text is ``Memory.snippet`` and ``GET /api/memories/<id>/``.
+"""
+
+import hashlib
+import zlib
+
+from django.conf import settings
+
+LEVEL = 6
+
+
+def preview_chars():
+    return getattr(settings, 'MEMORY_PREVIEW_CHARS', 280)
+
+
+def split(text):
+    """Return ``(preview, truncated)`` for ``text``."""
+    limit = preview_chars()
+    return text[:limit], len(text) > limit
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def encode(text):
+    """Return ``(data, compressed, size)`` to store ``text``."""
+    raw = text.encode()
+    if len(raw) > getattr(settings, 'MEMORY_BLOB_COMPRESS_OVER', 512):
+        packed = zlib.compress(raw, LEVEL)
+        if len(packed) < len(raw):
+            return packed, True, len(raw)
+    return raw, False, len(raw)
+
+
+def decode(data, compressed):
+    data = bytes(data)  # PostgreSQL returns a memoryview.
+    return (zlib.decompress(data) if compressed else data).decode()
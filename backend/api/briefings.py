@@ -0,0 +1,179 @@
+"""
+Daily briefings.
+
+``build_briefing`` keeps each user's digest for the day as a ``Memory`` in
+the ``daily-briefings`` category: reminders due that day (and how many are
+overdue), memories added or edited and chats with new messages.
+
+It only reads what changed. ``BriefingState.through_version`` is the user's
+sync version (see api.sync) the previous run read up to; new and edited rows
+are the ones stamped after it, found through the ``(user, version)``
+indexes, and tombstones past it drop deleted items. Several runs on one day
+fold into the same briefing; the first run on a new day starts another.
+
+``manage.py build_briefings`` runs it for every user with something new,
+spread over a process pool.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BriefingState, Chat, ChatMessage, Memory, Reminder, SyncCounter, Tombstone
+
+CATEGORY = 'daily-briefings'
+MAX_ITEMS = 10
+# Entries kept per section in BriefingState.items; older ones only count.
+MAX_STORED = 200
+# Tombstone.model -> the items they drop.
+_ITEM_KEYS = {'memory': 'memories', 'chat': 'chats'}
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def pending_users(day):
+    """Ids of users whose briefing for ``day`` is missing or behind their sync version."""
+    read_through = BriefingState.objects.filter(user=OuterRef('user')).values('through_version')
+    changed = SyncCounter.objects.filter(version__gt=Coalesce(Subquery(read_through), Value(0)))
+    start, end = day_bounds(day)
+    # Reminders due that day make a briefing even without new activity.
+    due = Reminder.objects.filter(completed=False, due_at__gte=start, due_at__lt=end).exclude(
+        user__briefing_state__day=day,
+    )
+    return sorted({*changed.values_list('user_id', flat=True), *due.values_list('user_id', flat=True)})
+
+
+def _changed(model, user_id, since, through):
+    return model.objects.filter(user_id=user_id, version__gt=since, version__lte=through)
+
+
+def _collect(state, user_id, through, items):
+    since = state.through_version
+    deleted = Tombstone.objects.filter(user_id=user_id, version__gt=since, version__lte=through,
+                                       model__in=_ITEM_KEYS)
+    for model, object_id in deleted.values_list('model', 'object_id'):
+        items[_ITEM_KEYS[model]].pop(str(object_id), None)
+
+    memories = _changed(Memory, user_id, since, through).exclude(category=CATEGORY)
+    chats = _changed(Chat, user_id, since, through)
+    if not since:
+        # First run: everything is newer than version 0, so only look back a day.
+        floor = datetime.fromisoformat(items['since'])
+        memories = memories.filter(updated_at__gte=floor)
+        chats = chats.filter(updated_at__gte=floor)
+
+    for pk, title, category in memories.values_list('id', 'title', 'category'):
+        items['memories'][str(pk)] = {'title': title, 'category': category}
+
+    chats = dict(chats.values_list('id', 'title'))
+    if chats:
+        # Recounted for every changed chat, so messages committed after the
+        # previous run read the counter are still counted.
+        messages = ChatMessage.objects.filter(chat_id__in=chats, created_at__gte=datetime.fromisoformat(items['since']))
+        counts = dict(messages.values('chat_id').annotate(n=Count('id')).values_list('chat_id', 'n'))
+        for chat_id, title in chats.items():
+            if counts.get(chat_id):
+                items['chats'][str(chat_id)] = {'title': title, 'messages': counts[chat_id]}
+            elif str(chat_id) in items['chats']:
+                items['chats'][str(chat_id)]['title'] = title  # Renamed.
+
+    for key in _ITEM_KEYS.values():
+        if len(items[key]) > MAX_STORED:
+            oldest = sorted(items[key], key=int)[:len(items[key]) - MAX_STORED]
+            for pk in oldest:
+                del items[key][pk]
+            items['more'][key] += len(oldest)
+
+
+def _plural(count, noun):
+    return f'{count} {noun}{"" if count == 1 else "s"}'
+
+
+def _render(items, due, due_count, overdue):
+    sections = []
+    if due_count or overdue:
+        lines = [f'{_plural(due_count, "reminder")} due today:' if due_count else 'Nothing due today.']
+        for reminder in due:
+            lines.append(f'- {timezone.localtime(reminder.due_at):%H:%M} {reminder.text}')
+        if due_count > len(due):
+            lines.append(f'- and {due_count - len(due)} more')
+        if overdue:
+            lines.append(f'{overdue} overdue.')
+        sections.append('\n'.join(lines))
+    for key, heading, describe in (
+        ('memories', 'New memories', lambda m: f'{m["title"]} ({m["category"]})'),
+        ('chats', 'Conversations', lambda c: f'{c["title"]}: {_plural(c["messages"], "new message")}'),
+    ):
+        # Most recent first: ids grow with creation.
+        entries = sorted(items[key].items(), key=lambda item: int(item[0]), reverse=True)
+        total = len(entries) + items['more'][key]
+        if total:
+            lines = [f'{heading} ({total}):', *(f'- {describe(entry)}' for _, entry in entries[:MAX_ITEMS])]
+            if total > MAX_ITEMS:
+                lines.append(f'- and {total - MAX_ITEMS} more')
+            sections.append('\n'.join(lines))
+    return '\n\n'.join(sections)
+
+
+def build_briefing(user_id, day=None):
+    """
+    Bring ``user_id``'s briefing for ``day`` (default: today) up to date.
+    Returns the briefing ``Memory``, or ``None`` when there is nothing to report.
+    """
+    return _build(user_id, day or timezone.localdate())[0]
+
+
+def _build(user_id, day):
+    start, end = day_bounds(day)
+    BriefingState.objects.get_or_create(user_id=user_id)
+    with transaction.atomic():
+        # Serializes concurrent runs for the same user.
+        state = BriefingState.objects.select_for_update().select_related('memory').get(user_id=user_id)
+        if state.day != day:
+            since = state.built_at or start - timedelta(days=1)
+            items = {'since': since.isoformat(), 'memories': {}, 'chats': {}, 'more': {'memories': 0, 'chats': 0}}
+            memory = None
+        else:
+            items, memory = state.items, state.memory
+        # Rows stamped up to this version are committed: writers hold the
+        # counter row locked until they commit.
+        through = SyncCounter.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+        _collect(state, user_id, through, items)
+
+        pending = Reminder.objects.filter(user_id=user_id, completed=False, due_at__lt=end)
+        due = pending.filter(due_at__gte=start).order_by('due_at', 'id')
+        overdue = pending.filter(due_at__lt=start).count()
+        snippet = _render(items, list(due[:MAX_ITEMS]), due.count(), overdue)
+
+        written = bool(snippet) and (memory is None or memory.snippet != snippet)
+        if written:
+            if memory is None:
+                memory = Memory(user_id=user_id, category=CATEGORY, type='Briefing')
+            memory.title = f'Daily briefing: {day:%A}, {day:%B} {day.day}'
+            memory.snippet = snippet
+            memory.save()
+            if memory.version == through + 1:
+                # Nothing else was stamped in between: skip our own write, so
+                # an idle user is not picked up again by the next run.
+                through = memory.version
+
+        state.through_version = through
+        state.day = day
+        state.memory = memory
+        state.items = items
+        state.built_at = timezone.now()
+        state.save()
+    return memory, written
+
+
+def build_briefings(user_ids, day=None):
+    """Build the briefings of ``user_ids``; return ``(users, written)``."""
+    day = day or timezone.localdate()
+    written = sum(_build(user_id, day)[1] for user_id in user_ids)
+    return len(user_ids), written
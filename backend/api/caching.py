@@ -0,0 +1,140 @@
+"""
+Per-user response cache for read-heavy API endpoints.
+
+Every user has a version number per collection (``user``, ``chats``,
+``memories``, ``reminders``) stored in Django's cache. GET responses are
+cached under that version, and signal receivers bump it after writes
+commit, so invalidation never scans keys. The version also forms the ETag:
+a client sending a matching ``If-None-Match`` gets a 304 without the view
+touching the database.
+"""
+
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework import status
+
+from .commit import defer
+
+
+def _cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id, collection):
+    return f'api:ver:{user_id}:{collection}'
+
+
+def collection_version(user_id, collection):
+    key = _version_key(user_id, collection)
+    version = _cache().get(key)
+    if version is None:
+        # Seed from the clock, never from 1: if the version key is evicted,
+        # responses cached under an older version must not be reused.
+        _cache().add(key, time.time_ns(), timeout=None)
+        version = _cache().get(key)
+    return version
+
+
+async def acollection_version(user_id, collection):
+    key = _version_key(user_id, collection)
+    version = await _cache().aget(key)
+    if version is None:
+        await _cache().aadd(key, time.time_ns(), timeout=None)
+        version = await _cache().aget(key)
+    return version
+
+
+def bump_version(user_id, collection):
+    key = _version_key(user_id, collection)
+    try:
+        _cache().incr(key)
+    except ValueError:
+        _cache().set(key, time.time_ns(), timeout=None)
+
+
+def _bump_versions(user_id, collections):
+    for collection in collections:
+        bump_version(user_id, collection)
+
+
+def invalidate(user_id, *collections):
+    """Bump ``collections`` for ``user_id`` once the current transaction commits."""
+    defer(_bump_versions, user_id, collections)
+
+
+def _etag(version, request):
+    digest = hashlib.sha1(f'{version}:{request.get_full_path()}'.encode()).hexdigest()[:20]
+    return digest, f'"{digest}"'
+
+
+def cached_collection(collection):
+    """
+    Cache GET responses of a function view under ``collection``.
+
+    Apply below ``@api_view`` so ``request.user`` is already authenticated.
+    Async views (see ``async_views``) are supported too; their rendered JSON
+    body is cached instead of ``response.data``.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            return _acached(view, collection)
+        # Imported here: signal receivers use this module in every process,
+        # and DRF's response pulls in its serializers.
+        from rest_framework.response import Response
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            digest, etag = _etag(collection_version(request.user.pk, collection), request)
+            headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+            if etag in request.headers.get('If-None-Match', ''):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            key = f'api:resp:{request.user.pk}:{collection}:{digest}'
+            cached = _cache().get(key)
+            if cached is not None:
+                return Response(cached, headers=headers)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                _cache().set(key, response.data, getattr(settings, 'API_CACHE_TTL', 300))
+                for name, value in headers.items():
+                    response[name] = value
+            return response
+        return wrapper
+    return decorator
+
+
+def _acached(view, collection):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return await view(request, *args, **kwargs)
+
+        digest, etag = _etag(await acollection_version(request.user.pk, collection), request)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponseNotModified(headers=headers)
+
+        key = f'api:aresp:{request.user.pk}:{collection}:{digest}'
+        cached = await _cache().aget(key)
+        if cached is not None:
+            return HttpResponse(cached, content_type='application/json', headers=headers)
+
+        response = await view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            await _cache().aset(key, response.content, getattr(settings, 'API_CACHE_TTL', 300))
+            for name, value in headers.items():
+                response[name] = value
+        return response
+    return wrapper
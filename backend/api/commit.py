@@ -0,0 +1,33 @@
+"""
+Callbacks merged per transaction.
+
+``defer(func, key, items)`` calls ``func(key, items)`` once the current
+transaction commits, with every item deferred under the same ``func`` and
+``key`` on this connection since, so a bulk write costs one dashboard refresh
+(api.dashboard) or cache bump (api.caching) per user. Outside a transaction
+it runs at once, like ``on_commit``. Callbacks are robust: a failure is
+logged and does not break the write that queued it.
+
+Items deferred by a transaction that rolls back stay queued and run with the
+next commit that defers under the same key, which only costs spare work.
+"""
+
+import weakref
+
+from django.db import transaction
+
+# connection -> {(func, key): items waiting for a commit}
+_pending = weakref.WeakKeyDictionary()
+
+
+def defer(func, key, items, using=None):
+    pending = _pending.setdefault(transaction.get_connection(using), {})
+    pending.setdefault((func, key), set()).update(items)
+
+    def run():
+        # The first callback to run after the commit takes all the items.
+        queued = pending.pop((func, key), None)
+        if queued is not None:
+            func(key, queued)
+
+    transaction.on_commit(run, using=using, robust=True)
@@ -0,0 +1,130 @@
+"""
+Prompt assembly for chat turns.
+
+A turn's prompt is built from, in order:
+
+* the most relevant memories (``vectors.similar_memories``), within
+  ``CHAT_MEMORY_TOKENS``;
+* the chat's rolling ``summary`` of everything up to ``summary_through``;
+* the newest unsummarised messages that fit in ``CHAT_WINDOW_TOKENS``;
+* the new user message.
+
+Every part is budgeted, so the prompt stays bounded however long the chat
+runs. When unsummarised messages no longer fit the window, a
+``summarize_chat`` job folds the oldest of them into the summary, keeping
+the newest half of the window verbatim so the summary is recomputed only
+once per half window of conversation rather than on every turn. Turns that
+overflow while one is queued or running queue no other.
+"""
+
+from django.conf import settings
+
+from .jobs import enqueue
+from .models import Chat
+from .vectors import similar_memories
+
+# Never read more than this many unsummarised messages for one prompt.
+MAX_WINDOW_MESSAGES = 200
+FOLD_BATCH = 500
+MIN_MEMORY_SCORE = 0.1
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _fit(messages, provider, budget):
+    """Return the newest suffix of ``messages`` that fits ``budget`` tokens."""
+    kept, used = [], 0
+    for message in reversed(messages):
+        used += provider.count_tokens(message['content'])
+        if used > budget:
+            break
+        kept.append(message)
+    kept.reverse()
+    return kept
+
+
+def _unsummarized(chat, limit=None):
+    rows = chat.messages.filter(id__gt=chat.summary_through).order_by('-id')
+    rows = list(rows.values('id', 'role', 'content')[:limit])
+    rows.reverse()
+    return rows
+
+
+def memory_context(user, content, provider):
+    budget = _setting('CHAT_MEMORY_TOKENS', 400)
+    lines, used = [], 0
+    for memory, score in similar_memories(user, content, k=_setting('CHAT_MEMORY_COUNT', 3)):
+        if score < MIN_MEMORY_SCORE:
+            continue
+        line = f'- {memory.title}: {memory.preview[:300]}'
+        used += provider.count_tokens(line)
+        if used > budget:
+            break
+        lines.append(line)
+    return lines
+
+
+def build_context(chat, content, provider):
+    """Return the bounded list of provider messages for a new user turn."""
+    messages = []
+    memories = memory_context(chat.user, content, provider)
+    if memories:
+        messages.append({'role': 'system', 'content': 'Relevant memories:\n' + '\n'.join(memories)})
+    if chat.summary:
+        messages.append({'role': 'system', 'content': 'Summary of the earlier conversation:\n' + chat.summary})
+
+    budget = _setting('CHAT_WINDOW_TOKENS', 3000) - provider.count_tokens(content)
+    # A chat saved with this turn's reply has no history yet (api.streaming).
+    recent = _unsummarized(chat, MAX_WINDOW_MESSAGES) if chat.pk else []
+    window = _fit(recent, provider, budget)
+    if len(window) < len(recent) or len(recent) == MAX_WINDOW_MESSAGES:
+        enqueue('summarize_chat', key=f'summarize_chat:{chat.id}', chat_id=chat.id)
+
+    messages += [{'role': m['role'], 'content': m['content']} for m in window]
+    messages.append({'role': 'user', 'content': content})
+    return messages
+
+
+def summarize_chat(chat, provider):
+    """
+    Fold every unsummarised message except the newest half window into the
+    chat's summary. Messages are read and summarised in window-sized chunks,
+    so neither memory nor any single summarisation call is unbounded.
+    """
+    window_tokens = _setting('CHAT_WINDOW_TOKENS', 3000)
+    summary_tokens = _setting('CHAT_SUMMARY_TOKENS', 600)
+    recent = _unsummarized(chat, MAX_WINDOW_MESSAGES)
+    if not recent:
+        return False
+    keep = _fit(recent, provider, window_tokens // 2)
+    # Always keep at least the newest message verbatim.
+    boundary = keep[0]['id'] if keep else recent[-1]['id']
+
+    folded = False
+    while True:
+        rows = list(
+            chat.messages.filter(id__gt=chat.summary_through, id__lt=boundary)
+            .order_by('id').values('id', 'role', 'content')[:FOLD_BATCH]
+        )
+        if not rows:
+            return folded
+        summary, chunk, used = chat.summary, [], 0
+        for message in rows:
+            chunk.append(message)
+            used += provider.count_tokens(message['content'])
+            if used >= window_tokens:
+                summary = provider.summarize(summary, chunk, summary_tokens)
+                chunk, used = [], 0
+        if chunk:
+            summary = provider.summarize(summary, chunk, summary_tokens)
+
+        # A plain UPDATE: the summary is server-side state, not a synced
+        # change. The summary_through check drops a concurrent duplicate run.
+        if not Chat.objects.filter(pk=chat.pk, summary_through=chat.summary_through).update(
+            summary=summary, summary_through=rows[-1]['id'],
+        ):
+            return folded
+        chat.summary, chat.summary_through = summary, rows[-1]['id']
+        folded = True
@@ -0,0 +1,160 @@
+"""
+Cached dashboard widgets.
+
+``DashboardStats`` holds each user's counters and widget lists so the
+dashboard renders from a single primary-key lookup. The counters move with
+every write: signal receivers add ``F()`` deltas to them in the writing
+transaction (``memories_written``, ``reminders_written``), without counting
+rows. The lists are rebuilt by ``schedule_refresh`` once per transaction,
+after commit, and only after writes that show in them: the due-today list
+when a reminder due today changes, the recent chats when a chat does.
+
+A row is built by counting the first time it is read. A write whose before
+state is unknown, such as a reminder saved without being loaded first,
+recounts instead. ``manage.py rebuild_dashboard_stats`` recounts every row.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .commit import defer
+from .models import Chat, DashboardStats, Memory, Reminder, User
+
+RECENT_CHATS = 5
+DUE_TODAY = 5
+
+ALL_PARTS = frozenset({'counts', 'due_today', 'chats'})
+
+
+def _today():
+    start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+
+def _count_fields(user_id):
+    return {
+        'active_reminders': Reminder.objects.filter(user_id=user_id, completed=False).count(),
+        'memories': Memory.objects.filter(user_id=user_id).count(),
+    }
+
+
+def _due_today_fields(user_id):
+    start, end = _today()
+    due = Reminder.objects.filter(user_id=user_id, completed=False, due_at__gte=start, due_at__lt=end)
+    return {
+        'due_today': [
+            {'id': r.id, 'text': r.text, 'due_date': r.due_date, 'due_at': r.due_at.isoformat()}
+            for r in due.order_by('due_at', 'id')[:DUE_TODAY]
+        ],
+        'due_today_count': due.count(),
+        'due_on': start.date(),
+    }
+
+
+def _chat_fields(user_id):
+    chats = Chat.objects.filter(user_id=user_id).order_by('-updated_at', '-id')[:RECENT_CHATS]
+    return {'recent_chats': [
+        {'id': c.id, 'title': c.title, 'last_message': c.last_message[:80], 'updated_at': c.updated_at.isoformat()}
+        for c in chats
+    ]}
+
+
+_BUILDERS = {
+    'counts': _count_fields,
+    'due_today': _due_today_fields,
+    'chats': _chat_fields,
+}
+
+
+def refresh_stats(user_id, parts=ALL_PARTS):
+    if not DashboardStats.objects.filter(user_id=user_id).exists():
+        if not User.objects.filter(pk=user_id).exists():
+            return None  # Refresh queued by the user's own deletion.
+        # A new row needs every part, not just the ones that changed.
+        parts = ALL_PARTS
+    fields = {}
+    for part in parts:
+        fields.update(_BUILDERS[part](user_id))
+    # Two first refreshes can race to insert the row; get_or_create lets the
+    # loser update it instead.
+    stats, created = DashboardStats.objects.get_or_create(user_id=user_id, defaults=fields)
+    if not created:
+        for name, value in fields.items():
+            setattr(stats, name, value)
+        stats.save(update_fields=[*fields, 'updated_at'])
+    return stats
+
+
+def schedule_refresh(user_id, *parts):
+    """Refresh ``parts`` of ``user_id``'s stats once the current transaction commits."""
+    defer(refresh_stats, user_id, parts)
+
+
+# ─── Writes ─────────────────────────────────────────────────────────────────
+
+def _add(deltas, field):
+    for user_id, delta in deltas.items():
+        if delta:
+            DashboardStats.objects.filter(user_id=user_id).update(**{field: F(field) + delta})
+
+
+def memories_written(memories, created=(), deleted=False):
+    """Count ``memories`` in or out (only those in ``created`` when saved)."""
+    deltas = Counter()
+    for memory in (memories if deleted else created):
+        deltas[memory.user_id] += -1 if deleted else 1
+    _add(deltas, 'memories')
+
+
+# A state is the values of Reminder.DASHBOARD_FIELDS, or None for no row.
+
+def _active(state):
+    return state is not None and not state[0]
+
+
+def _due_today(state, start, end):
+    return _active(state) and state[1] is not None and start <= state[1] < end
+
+
+def reminders_written(reminders, created=(), deleted=False):
+    """
+    Move the counters by what saving (or deleting) ``reminders`` changed,
+    and refresh the due-today lists they touch. ``created`` are the ones
+    inserted; the others must have been loaded (``Reminder.stored_state``).
+    """
+    start, end = _today()
+    created = {id(reminder) for reminder in created}
+    deltas = Counter()
+    for reminder in reminders:
+        current = tuple(getattr(reminder, name) for name in Reminder.DASHBOARD_FIELDS)
+        stored = getattr(reminder, 'stored_state', None)
+        if deleted:
+            before, after = stored or current, None
+        elif id(reminder) in created:
+            before, after = None, current
+        elif stored is None:
+            # Saved without being loaded: nothing to compare with.
+            schedule_refresh(reminder.user_id, 'counts', 'due_today')
+            reminder.stored_state = current
+            continue
+        else:
+            before, after = stored, current
+        reminder.stored_state = after
+        deltas[reminder.user_id] += _active(after) - _active(before)
+        if before != after and (_due_today(before, start, end) or _due_today(after, start, end)):
+            schedule_refresh(reminder.user_id, 'due_today')
+    _add(deltas, 'active_reminders')
+
+
+def get_stats(user):
+    try:
+        stats = DashboardStats.objects.get(user=user)
+    except DashboardStats.DoesNotExist:
+        return refresh_stats(user.pk)
+    if stats.due_on != _today()[0].date():
+        # "Due today" is relative to the date the list was built on.
+        stats = refresh_stats(user.pk, {'due_today'})
+    return stats
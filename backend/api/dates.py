@@ -0,0 +1,141 @@
+"""
+Natural-language due dates for reminders.
+
+``parse_due`` turns the free text users type ("Tomorrow", "Today, 6pm",
+"next friday 9:30", "in 3 days", "Oct 20") into an aware datetime in the
+current time zone, or ``None`` when nothing in the text is recognised.
+A date without a time defaults to ``DEFAULT_HOUR`` (or the next full hour
+if that has passed); a time without a date means its next occurrence.
+"""
+
+import re
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+DEFAULT_HOUR = 9
+
+WEEKDAYS = {name: i for i, names in enumerate([
+    ('monday', 'mon'), ('tuesday', 'tue', 'tues'), ('wednesday', 'wed'), ('thursday', 'thu', 'thur', 'thurs'),
+    ('friday', 'fri'), ('saturday', 'sat'), ('sunday', 'sun'),
+]) for name in names}
+
+MONTHS = {name: i for i, names in enumerate([
+    ('january', 'jan'), ('february', 'feb'), ('march', 'mar'), ('april', 'apr'), ('may',), ('june', 'jun'),
+    ('july', 'jul'), ('august', 'aug'), ('september', 'sep', 'sept'), ('october', 'oct'),
+    ('november', 'nov'), ('december', 'dec'),
+], start=1) for name in names}
+
+NAMED_TIMES = {
+    'noon': time(12), 'midday': time(12), 'midnight': time(0),
+    'morning': time(9), 'afternoon': time(15), 'evening': time(18), 'tonight': time(20),
+}
+
+UNITS = {'minute': 'minutes', 'min': 'minutes', 'hour': 'hours', 'hr': 'hours', 'day': 'days', 'week': 'weeks'}
+
+_MONTH_RE = '|'.join(sorted(MONTHS, key=len, reverse=True))
+_CLOCK_12 = re.compile(r'\b(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)\b')
+_CLOCK_24 = re.compile(r'\b([01]?\d|2[0-3]):(\d{2})\b')
+_RELATIVE = re.compile(r'\bin\s+(\d+|an?|one)\s+(minute|min|hour|hr|day|week)s?\b')
+_MONTH_DAY = re.compile(rf'\b({_MONTH_RE})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(\d{{4}}))?\b')
+_DAY_MONTH = re.compile(rf'\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({_MONTH_RE})\.?(?:,?\s+(\d{{4}}))?\b')
+_ISO_DATE = re.compile(r'\b(\d{4}-\d{2}-\d{2})\b')
+_WORD = re.compile(r'[a-z]+')
+
+
+def _clock(text):
+    match = _CLOCK_12.search(text)
+    if match:
+        hour, minute = int(match[1]), int(match[2] or 0)
+        if not 1 <= hour <= 12 or minute > 59:
+            return None
+        return time(hour % 12 + (12 if match[3] == 'pm' else 0), minute)
+    match = _CLOCK_24.search(text)
+    if match:
+        return time(int(match[1]), int(match[2]))
+    for word in _WORD.findall(text):
+        if word in NAMED_TIMES:
+            return NAMED_TIMES[word]
+    return None
+
+
+def _calendar_day(text, today):
+    """Return the date named in ``text``, or ``None``."""
+    match = _ISO_DATE.search(text)
+    if match:
+        try:
+            return parse_date(match[1])
+        except ValueError:
+            return None
+
+    match = _MONTH_DAY.search(text) or _DAY_MONTH.search(text)
+    if match:
+        if match.re is _MONTH_DAY:
+            month, day = MONTHS[match[1]], int(match[2])
+        else:
+            day, month = int(match[1]), MONTHS[match[2]]
+        year = int(match[3]) if match[3] else today.year
+        try:
+            date = today.replace(year=year, month=month, day=day)
+        except ValueError:
+            return None
+        if not match[3] and date < today:
+            date = date.replace(year=year + 1)
+        return date
+
+    words = _WORD.findall(text)
+    if 'today' in words or 'tonight' in words:
+        return today
+    if 'tomorrow' in words or 'tmrw' in words:
+        return today + timedelta(days=1)
+    if 'weekend' in words:
+        return today + timedelta(days=max(5 - today.weekday(), 0))
+    if 'week' in words and ('next' in words or 'this' in words or 'end' in words):
+        if 'next' in words:
+            return today + timedelta(days=7 - today.weekday())
+        return today + timedelta(days=max(4 - today.weekday(), 0))
+    if 'month' in words and ('next' in words or 'end' in words):
+        first = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return first if 'next' in words else first - timedelta(days=1)
+    for word in words:
+        if word in WEEKDAYS:
+            ahead = (WEEKDAYS[word] - today.weekday()) % 7
+            return today + timedelta(days=ahead or 7)
+    return None
+
+
+def parse_due(text, now=None):
+    """Return the aware datetime described by ``text``, or ``None``."""
+    text = (text or '').strip().lower()
+    if not text:
+        return None
+    now = timezone.localtime(now)
+    tz = now.tzinfo
+
+    try:
+        exact = parse_datetime(text.upper())
+    except ValueError:
+        exact = None
+    if exact is not None:
+        return exact if timezone.is_aware(exact) else timezone.make_aware(exact, tz)
+
+    match = _RELATIVE.search(text)
+    if match:
+        amount = 1 if match[1] in ('a', 'an', 'one') else int(match[1])
+        return now + timedelta(**{UNITS[match[2]]: amount})
+
+    day = _calendar_day(text, now.date())
+    clock = _clock(text)
+    if day is None and clock is None:
+        return None
+    if day is None:
+        due = datetime.combine(now.date(), clock, tz)
+        return due if due > now else due + timedelta(days=1)
+    if clock is not None:
+        return datetime.combine(day, clock, tz)
+    due = datetime.combine(day, time(DEFAULT_HOUR), tz)
+    if due < now:
+        # "Today" typed after the default hour: the next full hour instead.
+        due = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return due
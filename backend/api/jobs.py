@@ -0,0 +1,202 @@
+"""
+Database-backed job queue.
+
+Handlers are registered with ``@job(kind, ...)`` (see ``api.tasks``) and
+queued with ``enqueue(kind, **payload)``. The ``Job`` row is written in the
+caller's transaction, so work is only queued if the write that caused it
+commits. ``enqueue(..., key=...)`` queues nothing while a job with the same
+key is queued or running. ``manage.py run_jobs`` starts worker processes
+that claim due jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it (PostgreSQL) and with conditional updates elsewhere
+(SQLite). Failures are retried with exponential backoff up to the job's
+``max_attempts``. Each worker requeues jobs left running by a dead worker
+every ``SWEEP_EVERY``.
+
+With ``JOBS_EAGER`` set (the default only for the web profile under DEBUG,
+which covers ``runserver`` and ``test``), jobs due now are not queued but
+run in-process right after the transaction commits, without retries;
+delayed jobs are always queued.
+"""
+
+import random
+import time
+import traceback
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Job
+
+BACKOFF_BASE = 5  # seconds
+BACKOFF_MAX = 3600
+STALE_AFTER = timedelta(minutes=15)
+SWEEP_EVERY = 60  # seconds
+_CLAIM_LOCK = zlib.crc32(b'api.jobs.claim')
+
+_handlers = {}
+
+
+class Handler:
+    def __init__(self, func, kind, concurrency, max_attempts):
+        self.func = func
+        self.kind = kind
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+
+def job(kind, concurrency=None, max_attempts=5):
+    """
+    Register the decorated function as the handler for ``kind``.
+
+    ``concurrency`` caps how many jobs of this kind run at once across all
+    workers (``None`` for no cap).
+    """
+    def decorator(func):
+        _handlers[kind] = Handler(func, kind, concurrency, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(kind, delay=None, run_at=None, key='', **payload):
+    """
+    Queue ``kind`` with ``payload`` (JSON-serialisable keyword arguments).
+    With a ``key``, return ``None`` instead if a job with that key is
+    already queued or running.
+    """
+    handler = _handlers[kind]
+    if run_at is None and delay is None and getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: handler(**payload), robust=True)
+        return None
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta())
+    fields = {'kind': kind, 'payload': payload, 'run_at': run_at, 'max_attempts': handler.max_attempts}
+    if not key:
+        return Job.objects.create(**fields)
+    if Job.objects.filter(key=key, status__in=[Job.QUEUED, Job.RUNNING]).exists():
+        return None
+    try:
+        # Savepoint: losing the race to another enqueue must not break the caller's transaction.
+        with transaction.atomic():
+            return Job.objects.create(key=key, **fields)
+    except IntegrityError:
+        return None
+
+
+# ─── Claiming ───────────────────────────────────────────────────────────────
+
+def requeue_stale(now=None):
+    """Requeue (or fail, when out of attempts) jobs running for over ``STALE_AFTER``."""
+    now = now or timezone.now()
+    # Jobs whose worker died mid-run; their attempt has already been counted.
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - STALE_AFTER)
+    stale.filter(attempts__lt=F('max_attempts')).update(status=Job.QUEUED, locked_by='', locked_at=None)
+    stale.update(status=Job.FAILED, last_error='Worker timed out.', failed_at=now)
+
+
+def _budgets(kinds):
+    """Remaining slots per capped kind; uncapped kinds are absent."""
+    capped = {k: h.concurrency for k, h in _handlers.items() if h.concurrency and (not kinds or k in kinds)}
+    if not capped:
+        return {}
+    running = dict(
+        Job.objects.filter(status=Job.RUNNING, kind__in=capped)
+        .values_list('kind').annotate(n=Count('id')).values_list('kind', 'n')
+    )
+    return {kind: limit - running.get(kind, 0) for kind, limit in capped.items()}
+
+
+def claim(worker_id, kinds=None, limit=1):
+    """Mark up to ``limit`` due jobs as running by ``worker_id`` and return them."""
+    now = timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Serialise claims so per-kind caps are counted consistently;
+            # SKIP LOCKED still keeps claims off rows other transactions hold.
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [_CLAIM_LOCK])
+        budgets = _budgets(kinds)
+
+        due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        if kinds:
+            due = due.filter(kind__in=kinds)
+        full = [kind for kind, left in budgets.items() if left <= 0]
+        if full:
+            due = due.exclude(kind__in=full)
+        due = due.order_by('run_at', 'id')
+        if skip_locked:
+            due = due.select_for_update(skip_locked=True)
+
+        claimed = []
+        for candidate in due[:limit * 4]:
+            if len(claimed) == limit:
+                break
+            if budgets.get(candidate.kind, 1) <= 0:
+                continue
+            fields = {'status': Job.RUNNING, 'locked_by': worker_id, 'locked_at': now}
+            # On backends without row locks the status check makes the claim
+            # atomic: only one worker's UPDATE matches the queued row.
+            if Job.objects.filter(pk=candidate.pk, status=Job.QUEUED).update(attempts=candidate.attempts + 1, **fields):
+                for name, value in fields.items():
+                    setattr(candidate, name, value)
+                candidate.attempts += 1
+                claimed.append(candidate)
+                if candidate.kind in budgets:
+                    budgets[candidate.kind] -= 1
+    return claimed
+
+
+# ─── Running ────────────────────────────────────────────────────────────────
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def execute(item):
+    """Run a claimed job; delete it on success, otherwise retry or fail it."""
+    handler = _handlers.get(item.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind "{item.kind}".')
+        handler(**item.payload)
+    except Exception:
+        error = traceback.format_exc(limit=20)
+        if handler is None or item.attempts >= item.max_attempts:
+            Job.objects.filter(pk=item.pk).update(status=Job.FAILED, last_error=error, failed_at=timezone.now())
+        else:
+            Job.objects.filter(pk=item.pk).update(
+                status=Job.QUEUED, last_error=error, locked_by='', locked_at=None,
+                run_at=timezone.now() + backoff(item.attempts),
+            )
+        return False
+    Job.objects.filter(pk=item.pk).delete()
+    return True
+
+
+def run_worker(worker_id, kinds=None, once=False, poll=1.0, batch=1, should_stop=lambda: False):
+    """
+    Claim and run jobs until ``should_stop()`` returns true, or, with
+    ``once``, until no job is due.
+    """
+    next_sweep = 0
+    while not should_stop():
+        close_old_connections()
+        if time.monotonic() >= next_sweep:
+            requeue_stale()
+            next_sweep = time.monotonic() + SWEEP_EVERY
+        jobs = claim(worker_id, kinds, limit=batch)
+        if not jobs:
+            if once:
+                return
+            time.sleep(poll)
+            continue
+        for item in jobs:
+            execute(item)
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from api import archive
+
+
+class Command(BaseCommand):
+    help = ('Moves the messages of chats idle for --days into compressed archives (api.archive); '
+            'each chat is archived in its own short transaction')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Idle time before a chat is archived '
+                                                     '(default: CHAT_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Chats fetched per batch')
+        parser.add_argument('--limit', type=int, help='Stop after archiving this many chats')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the chats that would be archived')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days must not be negative.')
+        before = archive.cutoff(options['days'])
+        candidates = archive.idle_chats(before).order_by('id')
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} chats idle since {before:%Y-%m-%d %H:%M} would be archived.')
+            return
+
+        chats = messages = raw = stored = 0
+        last_id = 0
+        limit = options['limit']
+        while limit is None or chats < limit:
+            ids = list(candidates.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            last_id = ids[-1]
+            for chat_id in ids[:None if limit is None else limit - chats]:
+                written = archive.archive_chat(chat_id, before)
+                if written is None:
+                    continue  # Written to since the batch was read.
+                chats += 1
+                messages += written.messages
+                raw += written.raw_size
+                stored += len(written.data)
+            self.stderr.write(f'archived {chats} chats, {messages} messages')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        ratio = f'{raw / stored:.1f}x' if stored else 'n/a'
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {messages} messages from {chats} chats: {raw} bytes stored as {stored} ({ratio}).'
+        ))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from api.dates import parse_due
+from api.models import Reminder, SyncCounter
+from api.signals import bulk_saved
+
+
+class Command(BaseCommand):
+    help = 'Fills Reminder.due_at by parsing due_date, relative to when each reminder was created'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-parse reminders that already have a due_at')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        reminders = Reminder.objects.exclude(due_date='').order_by('id')
+        if not options['all']:
+            reminders = reminders.filter(due_at__isnull=True)
+
+        now = timezone.now()
+        parsed = unparsed = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                batch = list(reminders.filter(id__gt=last_id)[:options['batch_size']])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                changed = []
+                for reminder in batch:
+                    # "Tomorrow" means the day after the reminder was written.
+                    due_at = parse_due(reminder.due_date, now=reminder.created_at)
+                    if due_at is None:
+                        unparsed += 1
+                    elif due_at != reminder.due_at:
+                        reminder.due_at = due_at
+                        if due_at <= now and reminder.fired_at is None:
+                            # Already past when backfilled: do not fire retroactively.
+                            reminder.fired_at = due_at
+                        changed.append(reminder)
+                by_user = {}
+                for reminder in changed:
+                    by_user.setdefault(reminder.user_id, []).append(reminder)
+                for user_id, rows in by_user.items():
+                    version = SyncCounter.reserve(user_id, len(rows))
+                    for i, reminder in enumerate(rows):
+                        reminder.version = version + i
+                Reminder.objects.bulk_update(changed, ['due_at', 'fired_at', 'version'])
+                if changed:
+                    bulk_saved.send(sender=Reminder, instances=changed)
+                parsed += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Set due_at on {parsed} reminders; {unparsed} due dates could not be parsed.'
+        ))
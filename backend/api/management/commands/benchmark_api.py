@@ -0,0 +1,231 @@
+import contextlib
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from api.models import Chat
+
+User = get_user_model()
+
+# (name, method, path, body). {chat} is replaced with one of the user's chats.
+ENDPOINTS = [
+    ('me', 'GET', '/api/auth/me/', None),
+    ('settings', 'GET', '/api/settings/', None),
+    ('chat_list', 'GET', '/api/chats/', None),
+    ('chat_messages', 'GET', '/api/chats/{chat}/messages/', None),
+    ('memory_list', 'GET', '/api/memories/', None),
+    ('memory_search', 'GET', '/api/memories/search/?q=memory+index', None),
+    ('memory_similar', 'GET', '/api/memories/similar/?q=vector+cache+latency', None),
+    ('reminder_list', 'GET', '/api/reminders/', None),
+    ('sync', 'GET', '/api/sync/?since=0&limit=200', None),
+    ('reminder_create', 'POST', '/api/reminders/', {'text': 'benchmark reminder', 'tag': 'bench'}),
+    ('chat_stream', 'POST', '/api/chats/{chat}/stream/', {'content': 'benchmark prompt'}),
+    # Async mirrors; compare against the sync rows above under an ASGI server.
+    ('async_chat_list', 'GET', '/api/async/chats/', None),
+    ('async_chat_messages', 'GET', '/api/async/chats/{chat}/messages/', None),
+    ('async_memory_list', 'GET', '/api/async/memories/', None),
+    ('async_reminder_list', 'GET', '/api/async/reminders/', None),
+    ('async_reminder_create', 'POST', '/api/async/reminders/', {'text': 'benchmark reminder', 'tag': 'bench'}),
+    ('async_chat_stream', 'POST', '/api/async/chats/{chat}/stream/', {'content': 'benchmark prompt'}),
+]
+
+
+def no_response_cache():
+    # In-process GETs would otherwise time the response cache (api.caching)
+    # after the first request per user rather than the views.
+    return override_settings(
+        CACHES={**settings.CACHES, 'benchmark': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        API_CACHE_ALIAS='benchmark',
+    )
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _adrain(response):
+    async for _ in response.streaming_content:
+        pass
+
+
+def drain(response):
+    """Read a streamed body, so the timing covers generating it."""
+    if not response.streaming:
+        return
+    if response.is_async:
+        async_to_sync(_adrain)(response)
+    else:
+        for _ in response.streaming_content:
+            pass
+
+
+def summarize(latencies, errors, elapsed, queries):
+    ms = [x * 1000 for x in latencies]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(ms, 50), 3) if ms else None,
+        'p95_ms': round(percentile(ms, 95), 3) if ms else None,
+        'p99_ms': round(percentile(ms, 99), 3) if ms else None,
+        'mean_ms': round(statistics.fmean(ms), 3) if ms else None,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the REST API and reports latency percentiles, throughput and query counts as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--users', type=int, default=5, help='Number of seeded bench users to spread requests over')
+        parser.add_argument('--url', help='Base URL of a running server (runserver, uvicorn, ...); '
+                                          'omit to drive the Django test client in-process')
+        parser.add_argument('--concurrency', default='8',
+                            help='Concurrent workers in --url mode; a comma-separated list (e.g. 1,16,64) '
+                                 'runs every endpoint at each level to show how it scales')
+        parser.add_argument('--endpoints', help='Comma-separated subset of endpoint names')
+        parser.add_argument('--response-cache', action='store_true',
+                            help='Keep the per-user response cache on in-process (a --url server uses its own)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='Compare against a previous JSON report')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative p95 growth before flagging a regression')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(username__startswith='bench').order_by('id')[:options['users']])
+        if not users:
+            raise CommandError('No bench users found. Run: manage.py seed_data --users 5')
+        sessions = []
+        for user in users:
+            token, _ = Token.objects.get_or_create(user=user)
+            chat = Chat.objects.filter(user=user).order_by('-updated_at').values_list('id', flat=True).first()
+            sessions.append((token.key, chat or 0))
+
+        endpoints = ENDPOINTS
+        if options['endpoints']:
+            wanted = set(options['endpoints'].split(','))
+            endpoints = [e for e in ENDPOINTS if e[0] in wanted]
+
+        try:
+            levels = [int(c) for c in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be an integer or a comma-separated list of integers')
+
+        results = {}
+        for name, method, path, body in endpoints:
+            if not options['url']:
+                # Every endpoint's writes are rolled back, so runs leave the
+                # bench data as they found it (and on_commit work is not timed).
+                cache = contextlib.nullcontext() if options['response_cache'] else no_response_cache()
+                with transaction.atomic(), cache:
+                    results[name] = self.run_in_process(options, sessions, method, path, body)
+                    transaction.set_rollback(True)
+                self.report_line(name, results[name])
+                continue
+            for level in levels:
+                key = name if len(levels) == 1 else f'{name}@{level}'
+                results[key] = self.run_http(options, sessions, method, path, body, level)
+                self.report_line(key, results[key])
+
+        report = {
+            'mode': 'http' if options['url'] else 'in-process',
+            'database': connection.vendor,
+            'response_cache': 'server' if options['url'] else 'on' if options['response_cache'] else 'off',
+            'requests_per_endpoint': options['requests'],
+            'endpoints': results,
+        }
+        if options['baseline']:
+            report['regressions'] = self.compare(options['baseline'], results, options['threshold'])
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        self.stdout.write(output)
+
+        if report.get('regressions'):
+            raise CommandError(f'{len(report["regressions"])} regression(s) against {options["baseline"]}')
+
+    def report_line(self, key, result):
+        self.stderr.write(f'{key:28} p50={result["p50_ms"]}ms p95={result["p95_ms"]}ms '
+                          f'rps={result["throughput_rps"]}')
+
+    def run_in_process(self, options, sessions, method, path, body):
+        clients = [(Client(HTTP_AUTHORIZATION=f'Token {key}'), chat) for key, chat in sessions]
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for i in range(options['requests']):
+            client, chat = clients[i % len(clients)]
+            url = path.format(chat=chat)
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                t0 = time.perf_counter()
+                if method == 'GET':
+                    response = client.get(url)
+                else:
+                    response = client.post(url, body, content_type='application/json')
+                drain(response)
+                latencies.append(time.perf_counter() - t0)
+            queries.append(len(captured))
+            errors += response.status_code >= 400
+        return summarize(latencies, errors, time.perf_counter() - started, queries)
+
+    def run_http(self, options, sessions, method, path, body, concurrency):
+        base = options['url'].rstrip('/')
+        data = json.dumps(body).encode() if body is not None else None
+
+        def one(i):
+            key, chat = sessions[i % len(sessions)]
+            request = urllib.request.Request(
+                base + path.format(chat=chat), data=data, method=method,
+                headers={'Authorization': f'Token {key}', 'Content-Type': 'application/json'},
+            )
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    ok = True
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - t0, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        latencies = [latency for latency, ok in outcomes if ok]
+        return summarize(latencies, sum(not ok for _, ok in outcomes), elapsed, [])
+
+    def compare(self, path, results, threshold):
+        with open(path) as fh:
+            baseline = json.load(fh)['endpoints']
+        regressions = []
+        for name, current in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            if before['p95_ms'] and current['p95_ms'] and current['p95_ms'] > before['p95_ms'] * (1 + threshold):
+                regressions.append({'endpoint': name, 'metric': 'p95_ms',
+                                    'baseline': before['p95_ms'], 'current': current['p95_ms']})
+            if (before.get('queries_per_request') is not None and current['queries_per_request'] is not None
+                    and current['queries_per_request'] > before['queries_per_request']):
+                regressions.append({'endpoint': name, 'metric': 'queries_per_request',
+                                    'baseline': before['queries_per_request'],
+                                    'current': current['queries_per_request']})
+        return regressions
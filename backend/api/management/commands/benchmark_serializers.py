@@ -0,0 +1,90 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from api.models import Chat, ChatMessage, Memory, Reminder
+from api.serializers import (
+    ChatSerializer, ChatMessageSerializer, MemorySerializer, ReminderSerializer, row_encoder,
+)
+
+LISTS = {
+    'chats': (Chat, ChatSerializer),
+    'messages': (ChatMessage, ChatMessageSerializer),
+    'memories': (Memory, MemorySerializer),
+    'reminders': (Reminder, ReminderSerializer),
+}
+
+
+def best_of(repeat, func):
+    """Run ``func`` ``repeat`` times; return its last result and the fastest time in ms."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, round(min(timings), 3)
+
+
+class Command(BaseCommand):
+    help = ('Compares ModelSerializer + JSONRenderer against the .values() row encoders and the configured '
+            'JSON renderer on large lists, and checks both produce identical bytes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows per list (seed_data can create them)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per stage; the fastest is reported')
+        parser.add_argument('--lists', help=f'Comma-separated subset of {", ".join(LISTS)}')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        names = options['lists'].split(',') if options['lists'] else list(LISTS)
+        unknown = set(names) - set(LISTS)
+        if unknown:
+            raise CommandError(f'Unknown lists: {", ".join(sorted(unknown))}')
+
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        results = {}
+        for name in names:
+            model, serializer_class = LISTS[name]
+            results[name] = self.run(model, serializer_class, renderer, options)
+            result = results[name]
+            self.stderr.write(f'{name:10} rows={result["rows"]} serializer={result["serializer"]["total_ms"]}ms '
+                              f'fast={result["fast"]["total_ms"]}ms speedup={result["speedup"]}x '
+                              f'identical={result["identical"]}')
+
+        report = {'rows': options['rows'], 'renderer': type(renderer).__name__, 'lists': results}
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        self.stdout.write(output)
+
+        mismatched = [name for name, result in results.items() if not result['identical']]
+        if mismatched:
+            raise CommandError(f'Fast path output differs for: {", ".join(mismatched)}')
+
+    def run(self, model, serializer_class, renderer, options):
+        repeat, limit = options['repeat'], options['rows']
+        queryset = model.objects.order_by('id')
+        columns, encode = row_encoder(serializer_class)
+
+        instances, load = best_of(repeat, lambda: list(queryset[:limit]))
+        data, serialize = best_of(repeat, lambda: serializer_class(instances, many=True).data)
+        body, render = best_of(repeat, lambda: JSONRenderer().render({'results': data}))
+
+        rows, fast_load = best_of(repeat, lambda: list(queryset.values(*columns)[:limit]))
+        fast_data, encode_ms = best_of(repeat, lambda: encode(rows))
+        fast_body, fast_render = best_of(repeat, lambda: renderer.render({'results': fast_data}))
+
+        total = load + serialize + render
+        fast_total = fast_load + encode_ms + fast_render
+        return {
+            'rows': len(rows),
+            'serializer': {'load_ms': load, 'serialize_ms': serialize, 'render_ms': render,
+                           'total_ms': round(total, 3)},
+            'fast': {'load_ms': fast_load, 'serialize_ms': encode_ms, 'render_ms': fast_render,
+                     'total_ms': round(fast_total, 3)},
+            'speedup': round(total / fast_total, 2) if fast_total else None,
+            'identical': body == fast_body,
+        }
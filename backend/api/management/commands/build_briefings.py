@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+
+def _setup():
+    # Runs in each spawned process: set Django up before touching models.
+    import django
+    django.setup()
+
+
+def _build_chunk(args):
+    from api.briefings import build_briefings
+
+    user_ids, day = args
+    try:
+        return build_briefings(user_ids, day)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Brings every user\'s daily briefing (api.briefings) up to date, reading only what changed '
+            'since their last one; users are spread over a process pool')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Day to brief, YYYY-MM-DD (default: today)')
+        parser.add_argument('--user', type=int, action='append', help='Only this user id (repeatable)')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (default: one per CPU core)')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Users handed to a worker at a time')
+
+    def handle(self, *args, **options):
+        from api.briefings import build_briefings, pending_users
+
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        day = options['date'] or timezone.localdate()
+        started = time.perf_counter()
+        # Named users are checked even without a change to pick up.
+        user_ids = sorted(set(options['user'])) if options['user'] else pending_users(day)
+        size = options['chunk_size']
+        chunks = [(user_ids[i:i + size], day) for i in range(0, len(user_ids), size)]
+        self.stderr.write(f'{len(user_ids)} users to brief for {day}.')
+
+        users = written = 0
+        processes = min(options['processes'], len(chunks))
+        if processes <= 1:
+            results = (build_briefings(*chunk) for chunk in chunks)
+            pool = None
+        else:
+            # Spawned (not forked) children never share the parent's DB connections.
+            pool = multiprocessing.get_context('spawn').Pool(processes, initializer=_setup)
+            results = pool.imap_unordered(_build_chunk, chunks)
+        try:
+            for done, changed in results:
+                users += done
+                written += changed
+                self.stderr.write(f'briefed {users}/{len(user_ids)} users, {written} briefings written')
+        except BaseException:
+            if pool is not None:
+                pool.terminate()
+            raise
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Briefed {users} users for {day} in {time.perf_counter() - started:.1f}s: {written} briefings written.'
+        ))
@@ -0,0 +1,81 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import ImproperlyConfigured
+from api import schema_sql
+
+
+class Command(BaseCommand):
+    help = ('Renders every migration, in dependency order, into one SQL script per database vendor without '
+            'connecting to a database (api.schema_sql); files are only rewritten when their SQL changed')
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', default='postgresql',
+                            help=f'Comma-separated vendors to render: {", ".join(schema_sql.VENDORS)}')
+        parser.add_argument('--output', default='schema.{vendor}.sql',
+                            help='File to write; "{vendor}" is replaced by the vendor name, "-" writes to stdout')
+        parser.add_argument('--postgres-version', type=int,
+                            help='PostgreSQL major version to render for (default: SCHEMA_SQL_POSTGRES_VERSION)')
+        parser.add_argument('--cache-dir', help='Per-migration SQL cache (default: SCHEMA_SQL_CACHE_DIR)')
+        parser.add_argument('--no-cache', action='store_true', help='Render every migration again')
+        parser.add_argument('--check', action='store_true',
+                            help='Write nothing; fail if an output file is missing or out of date')
+        parser.add_argument('--strict', action='store_true',
+                            help='Fail on migrations that run Python instead of marking them in the script')
+
+    def handle(self, *args, **options):
+        profile = getattr(settings, 'APP_PROFILE', 'web')
+        if profile != 'web':
+            raise CommandError(f'Run export_schema_sql with APP_PROFILE=web: the {profile} profile leaves out apps '
+                               'whose migrations belong in the schema.')
+        vendors = options['vendor'].split(',')
+        unknown = set(vendors) - set(schema_sql.VENDORS)
+        if unknown:
+            raise CommandError(f'Unknown vendors: {", ".join(sorted(unknown))}')
+        output = options['output']
+        if len(vendors) > 1 and '{vendor}' not in output:
+            raise CommandError('--output must contain "{vendor}" when rendering several vendors.')
+
+        cache_dir = None if options['no_cache'] else options['cache_dir'] or settings.SCHEMA_SQL_CACHE_DIR
+        stale = []
+        for vendor in vendors:
+            cache = schema_sql.SQLCache(cache_dir)
+            started = time.perf_counter()
+            try:
+                text = schema_sql.render(vendor, cache, postgres_version=options['postgres_version'],
+                                        strict=options['strict'])
+            except ImproperlyConfigured as exc:
+                raise CommandError(f'Cannot load the {vendor} backend: {exc}') from exc
+            except schema_sql.LiveDatabaseRequired as exc:
+                raise CommandError(str(exc)) from exc
+            elapsed = (time.perf_counter() - started) * 1000
+
+            path = output.replace('{vendor}', vendor)
+            if path == '-':
+                sys.stdout.write(text)
+                status = 'written to stdout'
+            else:
+                try:
+                    with open(path, encoding='utf-8') as fh:
+                        current = fh.read()
+                except FileNotFoundError:
+                    current = None
+                if current == text:
+                    status = 'unchanged'
+                elif options['check']:
+                    stale.append(path)
+                    status = 'out of date'
+                else:
+                    schema_sql.write_atomic(path, text)
+                    status = 'written'
+            self.stderr.write(f'{vendor}: {cache.hits + cache.misses} migrations ({cache.hits} cached) '
+                              f'in {elapsed:.0f}ms, {path} {status}')
+
+        if stale:
+            raise CommandError(f'Out of date: {", ".join(stale)} (run export_schema_sql without --check).')
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(f'Schema SQL up to date for {", ".join(vendors)}.'))
@@ -0,0 +1,92 @@
+import gzip
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from api.workspace import CHUNK_SIZE, END, counts, dumps, export_records, header, position
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Exports a user's chats, messages, memories and reminders as NDJSON, "
+            "checkpointing so an interrupted export can be resumed")
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='User id or email')
+        parser.add_argument('--output', default='-', help='File to write (gzipped if it ends in .gz); - for stdout')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output whatever its name')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Rows fetched per query and written between checkpoints')
+        parser.add_argument('--resume', action='store_true', help='Continue an interrupted export to --output')
+
+    def handle(self, *args, **options):
+        ident = options['user']
+        user = User.objects.filter(Q(email=ident) | Q(pk=int(ident) if ident.isdigit() else None)).first()
+        if user is None:
+            raise CommandError(f'No user {ident!r}.')
+
+        path = options['output']
+        if path == '-':
+            if options['gzip'] or options['resume']:
+                raise CommandError('--gzip and --resume need an --output file.')
+            self.stdout.ending = ''
+            self.stdout.write(header(user))
+            for record in export_records(user, chunk_size=options['chunk_size']):
+                self.stdout.write(dumps(record))
+            self.stdout.write(END)
+            return
+
+        self.export(user, path, options['gzip'] or path.endswith('.gz'), options)
+
+    def export(self, user, path, compress, options):
+        # The checkpoint file holds the byte offset of the last complete
+        # checkpoint and the position of the last row before it; gzip output
+        # ends a gzip member at each checkpoint, so the file can be cut there.
+        progress_path = path + '.progress'
+        checkpoint = None
+        if options['resume']:
+            try:
+                with open(progress_path) as fh:
+                    checkpoint = json.load(fh)
+            except FileNotFoundError:
+                raise CommandError(f'No interrupted export to resume ({progress_path} not found).')
+
+        total = sum(counts(user).values())
+        written = checkpoint['written'] if checkpoint else 0
+        after = checkpoint['after'] if checkpoint else None
+        with open(path, 'r+b' if checkpoint else 'wb') as raw:
+            if checkpoint:
+                raw.truncate(checkpoint['offset'])
+                raw.seek(checkpoint['offset'])
+                self.stderr.write(f'Resuming after {after} ({written}/{total} rows).')
+            out = gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw
+            if not after:
+                out.write(header(user).encode())
+            for record in export_records(user, after, options['chunk_size']):
+                out.write(dumps(record).encode())
+                written += 1
+                if written % options['chunk_size'] == 0:
+                    out = self.checkpoint(raw, out, progress_path, position(record), written)
+                    self.stderr.write(f'  {written}/{total} rows ({written * 100 / max(total, 1):.1f}%)')
+            out.write(END.encode())
+            if out is not raw:
+                out.close()
+
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        self.stderr.write(self.style.SUCCESS(f'Exported {written} rows to {path}.'))
+
+    def checkpoint(self, raw, out, progress_path, after, written):
+        compress = out is not raw
+        if compress:
+            out.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+        tmp = progress_path + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump({'offset': raw.tell(), 'after': after, 'written': written}, fh)
+        os.replace(tmp, progress_path)
+        return gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw
@@ -0,0 +1,108 @@
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from backend.profiles import PROFILES
+
+SETUP = 'import django; django.setup()'
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``python -X importtime`` output (``import time: self | cumulative | name``,
+    nesting shown by indentation) into ``[{name, self_us, cumulative_us, depth}]``.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        if not self_us.strip().isdigit():
+            continue  # The header line.
+        name = name[1:]
+        modules.append({
+            'name': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+        })
+    return modules
+
+
+class Command(BaseCommand):
+    help = ('Measures startup under each settings profile (backend.profiles) with python -X importtime: '
+            'total import time, wall time, the slowest modules and the time per top-level package')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', default=','.join(PROFILES),
+                            help=f'Comma-separated profiles to measure (default: {",".join(PROFILES)})')
+        parser.add_argument('--command', help='manage.py command line to time, e.g. "archive_chats --dry-run" '
+                                              '(default: only django.setup())')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per profile; the fastest is reported')
+        parser.add_argument('--top', type=int, default=15, help='Modules and packages listed per profile')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        profiles = options['profile'].split(',')
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f'Unknown profiles: {", ".join(sorted(unknown))}')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+
+        if options['command']:
+            argv = [str(settings.BASE_DIR / 'manage.py'), *shlex.split(options['command'])]
+        else:
+            argv = ['-c', SETUP]
+
+        results = {}
+        for profile in profiles:
+            results[profile] = result = self.run(profile, argv, options)
+            slowest = ', '.join(f'{m["name"]} {m["cumulative_ms"]}ms' for m in result['modules'][:3])
+            self.stderr.write(f'{profile:7} wall={result["wall_ms"]}ms imports={result["import_ms"]}ms '
+                              f'modules={result["module_count"]} slowest: {slowest}')
+
+        report = {'command': options['command'] or SETUP, 'repeat': options['repeat'], 'profiles': results}
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        self.stdout.write(output)
+
+    def run(self, profile, argv, options):
+        env = {**os.environ, 'APP_PROFILE': profile, 'DJANGO_SETTINGS_MODULE': PROFILES[profile]}
+        best = None
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            proc = subprocess.run([sys.executable, '-X', 'importtime', *argv], cwd=settings.BASE_DIR, env=env,
+                                  capture_output=True, text=True)
+            wall = (time.perf_counter() - started) * 1000
+            if proc.returncode:
+                lines = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+                raise CommandError(f'{profile} run failed ({proc.returncode}):\n' + '\n'.join(lines[-20:]))
+            if best is None or wall < best[0]:
+                best = (wall, proc.stderr)
+
+        wall, stderr = best
+        modules = parse_importtime(stderr)
+        packages = defaultdict(int)
+        for module in modules:
+            packages[module['name'].split('.')[0]] += module['self_us']
+        top = options['top']
+        slowest = sorted(modules, key=lambda m: m['cumulative_us'], reverse=True)[:top]
+        return {
+            'wall_ms': round(wall, 1),
+            # Each module is imported once, so self times add up to the whole.
+            'import_ms': round(sum(m['self_us'] for m in modules) / 1000, 1),
+            'module_count': len(modules),
+            'modules': [{'name': m['name'], 'cumulative_ms': round(m['cumulative_us'] / 1000, 1),
+                         'self_ms': round(m['self_us'] / 1000, 1), 'depth': m['depth']} for m in slowest],
+            'packages': {name: round(us / 1000, 1)
+                         for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]},
+        }
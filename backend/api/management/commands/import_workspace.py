@@ -0,0 +1,55 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from api.models import WorkspaceImport
+from api.workspace import BATCH_SIZE, WorkspaceError, import_lines, read_lines
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports an NDJSON workspace export (gzipped or not) into a user\'s account, resumably'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='User id or email to import into')
+        parser.add_argument('path', help='Export file written by export_workspace')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows written per transaction')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue the last unfinished import of this file for this user')
+
+    def handle(self, *args, **options):
+        ident = options['user']
+        user = User.objects.filter(Q(email=ident) | Q(pk=int(ident) if ident.isdigit() else None)).first()
+        if user is None:
+            raise CommandError(f'No user {ident!r}.')
+
+        path = os.path.abspath(options['path'])
+        transfer = None
+        if options['resume']:
+            transfer = (WorkspaceImport.objects.filter(user=user, source=path)
+                        .exclude(status=WorkspaceImport.DONE).order_by('-id').first())
+            if transfer is None:
+                raise CommandError(f'No unfinished import of {path} to resume.')
+            transfer.status = WorkspaceImport.RUNNING
+            self.stderr.write(f'Resuming import {transfer.id} after line {transfer.lines}.')
+        else:
+            transfer = WorkspaceImport.objects.create(user=user, source=path)
+
+        with open(path, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+
+            def progress(t):
+                self.stderr.write(f'  line {t.lines}, {fh.tell() * 100 / max(size, 1):.1f}% read, '
+                                  + ', '.join(f'{kind} {n}' for kind, n in t.counts.items()))
+
+            try:
+                import_lines(user, read_lines(fh), transfer, options['batch_size'], progress)
+            except WorkspaceError as exc:
+                raise CommandError(f'Import {transfer.id} stopped at line {transfer.lines}: {exc} '
+                                   f'Fix the input if needed and rerun with --resume.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {sum(transfer.counts.values())} rows into {user} (import {transfer.id}).'
+        ))
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.core.management.commands.migrate import Command as MigrateCommand
+
+
+class Command(MigrateCommand):
+    """``migrate``, refusing to run under a lean profile that leaves out apps with tables."""
+
+    def handle(self, *args, **options):
+        profile = getattr(settings, 'APP_PROFILE', 'web')
+        if profile != 'web':
+            raise CommandError(f'Run migrate with APP_PROFILE=web: the {profile} profile leaves out apps '
+                               'whose migrations it would skip.')
+        return super().handle(*args, **options)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from api.dashboard import refresh_stats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the cached dashboard widgets from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild this user id')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(id=options['user'])
+
+        total = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            refresh_stats(user_id)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt dashboard stats for {total} users.'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from api.models import Memory
+from api.vectors import index_memories, indexed_users, user_index
+
+
+class Command(BaseCommand):
+    help = 'Re-embeds Memory rows into the per-user vector indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild this user id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        memories = Memory.objects.order_by('user_id', 'id')
+        if options['user']:
+            memories = memories.filter(user_id=options['user'])
+
+        rows = memories.select_related('body').only(
+            'id', 'user_id', 'title', 'type', 'preview', 'truncated', 'body__data', 'body__compressed',
+        )
+        live, batch, total = {}, [], 0
+        for memory in rows.iterator(chunk_size=options['batch_size']):
+            live.setdefault(memory.user_id, []).append(memory.pk)
+            batch.append(memory)
+            if len(batch) >= options['batch_size']:
+                index_memories(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            index_memories(batch)
+            total += len(batch)
+
+        # Drop the ids of deleted memories too, including users left with none.
+        user_ids = {options['user']} if options['user'] else set(live) | set(indexed_users())
+        for user_id in user_ids:
+            user_index(user_id).compact(live.get(user_id, ()))
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} memories in {len(user_ids)} indexes.'))
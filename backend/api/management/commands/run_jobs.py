@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import signal
+import socket
+
+from django.core.management.base import BaseCommand
+
+
+def _worker(worker_id, options):
+    # Runs in a spawned process: set Django up before touching models.
+    import django
+    django.setup()
+    from api.jobs import run_worker
+
+    stopping = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.append(True))
+    run_worker(worker_id, kinds=options['kinds'], once=options['once'], poll=options['poll'],
+               batch=options['batch'], should_stop=lambda: bool(stopping))
+
+
+class Command(BaseCommand):
+    help = 'Runs background job workers (api.jobs), one process per core by default'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes to start (default: one per CPU core)')
+        parser.add_argument('--kinds', help='Comma-separated job kinds to run (default: all)')
+        parser.add_argument('--batch', type=int, default=1, help='Jobs claimed per round trip')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due')
+
+    def handle(self, *args, **options):
+        options['kinds'] = options['kinds'].split(',') if options['kinds'] else None
+        worker_options = {k: options[k] for k in ('kinds', 'once', 'poll', 'batch')}
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+        if options['processes'] <= 1:
+            self.stdout.write(f'Worker {prefix} started.')
+            from api.jobs import run_worker
+
+            stopping = []
+            signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+            try:
+                run_worker(prefix, should_stop=lambda: bool(stopping), **worker_options)
+            except KeyboardInterrupt:
+                pass
+            return
+
+        # Spawned (not forked) children never share the parent's DB connections.
+        ctx = multiprocessing.get_context('spawn')
+        workers = [
+            ctx.Process(target=_worker, args=(f'{prefix}/{n}', worker_options), name=f'run_jobs-{n}')
+            for n in range(options['processes'])
+        ]
+        for process in workers:
+            process.start()
+        self.stdout.write(f'Started {len(workers)} workers ({prefix}).')
+
+        def forward(sig, frame):
+            for process in workers:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, forward)
+        try:
+            for process in workers:
+                process.join()
+        except KeyboardInterrupt:
+            forward(signal.SIGINT, None)
+            for process in workers:
+                process.join()
+        self.stdout.write('Workers stopped.')
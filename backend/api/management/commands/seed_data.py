@@ -1,13 +1,39 @@
+import random
+
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from api.models import Chat, ChatMessage, Memory, Reminder
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from api.dates import parse_due
+from api.models import Chat, ChatMessage, Memory, Reminder, SyncCounter
+from api.signals import bulk_saved
 
 User = get_user_model()
 
+WORDS = (
+    'agent model memory vector token latency index query cache stream chat note article '
+    'project design review budget travel meeting research draft summary context prompt '
+    'deploy schema backup insight task idea reading coffee groceries workout call'
+).split()
+
+
 class Command(BaseCommand):
     help = 'Seeds the database with test users and dummy data'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0,
+                            help='Create this many synthetic bench users instead of the demo accounts')
+        parser.add_argument('--chats', type=int, default=5, help='Chats per synthetic user')
+        parser.add_argument('--messages', type=int, default=20, help='Messages per chat')
+        parser.add_argument('--memories', type=int, default=50, help='Memories per synthetic user')
+        parser.add_argument('--reminders', type=int, default=20, help='Reminders per synthetic user')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
     def handle(self, *args, **options):
+        if options['users']:
+            return self.seed_at_scale(options)
+
         self.stdout.write('Seeding data...')
 
         # 1. Create a Superuser
@@ -54,8 +80,10 @@ class Command(BaseCommand):
 
                 # 3. Add Some Dummy Data for each user
                 # Reminders
-                Reminder.objects.create(user=user, text='Review project documentation', tag='work', due_date='Tomorrow')
-                Reminder.objects.create(user=user, text='Buy groceries', tag='personal', due_date='Today, 6pm')
+                Reminder.objects.create(user=user, text='Review project documentation', tag='work', due_date='Tomorrow',
+                                        due_at=parse_due('Tomorrow'))
+                Reminder.objects.create(user=user, text='Buy groceries', tag='personal', due_date='Today, 6pm',
+                                        due_at=parse_due('Today, 6pm'))
                 
                 # Memories
                 Memory.objects.create(
@@ -72,3 +100,62 @@ class Command(BaseCommand):
                 ChatMessage.objects.create(chat=chat, role='user', content='I want to build a unified orchestrator.')
 
         self.stdout.write(self.style.SUCCESS('Data seeding complete!'))
+
+    def seed_at_scale(self, options):
+        """Bulk-insert synthetic users (bench<N>@example.com / password) and their data."""
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        def text(n):
+            return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+        start = User.objects.filter(username__startswith='bench').count()
+        password = make_password('password')
+        users = User.objects.bulk_create([
+            User(username=f'bench{i}@example.com', email=f'bench{i}@example.com', password=password,
+                 first_name=f'Bench {i}')
+            for i in range(start, start + options['users'])
+        ], batch_size=batch_size)
+        self.stdout.write(f'Created {len(users)} users')
+
+        for n, user in enumerate(users, 1):
+            with transaction.atomic():
+                per_user = options['chats'] + options['memories'] + options['reminders']
+                version = SyncCounter.reserve(user.pk, per_user) if per_user else 0
+
+                def stamp(rows):
+                    nonlocal version
+                    for row in rows:
+                        row.version = version
+                        version += 1
+                    return rows
+
+                chats = Chat.objects.bulk_create(stamp([
+                    Chat(user=user, title=text(4), last_message=text(12))
+                    for _ in range(options['chats'])
+                ]), batch_size=batch_size)
+                ChatMessage.objects.bulk_create([
+                    ChatMessage(chat=chat, role='user' if i % 2 == 0 else 'ai', content=text(rng.randint(5, 60)))
+                    for chat in chats for i in range(options['messages'])
+                ], batch_size=batch_size)
+                memories = stamp([
+                    Memory(user=user, title=text(5), snippet=text(rng.randint(20, 200)),
+                           type=rng.choice(['Note', 'Article', 'Snippet']),
+                           category=rng.choice(Memory.CATEGORY_CHOICES)[0])
+                    for _ in range(options['memories'])
+                ])
+                Memory.prepare_bulk_write(memories)
+                memories = Memory.objects.bulk_create(memories, batch_size=batch_size)
+                due_dates = ['', 'Today', 'Tomorrow', 'Today, 6pm', 'next friday', 'in 3 days']
+                reminders = Reminder.objects.bulk_create(stamp([
+                    Reminder(user=user, text=text(6), completed=rng.random() < 0.3,
+                             due_date=due, due_at=parse_due(due), tag=rng.choice(WORDS))
+                    for due in (rng.choice(due_dates) for _ in range(options['reminders']))
+                ]), batch_size=batch_size)
+                bulk_saved.send(sender=Chat, instances=chats, created=chats)
+                bulk_saved.send(sender=Memory, instances=memories, created=memories)
+                bulk_saved.send(sender=Reminder, instances=reminders, created=reminders)
+            if n % 10 == 0 or n == len(users):
+                self.stdout.write(f'  seeded {n}/{len(users)} users')
+
+        self.stdout.write(self.style.SUCCESS('Data seeding complete!'))
@@ -0,0 +1,141 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters and histograms are keyed by label values, each behind its own lock.
+The registry lives in the worker process, so with several workers each one
+must be scraped (or run a single worker when profiling an endpoint).
+"""
+
+import bisect
+import threading
+
+# Seconds; mirrors the Prometheus client defaults.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+INF_BUCKET = 'le="+Inf"'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self):
+        """Snapshot of ``{label values: count}``."""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield f'{self.name}{_labels(self.label_names, labels)} {_number(value)}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def samples(self):
+        with self._lock:
+            snapshot = {labels: (list(b), count, total) for labels, (b, count, total) in self._series.items()}
+        for labels, (buckets, count, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, hits in zip(self.buckets, buckets):
+                cumulative += hits
+                le = f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.label_names, labels, [le])} {cumulative}'
+            yield f'{self.name}_bucket{_labels(self.label_names, labels, [INF_BUCKET])} {count}'
+            yield f'{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.label_names, labels)} {count}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.counter(
+    'api_requests_total', 'HTTP requests handled.', ['view', 'method', 'status'])
+request_duration = registry.histogram(
+    'api_request_duration_seconds', 'Time spent handling a request.', ['view', 'method'])
+db_queries = registry.histogram(
+    'api_db_queries_per_request', 'Database queries issued per request.', ['view'], QUERY_COUNT_BUCKETS)
+db_duration = registry.histogram(
+    'api_db_duration_seconds', 'Time spent in database queries per request.', ['view'])
+render_duration = registry.histogram(
+    'api_render_duration_seconds', 'Time spent rendering (serialising) the response body.', ['view'])
+slow_profiles_total = registry.counter(
+    'api_slow_profiles_total', 'Profiles written for requests over the slow threshold.', ['view'])
+provider_cache_requests = registry.counter(
+    'api_provider_cache_requests_total', 'Provider calls by cache outcome (hit, miss, coalesced).',
+    ['provider', 'result'])
+provider_cache_saved = registry.counter(
+    'api_provider_cache_saved_seconds_total', 'Upstream latency avoided by cache hits and coalescing.',
+    ['provider'])
+auth_cache_requests = registry.counter(
+    'api_auth_cache_requests_total', 'Credential lookups by kind (token, session) and cache outcome; '
+    'each hit is a query saved.', ['kind', 'result'])
@@ -0,0 +1,146 @@
+"""
+Request instrumentation.
+
+``InstrumentationMiddleware`` times every request, counts and times its SQL
+through ``connection.execute_wrapper`` and times response rendering (where
+DRF serialises ``response.data``). Results go to the metrics registry
+(``/metrics``) and to a ``Server-Timing`` header visible in browser devtools.
+
+With ``PROFILE_SLOW_MS`` set, a ``PROFILE_SAMPLE_RATE`` share of requests
+runs under cProfile; profiles of requests slower than the threshold are
+written to ``PROFILE_DIR`` for ``python -m pstats``, snakeviz or flameprof.
+Requests served through the async chain are never profiled: cProfile would
+attribute every coroutine interleaved on the event loop to them.
+"""
+
+import contextlib
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+# cProfile cannot profile two requests at once; extra samples are skipped.
+_profiler_lock = threading.Lock()
+_UNSAFE_CHARS = re.compile(r'[^\w.-]+')
+
+
+class _RequestTiming:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = request._timing = _RequestTiming()
+        profiler = self._start_profiler()
+        started = time.perf_counter()
+        try:
+            with self._capture_queries(timing):
+                response = self.get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+                _profiler_lock.release()
+        elapsed = time.perf_counter() - started
+        if profiler and elapsed * 1000 >= settings.PROFILE_SLOW_MS:
+            self._dump(profiler, _view_name(request), elapsed)
+        return self._record(request, response, timing, elapsed)
+
+    async def __acall__(self, request):
+        timing = request._timing = _RequestTiming()
+        started = time.perf_counter()
+        # Connections are thread-local: hook the ones of the thread that
+        # serves this request's async ORM calls.
+        capture = await sync_to_async(self._capture_queries)(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(capture.close)()
+        return self._record(request, response, timing, time.perf_counter() - started)
+
+    @staticmethod
+    def _capture_queries(timing):
+        stack = contextlib.ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(timing.record_query))
+        return stack
+
+    def _record(self, request, response, timing, elapsed):
+        view = _view_name(request)
+        metrics.requests_total.inc(view, request.method, str(response.status_code))
+        metrics.request_duration.observe(elapsed, view, request.method)
+        metrics.db_queries.observe(timing.queries, view)
+        metrics.db_duration.observe(timing.db, view)
+        metrics.render_duration.observe(timing.render, view)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db * 1000:.1f};desc="{timing.queries} queries"',
+            f'render;dur={timing.render * 1000:.1f}',
+            f'total;dur={elapsed * 1000:.1f}',
+        ])
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns.
+        timing = getattr(request, '_timing', None)
+        if timing is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timing.render += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def _start_profiler(self):
+        if not getattr(settings, 'PROFILE_SLOW_MS', 0):
+            return None
+        if random.random() >= getattr(settings, 'PROFILE_SAMPLE_RATE', 0.1):
+            return None
+        if not _profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _dump(self, profiler, view, elapsed):
+        directory = getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+        os.makedirs(directory, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{_UNSAFE_CHARS.sub("_", view)}-{elapsed * 1000:.0f}ms.prof'
+        profiler.dump_stats(os.path.join(directory, name))
+        metrics.slow_profiles_total.inc(view)
@@ -0,0 +1,84 @@
+from django.db import migrations
+
+# The index as this migration installs it; api.search.INDEX_DDL is the current one.
+FTS_TABLE = 'api_memory_fts'
+
+INDEX_SQL = {
+    'postgresql': [
+        """
+        ALTER TABLE api_memory ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(type, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(snippet, '')), 'C')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS api_memory_search_vector_gin ON api_memory USING GIN (search_vector)",
+    ],
+    'sqlite': [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            title, snippet, type, content='api_memory', content_rowid='id'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, snippet, type)
+            VALUES (new.id, new.title, new.snippet, new.type);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, snippet, type)
+            VALUES ('delete', old.id, old.title, old.snippet, old.type);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, snippet, type)
+            VALUES ('delete', old.id, old.title, old.snippet, old.type);
+            INSERT INTO {FTS_TABLE}(rowid, title, snippet, type)
+            VALUES (new.id, new.title, new.snippet, new.type);
+        END
+        """,
+        # Index the rows written before this migration.
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ],
+}
+
+DROP_SQL = {
+    'postgresql': [
+        "DROP INDEX IF EXISTS api_memory_search_vector_gin",
+        "ALTER TABLE api_memory DROP COLUMN IF EXISTS search_vector",
+    ],
+    'sqlite': [
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+        f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    ],
+}
+
+
+def run(schema_editor, sqls):
+    for sql in sqls.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    run(schema_editor, INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    run(schema_editor, DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
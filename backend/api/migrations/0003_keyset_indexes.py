@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_memory_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='chat_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['chat', 'created_at', 'id'], name='chatmessage_chat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memory',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='memory_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='reminder_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-18 20:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_sync_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_reminders', models.IntegerField(default=0)),
+                ('memories', models.IntegerField(default=0)),
+                ('due_today', models.JSONField(blank=True, default=list)),
+                ('recent_chats', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Dashboard stats',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminder',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='fired_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['user', 'completed', 'due_at'], name='reminder_user_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('completed', False), ('due_at__isnull', False), ('fired_at__isnull', True)), fields=['due_at'], name='reminder_pending_due_idx'),
+        ),
+    ]
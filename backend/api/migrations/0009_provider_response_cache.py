@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-18 21:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_chat_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderResponse',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('provider', models.CharField(max_length=50)),
+                ('model', models.CharField(max_length=100)),
+                ('response', models.TextField()),
+                ('latency_ms', models.IntegerField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='providerresponse_lru_idx'), models.Index(fields=['expires_at'], name='providerresponse_expiry_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-18 22:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_provider_response_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkspaceImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(blank=True, default='', max_length=500)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('lines', models.BigIntegerField(default=0)),
+                ('counts', models.JSONField(blank=True, default=dict)),
+                ('source_chat_id', models.BigIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.chat')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workspace_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_chat_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BriefingState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='briefing_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('through_version', models.BigIntegerField(default=0)),
+                ('day', models.DateField(blank=True, null=True)),
+                ('items', models.JSONField(blank=True, default=dict)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+                ('memory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.memory')),
+            ],
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:55
+
+import hashlib
+import zlib
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Length
+
+BATCH_SIZE = 500
+
+
+# The blob format as of this migration; api.blobs is the current one.
+def sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def encode(text):
+    raw = text.encode()
+    if len(raw) > getattr(settings, 'MEMORY_BLOB_COMPRESS_OVER', 512):
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return packed, True, len(raw)
+    return raw, False, len(raw)
+
+
+def decode(data, compressed):
+    data = bytes(data)
+    return (zlib.decompress(data) if compressed else data).decode()
+
+
+def move_bodies(apps, schema_editor):
+    """Keep each long text's preview in the row and the whole text in a blob."""
+    Memory = apps.get_model('api', 'Memory')
+    MemoryBlob = apps.get_model('api', 'MemoryBlob')
+    limit = getattr(settings, 'MEMORY_PREVIEW_CHARS', 280)
+    long = Memory.objects.annotate(chars=Length('preview')).filter(chars__gt=limit)
+    last = 0
+    while True:
+        batch = list(long.filter(id__gt=last).order_by('id').only('id', 'preview')[:BATCH_SIZE])
+        if not batch:
+            break
+        last = batch[-1].id
+        texts, counts = {}, Counter()
+        for memory in batch:
+            digest = sha256(memory.preview)
+            texts[digest] = memory.preview
+            counts[digest] += 1
+            memory.preview, memory.truncated = memory.preview[:limit], True
+            memory.body_id = digest
+        known = set(MemoryBlob.objects.filter(hash__in=counts).values_list('hash', flat=True))
+        for digest in known:
+            MemoryBlob.objects.filter(hash=digest).update(refs=F('refs') + counts[digest])
+        new = []
+        for digest in counts.keys() - known:
+            data, compressed, size = encode(texts[digest])
+            new.append(MemoryBlob(hash=digest, data=data, compressed=compressed, size=size, refs=counts[digest]))
+        MemoryBlob.objects.bulk_create(new)
+        Memory.objects.bulk_update(batch, ['preview', 'truncated', 'body'])
+
+
+def restore_bodies(apps, schema_editor):
+    Memory = apps.get_model('api', 'Memory')
+    truncated = Memory.objects.filter(truncated=True).select_related('body')
+    last = 0
+    while True:
+        batch = list(truncated.filter(id__gt=last).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            break
+        last = batch[-1].id
+        for memory in batch:
+            memory.preview = decode(memory.body.data, memory.body.compressed)
+            memory.truncated = False
+            memory.body = None
+        Memory.objects.bulk_update(batch, ['preview', 'truncated', 'body'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_briefing_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoryBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('compressed', models.BooleanField(default=False)),
+                ('size', models.IntegerField()),
+                ('refs', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        # Same column: the search index (api.search) keeps reading "snippet".
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(model_name='memory', old_name='snippet', new_name='preview'),
+                migrations.AlterField(
+                    model_name='memory',
+                    name='preview',
+                    field=models.TextField(blank=True, db_column='snippet', default=''),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='truncated',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='body',
+            field=models.ForeignKey(blank=True, db_column='body_hash', editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.memoryblob'),
+        ),
+        migrations.RunPython(move_bodies, restore_bodies),
+    ]
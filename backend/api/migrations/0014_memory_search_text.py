@@ -0,0 +1,98 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:58
+
+import zlib
+from importlib import import_module
+
+from django.db import migrations, models
+
+from api.operations import RunVendorSQL
+
+BATCH_SIZE = 500
+FTS_TABLE = 'api_memory_fts'
+
+# The first search index only read the preview left in the "snippet" column.
+initial = import_module('api.migrations.0002_memory_search_index')
+
+INDEX_SQL = {
+    'postgresql': [
+        """
+        ALTER TABLE api_memory ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(type, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(search_text, snippet, '')), 'C')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS api_memory_search_vector_gin ON api_memory USING GIN (search_vector)",
+    ],
+    'sqlite': [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            title, text, type, content=''
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, text, type)
+            VALUES (new.id, new.title, coalesce(new.search_text, new.snippet), new.type);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text, type)
+            VALUES ('delete', old.id, old.title, coalesce(old.search_text, old.snippet), old.type);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text, type)
+            VALUES ('delete', old.id, old.title, coalesce(old.search_text, old.snippet), old.type);
+            INSERT INTO {FTS_TABLE}(rowid, title, text, type)
+            VALUES (new.id, new.title, coalesce(new.search_text, new.snippet), new.type);
+        END
+        """,
+        # Index the rows written before this migration.
+        f"""
+        INSERT INTO {FTS_TABLE}(rowid, title, text, type)
+        SELECT id, title, coalesce(search_text, snippet), type FROM api_memory
+        """,
+    ],
+}
+
+
+def decode(data, compressed):
+    # Blob format of 0013_memory_blobs.
+    data = bytes(data)
+    return (zlib.decompress(data) if compressed else data).decode()
+
+
+def fill_search_text(apps, schema_editor):
+    Memory = apps.get_model('api', 'Memory')
+    truncated = Memory.objects.filter(truncated=True).select_related('body')
+    last = 0
+    while True:
+        batch = list(truncated.filter(id__gt=last).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            break
+        last = batch[-1].id
+        for memory in batch:
+            memory.search_text = decode(memory.body.data, memory.body.compressed)
+        Memory.objects.bulk_update(batch, ['search_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_memory_blobs'),
+    ]
+
+    operations = [
+        RunVendorSQL(initial.DROP_SQL, initial.INDEX_SQL),
+        migrations.AddField(
+            model_name='memory',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        RunVendorSQL(INDEX_SQL, initial.DROP_SQL),
+    ]
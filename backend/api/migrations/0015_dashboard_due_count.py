@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_memory_search_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardstats',
+            name='due_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dashboardstats',
+            name='due_today_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
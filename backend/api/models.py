@@ -1,5 +1,11 @@
-from django.db import models
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
+from django.utils.functional import cached_property
+
+from . import blobs
 
 
 class User(AbstractUser):
@@ -14,15 +20,115 @@ class User(AbstractUser):
         return self.email or self.username
 
 
-class Chat(models.Model):
+class SyncCounter(models.Model):
+    """Per-user monotonic change counter behind the /api/sync/ feed."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='sync_counter')
+    version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, user_id, count=1):
+        """
+        Reserve ``count`` consecutive versions for ``user_id`` and return the
+        first one. Must run inside the transaction that writes the rows: the
+        counter row stays locked until commit, so versions become visible in
+        increasing order.
+        """
+        if not cls.objects.filter(user_id=user_id).update(version=F('version') + count):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, version=count)
+                return 1
+            except IntegrityError:
+                cls.objects.filter(user_id=user_id).update(version=F('version') + count)
+        return cls.objects.values_list('version', flat=True).get(user_id=user_id) - count + 1
+
+
+class Tombstone(models.Model):
+    """Records a deleted synced object so clients can drop it from their cache."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    version = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'version'], name='tombstone_user_version_idx'),
+        ]
+
+
+class SyncedQuerySet(models.QuerySet):
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            rows = list(self.values_list('id', 'user_id'))
+            by_user = {}
+            for obj_id, user_id in rows:
+                by_user.setdefault(user_id, []).append(obj_id)
+            tombstones = []
+            for user_id, ids in by_user.items():
+                first = SyncCounter.reserve(user_id, len(ids))
+                tombstones += [
+                    Tombstone(user_id=user_id, model=self.model._meta.model_name, object_id=obj_id, version=first + i)
+                    for i, obj_id in enumerate(ids)
+                ]
+            Tombstone.objects.bulk_create(tombstones)
+            return models.QuerySet.delete(self.model._base_manager.filter(id__in=[r[0] for r in rows]))
+
+
+class SyncedModel(models.Model):
+    """
+    Base for user-owned rows exposed through /api/sync/.
+
+    Every save stamps the row with the owner's next ``version`` and every
+    delete leaves a ``Tombstone``. Bulk writers must stamp versions
+    themselves (see ``api.batch``).
+    """
+    version = models.BigIntegerField(default=0, editable=False)
+
+    objects = SyncedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        with transaction.atomic():
+            self.version = SyncCounter.reserve(self.user_id)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Tombstone.objects.create(
+                user_id=self.user_id,
+                model=self._meta.model_name,
+                object_id=self.pk,
+                version=SyncCounter.reserve(self.user_id),
+            )
+            return super().delete(*args, **kwargs)
+
+
+class Chat(SyncedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats')
     title = models.CharField(max_length=255, default='New Chat')
     last_message = models.TextField(blank=True, default='')
+    # Rolling summary of every message up to summary_through (see api.context).
+    summary = models.TextField(blank=True, default='')
+    summary_through = models.BigIntegerField(default=0)
+    # Messages live in ChatArchive until the chat is opened (see api.archive).
+    archived = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='chat_user_updated_idx'),
+            models.Index(fields=['user', 'version'], name='chat_user_version_idx'),
+            # Candidates for archival (api.archive.idle_chats).
+            models.Index(fields=['updated_at'], condition=models.Q(archived=False), name='chat_archivable_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.user})"
@@ -38,12 +144,107 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['chat', 'created_at', 'id'], name='chatmessage_chat_created_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.role}] {self.content[:50]}"
 
 
-class Memory(models.Model):
+class ChatArchive(models.Model):
+    """
+    The messages of an idle chat, moved out of ChatMessage as one gzipped
+    JSON blob (see api.archive). Opening the chat moves them back.
+    """
+    chat = models.OneToOneField(Chat, on_delete=models.CASCADE, primary_key=True, related_name='archive')
+    data = models.BinaryField()
+    messages = models.IntegerField()
+    raw_size = models.IntegerField()
+    first_message_at = models.DateTimeField()
+    last_message_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Chat {self.chat_id}: {self.messages} messages, {len(self.data)} bytes'
+
+
+class MemoryBlob(models.Model):
+    """
+    A memory text longer than its preview, stored once under its SHA-256
+    however many memories hold it (see api.blobs). ``refs`` counts them.
+    """
+    hash = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    compressed = models.BooleanField(default=False)
+    size = models.IntegerField()
+    refs = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.hash[:12]}: {self.size} bytes, {self.refs} refs'
+
+    @cached_property
+    def text(self):
+        return blobs.decode(self.data, self.compressed)
+
+    @classmethod
+    def _build(cls, digest, text, refs):
+        data, compressed, size = blobs.encode(text)
+        return cls(hash=digest, data=data, compressed=compressed, size=size, refs=refs)
+
+    @classmethod
+    def _add_refs(cls, counts):
+        by_count = {}
+        for digest, count in counts.items():
+            by_count.setdefault(count, []).append(digest)
+        for count, digests in by_count.items():
+            cls.objects.filter(hash__in=digests).update(refs=F('refs') + count)
+
+    @classmethod
+    def acquire(cls, texts):
+        """
+        Take one reference per item of ``texts`` to the blob holding it,
+        creating the missing blobs. Must run inside the transaction that
+        points the memories at them.
+        """
+        wanted = {}
+        for text, count in Counter(texts).items():
+            wanted[blobs.digest(text)] = (text, count)
+        if not wanted:
+            return
+        with transaction.atomic():
+            # Locked rows cannot drop to zero references and go away meanwhile.
+            held = set(cls.objects.select_for_update().filter(hash__in=wanted).values_list('hash', flat=True))
+            cls._add_refs({digest: wanted[digest][1] for digest in held})
+            missing = [digest for digest in wanted if digest not in held]
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create([cls._build(digest, *wanted[digest]) for digest in missing])
+            except IntegrityError:
+                # Some were created concurrently: take them one at a time.
+                for digest in missing:
+                    text, count = wanted[digest]
+                    if cls.objects.filter(hash=digest).update(refs=F('refs') + count):
+                        continue
+                    try:
+                        with transaction.atomic():
+                            cls._build(digest, text, count).save(force_insert=True)
+                    except IntegrityError:
+                        cls.objects.filter(hash=digest).update(refs=F('refs') + count)
+
+    @classmethod
+    def release(cls, digests):
+        """Drop one reference per item of ``digests``; delete blobs left with none."""
+        counts = Counter(digests)
+        if not counts:
+            return
+        with transaction.atomic():
+            cls._add_refs({digest: -count for digest, count in counts.items()})
+            cls.objects.filter(hash__in=counts, refs__lte=0).delete()
+
+
+class Memory(SyncedModel):
     CATEGORY_CHOICES = [
         ('conversations', 'Conversations'),
         ('documents', 'Documents'),
@@ -53,30 +254,243 @@ class Memory(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='memories')
     title = models.CharField(max_length=255)
-    snippet = models.TextField(blank=True, default='')
+    # The first MEMORY_PREVIEW_CHARS characters of the text. Longer texts are
+    # kept whole in ``body`` (see api.blobs); ``snippet`` is the full text.
+    preview = models.TextField(db_column='snippet', blank=True, default='')
+    truncated = models.BooleanField(default=False)
+    # Counted in MemoryBlob.refs; the (deferred) foreign key is checked at commit.
+    body = models.ForeignKey(MemoryBlob, null=True, blank=True, editable=False, on_delete=models.DO_NOTHING,
+                             db_column='body_hash', related_name='+')
+    # The whole text again when truncated, for the search index (api.search).
+    search_text = models.TextField(null=True, blank=True, editable=False)
     type = models.CharField(max_length=100, default='Note')
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='conversations')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Memories'
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='memory_user_created_idx'),
+            models.Index(fields=['user', 'version'], name='memory_user_version_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def snippet(self):
+        """The full text; reads ``body`` when the preview is cut short."""
+        if '_snippet' in self.__dict__:
+            return self.__dict__['_snippet']
+        return self.body.text if self.truncated else self.preview
+
+    @snippet.setter
+    def snippet(self, text):
+        # Stored by save() (or prepare_bulk_write).
+        self.__dict__['_snippet'] = text
+        self.preview, self.truncated = blobs.split(text)
+
+    @classmethod
+    def prepare_bulk_write(cls, memories, fields=None):
+        """
+        Store the texts assigned to ``memories`` through ``snippet``: point
+        each at its blob, moving the blob references, and return ``fields``
+        with ``snippet`` replaced by the columns behind it. ``save()`` does
+        this itself; bulk writers call it inside their transaction first.
+        """
+        pending = [memory for memory in memories if '_snippet' in memory.__dict__]
+        if pending:
+            with transaction.atomic():
+                saved = [memory.pk for memory in pending if memory.pk is not None]
+                held = dict(
+                    cls._base_manager.select_for_update().filter(pk__in=saved).values_list('pk', 'body_id')
+                ) if saved else {}
+                acquired, released = [], []
+                for memory in pending:
+                    text = memory.__dict__.pop('_snippet')
+                    memory.preview, memory.truncated = blobs.split(text)
+                    memory.body_id = blobs.digest(text) if memory.truncated else None
+                    memory.search_text = text if memory.truncated else None
+                    if memory.truncated:
+                        acquired.append(text)
+                    if held.get(memory.pk):
+                        released.append(held[memory.pk])
+                # Acquire first, so a text saved again keeps its blob.
+                MemoryBlob.acquire(acquired)
+                MemoryBlob.release(released)
+        if fields is not None and 'snippet' in fields:
+            fields = {*fields} - {'snippet'} | {'preview', 'truncated', 'body', 'search_text'}
+        return fields
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            update_fields = self.prepare_bulk_write([self], kwargs.get('update_fields'))
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields
+            super().save(*args, **kwargs)
 
-class Reminder(models.Model):
+
+class Reminder(SyncedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reminders')
     text = models.CharField(max_length=500)
     completed = models.BooleanField(default=False)
     due_date = models.CharField(max_length=100, blank=True, default='')
+    # Parsed from due_date on write (see api.dates); fired_at is set by the scheduler.
+    due_at = models.DateTimeField(null=True, blank=True)
+    fired_at = models.DateTimeField(null=True, blank=True)
     tag = models.CharField(max_length=100, blank=True, default='')
     notes = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='reminder_user_created_idx'),
+            models.Index(fields=['user', 'version'], name='reminder_user_version_idx'),
+            models.Index(fields=['user', 'completed', 'due_at'], name='reminder_user_due_idx'),
+            models.Index(fields=['due_at'], name='reminder_pending_due_idx',
+                         condition=models.Q(completed=False, fired_at__isnull=True, due_at__isnull=False)),
+        ]
+
+    # What the dashboard widgets read (api.dashboard).
+    DASHBOARD_FIELDS = ('completed', 'due_at', 'text', 'due_date')
 
     def __str__(self):
         return self.text
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        reminder = super().from_db(db, field_names, values)
+        reminder.remember_state()
+        return reminder
+
+    def remember_state(self):
+        """Note the stored ``DASHBOARD_FIELDS`` (``None`` if not loaded), so writes can tell what they changed."""
+        loaded = self.__dict__
+        self.stored_state = tuple(loaded[name] for name in self.DASHBOARD_FIELDS) \
+            if all(name in loaded for name in self.DASHBOARD_FIELDS) else None
+
+
+class DashboardStats(models.Model):
+    """
+    Denormalized per-user dashboard widgets (see api.dashboard): counters
+    moved by each write, and lists refreshed after the writes that touch them.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='dashboard_stats')
+    active_reminders = models.IntegerField(default=0)
+    memories = models.IntegerField(default=0)
+    due_today = models.JSONField(default=list, blank=True)
+    due_today_count = models.IntegerField(default=0)
+    # The day due_today was built for.
+    due_on = models.DateField(null=True, blank=True)
+    recent_chats = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Dashboard stats'
+
+
+class BriefingState(models.Model):
+    """
+    Progress of a user's daily briefing (see api.briefings): the sync version
+    it has read up to, and the items gathered into the current day's briefing.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='briefing_state')
+    through_version = models.BigIntegerField(default=0)
+    day = models.DateField(null=True, blank=True)
+    memory = models.ForeignKey(Memory, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    items = models.JSONField(default=dict, blank=True)
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.user} through v{self.through_version} ({self.day})'
+
+
+class Job(models.Model):
+    """
+    A unit of deferred work, claimed and run by ``manage.py run_jobs`` (see
+    api.jobs). Finished jobs are deleted; failed ones stay for inspection.
+    At most one queued or running job has a given non-empty ``key``.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    key = models.CharField(max_length=100, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['kind', 'status'], name='job_kind_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], name='job_pending_key_uniq',
+                                    condition=models.Q(status__in=['queued', 'running']) & ~models.Q(key='')),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+
+class ProviderResponse(models.Model):
+    """A cached AI provider reply, keyed by a hash of provider, model, parameters and prompt (see api.provider_cache)."""
+    key = models.CharField(max_length=64, primary_key=True)
+    provider = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    response = models.TextField()
+    latency_ms = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_used_at'], name='providerresponse_lru_idx'),
+            models.Index(fields=['expires_at'], name='providerresponse_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.provider}/{self.model} {self.key[:12]}'
+
+
+class WorkspaceImport(models.Model):
+    """
+    Progress of one workspace import (see api.workspace). Every batch
+    commits together with this row, so an interrupted import resumes after
+    the last committed input line.
+    """
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workspace_imports')
+    source = models.CharField(max_length=500, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING)
+    lines = models.BigIntegerField(default=0)
+    counts = models.JSONField(default=dict, blank=True)
+    # The chat that messages read next belong to: its id in the file and here.
+    source_chat_id = models.BigIntegerField(null=True, blank=True)
+    chat = models.ForeignKey(Chat, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.user} {self.source or "upload"} ({self.status}, {self.lines} lines)'
@@ -0,0 +1,14 @@
+"""Custom migration operations."""
+
+from django.db import migrations
+
+
+class RunVendorSQL(migrations.RunSQL):
+    """
+    ``RunSQL`` taking ``{vendor: [statement, ...]}`` for ``sql`` and
+    ``reverse_sql``; vendors without an entry run nothing. Unlike RunPython
+    the statements show up in ``sqlmigrate`` and ``export_schema_sql``.
+    """
+
+    def _run_sql(self, schema_editor, sqls):
+        super()._run_sql(schema_editor, sqls.get(schema_editor.connection.vendor, []))
@@ -0,0 +1,121 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Pages are addressed by the ``(timestamp, id)`` of a boundary row rather than
+an OFFSET, so each page is a single index range scan no matter how deep it
+is. Responses carry opaque ``before``/``after`` cursors; pass one back as a
+query parameter to fetch the neighbouring page.
+"""
+
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(value, pk):
+    raw = f'{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError
+        return parsed, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor.')
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on ``(field, id)``.
+
+    ``descending`` is the display order of the list. With ``tail=True`` a
+    request without cursors returns the *last* window (e.g. the most recent
+    chat messages) instead of the first.
+    """
+
+    def __init__(self, field, descending=True, tail=False, default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+        self.field = field
+        self.descending = descending
+        self.tail = tail
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+
+    def _order(self, forward):
+        # ``forward`` walks in display order; the reverse walk is used for
+        # ``before`` cursors and tail windows.
+        desc = self.descending == forward
+        prefix = '-' if desc else ''
+        return [f'{prefix}{self.field}', f'{prefix}id']
+
+    def _beyond(self, cursor, forward):
+        value, pk = cursor
+        op = 'lt' if self.descending == forward else 'gt'
+        return Q(**{f'{self.field}__{op}': value}) | Q(**{self.field: value, f'id__{op}': pk})
+
+    def _cursor(self, row):
+        # Rows are model instances or ``.values()`` dicts.
+        if isinstance(row, dict):
+            return encode_cursor(row[self.field], row['id'])
+        return encode_cursor(getattr(row, self.field), row.pk)
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValueError('limit must be an integer.')
+        return min(max(limit, 1), self.max_limit)
+
+    def _window(self, request, queryset):
+        limit = self.get_limit(request)
+        after = request.query_params.get('after')
+        before = request.query_params.get('before')
+
+        if after:
+            forward = True
+            queryset = queryset.filter(self._beyond(decode_cursor(after), forward=True))
+        elif before:
+            forward = False
+            queryset = queryset.filter(self._beyond(decode_cursor(before), forward=False))
+        else:
+            forward = not self.tail
+        return queryset.order_by(*self._order(forward))[:limit + 1], limit, forward, after, before
+
+    def _page(self, rows, limit, forward, after, before):
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not forward:
+            rows.reverse()
+
+        meta = {'before': None, 'after': None}
+        if rows:
+            if forward:
+                meta['after'] = self._cursor(rows[-1]) if has_more else None
+                meta['before'] = self._cursor(rows[0]) if after else None
+            else:
+                meta['before'] = self._cursor(rows[0]) if has_more else None
+                meta['after'] = self._cursor(rows[-1]) if before else None
+        return rows, meta
+
+    def paginate(self, request, queryset):
+        """
+        Return ``(rows, meta)`` where ``meta`` holds the ``before``/``after``
+        cursors for the neighbouring pages (``None`` when there are none).
+
+        Raises ``ValueError`` for a malformed ``limit`` or cursor.
+        """
+        window, *state = self._window(request, queryset)
+        return self._page(list(window), *state)
+
+    async def apaginate(self, request, queryset):
+        """Async counterpart of ``paginate`` for async views."""
+        window, *state = self._window(request, queryset)
+        return self._page([row async for row in window], *state)
@@ -0,0 +1,302 @@
+"""
+Response cache and request coalescing for AI provider calls.
+
+``get_provider`` wraps the configured provider in ``CachedProvider`` when
+``AI_CACHE_ENABLED`` is set. Replies are stored in ``ProviderResponse``,
+keyed by a hash of the provider, model, call parameters and the normalised
+prompt (Unicode NFC, whitespace collapsed), so the same prompt typed with
+different spacing is one entry. Entries expire after ``AI_CACHE_TTL``
+seconds, and past ``AI_CACHE_MAX_ENTRIES`` the least recently used are
+evicted; eviction runs every ``EVICT_EVERY`` stores rather than on each one.
+
+Identical calls already in flight in this process are coalesced: the first
+caller (the leader) calls upstream and the rest follow its stream chunk by
+chunk. Only complete replies are cached; if the leader fails or its client
+disconnects, followers that have not yet received anything call upstream
+themselves.
+"""
+
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .metrics import provider_cache_requests, provider_cache_saved
+from .models import ProviderResponse
+from .providers import BaseProvider
+
+EVICT_EVERY = 100
+_CHUNK = re.compile(r'\s*\S+|\s+$')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class ProviderCallFailed(Exception):
+    """The coalesced call this request was following failed part-way."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize(text):
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def cache_key(provider, messages, params):
+    payload = json.dumps({
+        'provider': provider.name,
+        'model': provider.model,
+        'params': params,
+        'messages': [[m['role'], normalize(m['content'])] for m in messages],
+    }, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _chunks(reply):
+    # Replay a cached reply word by word, like a live stream.
+    return _CHUNK.findall(reply)
+
+
+class _Flight:
+    """An upstream call in progress; followers read its chunks as they arrive."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.failed = False
+        self.latency = 0.0
+        self._cond = threading.Condition()
+
+    def push(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def land(self, latency=0.0, failed=False):
+        with self._cond:
+            self.done, self.failed, self.latency = True, failed, latency
+            self._cond.notify_all()
+
+    def wait(self, seen, timeout):
+        """Return ``(new chunks, done, failed)`` once there is news or ``timeout`` passes."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.chunks) > seen or self.done, timeout)
+            return self.chunks[seen:], self.done, self.failed
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+_stores = itertools.count(1)
+
+
+def _join(key):
+    """Return ``(flight, is_leader)`` for ``key``."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _flights[key] = _Flight()
+        return flight, True
+
+
+def _land(key, flight, latency=0.0, failed=False):
+    with _flights_lock:
+        if _flights.get(key) is flight:
+            del _flights[key]
+    flight.land(latency, failed)
+
+
+# ─── Storage ────────────────────────────────────────────────────────────────
+
+def lookup(key):
+    """Return the cached reply for ``key`` and its upstream latency in seconds, or ``None``."""
+    now = timezone.now()
+    row = ProviderResponse.objects.filter(key=key, expires_at__gt=now).values('response', 'latency_ms').first()
+    if row is None:
+        return None
+    ProviderResponse.objects.filter(key=key).update(hits=F('hits') + 1, last_used_at=now)
+    return row['response'], row['latency_ms'] / 1000
+
+
+def store(key, provider, reply, latency):
+    now = timezone.now()
+    ProviderResponse.objects.update_or_create(key=key, defaults={
+        'provider': provider.name,
+        'model': provider.model,
+        'response': reply,
+        'latency_ms': round(latency * 1000),
+        'hits': 0,
+        'last_used_at': now,
+        'expires_at': now + timedelta(seconds=_setting('AI_CACHE_TTL', 86400)),
+    })
+    if next(_stores) % EVICT_EVERY == 0:
+        evict()
+
+
+def evict():
+    """Delete expired entries, then the least recently used beyond ``AI_CACHE_MAX_ENTRIES``."""
+    deleted, _ = ProviderResponse.objects.filter(expires_at__lte=timezone.now()).delete()
+    excess = ProviderResponse.objects.count() - _setting('AI_CACHE_MAX_ENTRIES', 10000)
+    if excess > 0:
+        keys = list(ProviderResponse.objects.order_by('last_used_at').values_list('key', flat=True)[:excess])
+        deleted += ProviderResponse.objects.filter(key__in=keys).delete()[0]
+    return deleted
+
+
+def stats():
+    """Cache size and effectiveness, persisted and for this process."""
+    totals = ProviderResponse.objects.aggregate(
+        total_hits=Sum('hits'), saved_ms=Sum(F('hits') * F('latency_ms')),
+    )
+    entries = ProviderResponse.objects.count()
+    hits = totals['total_hits'] or 0
+    process = {}
+    for (provider, result), count in provider_cache_requests.values().items():
+        process.setdefault(provider, {'hit': 0, 'miss': 0, 'coalesced': 0})[result] = count
+    for provider, counts in process.items():
+        calls = sum(counts.values())
+        counts['hit_rate'] = round((counts['hit'] + counts['coalesced']) / calls, 4) if calls else 0.0
+        counts['saved_seconds'] = round(provider_cache_saved.values().get((provider,), 0.0), 3)
+    return {
+        'entries': entries,
+        'max_entries': _setting('AI_CACHE_MAX_ENTRIES', 10000),
+        'ttl_seconds': _setting('AI_CACHE_TTL', 86400),
+        'hits': hits,
+        # Every entry was one miss, so this is hits over cacheable calls.
+        'hit_rate': round(hits / (hits + entries), 4) if entries else 0.0,
+        'saved_seconds': round((totals['saved_ms'] or 0) / 1000, 3),
+        'in_flight': len(_flights),
+        'process': process,
+    }
+
+
+# ─── Provider wrapper ───────────────────────────────────────────────────────
+
+class CachedProvider(BaseProvider):
+    """Serve ``provider``'s replies from the response cache, coalescing identical calls."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.name = provider.name
+        self.model = provider.model
+
+    def __getattr__(self, attr):
+        return getattr(self.provider, attr)
+
+    def count_tokens(self, text):
+        return self.provider.count_tokens(text)
+
+    def summarize(self, summary, messages, max_tokens):
+        return self.provider.summarize(summary, messages, max_tokens)
+
+    def title(self, content, max_words=6):
+        return self.provider.title(content, max_words)
+
+    def _hit(self, result, latency):
+        provider_cache_requests.inc(self.name, result)
+        provider_cache_saved.inc(self.name, amount=latency)
+
+    def stream(self, messages, **params):
+        key = cache_key(self, messages, params)
+        timeout = _setting('AI_CACHE_WAIT', 120)
+        while True:
+            cached = lookup(key)
+            if cached is not None:
+                self._hit('hit', cached[1])
+                yield from _chunks(cached[0])
+                return
+            flight, leader = _join(key)
+            if leader:
+                yield from self._lead(key, flight, messages, params)
+                return
+            seen = 0
+            while True:
+                chunks, done, failed = flight.wait(seen, timeout)
+                if failed or not (chunks or done):
+                    break
+                seen += len(chunks)
+                yield from chunks
+                if done:
+                    self._hit('coalesced', flight.latency)
+                    return
+            if seen:
+                raise ProviderCallFailed('The reply this request was waiting on failed.')
+            if not failed:
+                # The leader is stuck: call upstream directly rather than wait again.
+                provider_cache_requests.inc(self.name, 'miss')
+                yield from self.provider.stream(messages, **params)
+                return
+            # The leader failed before sending anything: retry, probably as the new leader.
+
+    def _lead(self, key, flight, messages, params):
+        provider_cache_requests.inc(self.name, 'miss')
+        started = time.monotonic()
+        try:
+            for chunk in self.provider.stream(messages, **params):
+                flight.push(chunk)
+                yield chunk
+            latency = time.monotonic() - started
+            store(key, self, ''.join(flight.chunks), latency)
+        except BaseException:
+            # Includes GeneratorExit when the client goes away mid-reply.
+            _land(key, flight, failed=True)
+            raise
+        _land(key, flight, latency)
+
+    async def astream(self, messages, **params):
+        key = cache_key(self, messages, params)
+        timeout = _setting('AI_CACHE_WAIT', 120)
+        wait = sync_to_async(lambda flight, seen: flight.wait(seen, timeout), thread_sensitive=False)
+        while True:
+            cached = await sync_to_async(lookup)(key)
+            if cached is not None:
+                self._hit('hit', cached[1])
+                for chunk in _chunks(cached[0]):
+                    yield chunk
+                return
+            flight, leader = _join(key)
+            if leader:
+                async for chunk in self._alead(key, flight, messages, params):
+                    yield chunk
+                return
+            seen = 0
+            while True:
+                chunks, done, failed = await wait(flight, seen)
+                if failed or not (chunks or done):
+                    break
+                seen += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                if done:
+                    self._hit('coalesced', flight.latency)
+                    return
+            if seen:
+                raise ProviderCallFailed('The reply this request was waiting on failed.')
+            if not failed:
+                provider_cache_requests.inc(self.name, 'miss')
+                async for chunk in self.provider.astream(messages, **params):
+                    yield chunk
+                return
+
+    async def _alead(self, key, flight, messages, params):
+        provider_cache_requests.inc(self.name, 'miss')
+        started = time.monotonic()
+        try:
+            async for chunk in self.provider.astream(messages, **params):
+                flight.push(chunk)
+                yield chunk
+            latency = time.monotonic() - started
+            await sync_to_async(store)(key, self, ''.join(flight.chunks), latency)
+        except BaseException:
+            _land(key, flight, failed=True)
+            raise
+        _land(key, flight, latency)
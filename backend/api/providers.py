@@ -0,0 +1,163 @@
+"""
+AI provider interface.
+
+A provider turns a list of ``{'role': ..., 'content': ...}`` messages into a
+stream of text chunks. Providers are registered by name in
+``settings.AI_PROVIDERS`` (dotted class paths) and selected per user from
+``user.settings['ai_provider']``, falling back to ``AI_DEFAULT_PROVIDER``.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import random
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseProvider:
+    name = ''
+    model = ''
+
+    def stream(self, messages, **params):
+        """Yield the reply to ``messages`` as text chunks."""
+        raise NotImplementedError
+
+    async def astream(self, messages, **params):
+        """
+        Async counterpart of ``stream``. The default pulls chunks from
+        ``stream`` on a worker thread; network-bound providers should
+        override it with a native async client so a waiting reply holds no
+        thread at all.
+        """
+        done = object()
+        chunks = iter(self.stream(messages, **params))
+        pull = sync_to_async(next, thread_sensitive=False)
+        while (chunk := await pull(chunks, done)) is not done:
+            yield chunk
+
+    def complete(self, messages, **params):
+        return ''.join(self.stream(messages, **params))
+
+    def count_tokens(self, text):
+        """Approximate token count (about four characters per token)."""
+        return (len(text) + 3) // 4
+
+    def summarize(self, summary, messages, max_tokens):
+        """
+        Fold ``messages`` into the running ``summary`` and return the new
+        summary, at most ``max_tokens`` long. The default is extractive (the
+        first sentence of each message); model-backed providers should
+        override it to ask the model for an abstractive summary.
+        """
+        lines = summary.splitlines()
+        for message in messages:
+            first = re.split(r'(?<=[.!?])\s', message['content'].strip(), maxsplit=1)[0]
+            lines.append(f"{'User' if message['role'] == 'user' else 'Assistant'}: {first[:200]}")
+        text = '\n'.join(lines)
+        # Over budget: drop the oldest lines first.
+        while len(lines) > 1 and self.count_tokens(text) > max_tokens:
+            lines.pop(0)
+            text = '\n'.join(lines)
+        return text[:max_tokens * 4]
+
+    def title(self, content, max_words=6):
+        """
+        Return a short chat title for the opening message ``content``. The
+        default takes the first sentence's leading words; model-backed
+        providers may override it to ask the model instead.
+        """
+        sentence = re.split(r'(?<=[.!?])\s', content.strip(), maxsplit=1)[0]
+        words = sentence.rstrip('.!?').split()
+        title = ' '.join(words[:max_words]) + ('…' if len(words) > max_words else '')
+        return title[:1].upper() + title[1:]
+
+
+class StubProvider(BaseProvider):
+    """Deterministic local provider used offline and in tests."""
+
+    name = 'stub'
+    model = 'stub-1'
+
+    def __init__(self, delay=None):
+        # AI_STUB_DELAY (seconds per word) simulates a slow model in benchmarks.
+        self.delay = getattr(settings, 'AI_STUB_DELAY', 0.0) if delay is None else delay
+
+    def _words(self, messages):
+        prompt = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), '')
+        reply = f'Processing: "{prompt}". This reply comes from the local stub provider.'
+        for i, word in enumerate(reply.split(' ')):
+            yield word if i == 0 else ' ' + word
+
+    def stream(self, messages, **params):
+        for word in self._words(messages):
+            if self.delay:
+                time.sleep(self.delay)
+            yield word
+
+    async def astream(self, messages, **params):
+        for word in self._words(messages):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word
+
+
+class FakeProvider(BaseProvider):
+    """
+    Offline stand-in for a hosted model, for measuring the response cache.
+    Each call waits ``AI_FAKE_LATENCY`` seconds before the first word and
+    ``AI_FAKE_TOKEN_LATENCY`` between words, and replies with text derived
+    from the prompt, so identical prompts get identical replies. ``calls``
+    counts upstream calls across instances.
+    """
+
+    name = 'fake'
+    model = 'fake-1'
+    calls = itertools.count(1)
+    VOCABULARY = (
+        'sure', 'here', 'is', 'a', 'short', 'answer', 'about', 'that', 'you', 'could',
+        'also', 'try', 'the', 'next', 'step', 'which', 'should', 'help', 'with', 'it',
+    )
+
+    def __init__(self, latency=None, token_latency=None):
+        self.latency = getattr(settings, 'AI_FAKE_LATENCY', 0.5) if latency is None else latency
+        self.token_latency = getattr(settings, 'AI_FAKE_TOKEN_LATENCY', 0.01) if token_latency is None else token_latency
+
+    def _words(self, messages):
+        next(self.calls)
+        prompt = '\n'.join(f"{m['role']}: {m['content']}" for m in messages)
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        words = [rng.choice(self.VOCABULARY) for _ in range(rng.randint(12, 40))]
+        reply = ' '.join(words).capitalize() + '.'
+        for i, word in enumerate(reply.split(' ')):
+            yield word if i == 0 else ' ' + word
+
+    def stream(self, messages, **params):
+        time.sleep(self.latency)
+        for word in self._words(messages):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield word
+
+    async def astream(self, messages, **params):
+        await asyncio.sleep(self.latency)
+        for word in self._words(messages):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield word
+
+
+def get_provider(user=None):
+    registry = getattr(settings, 'AI_PROVIDERS', {'stub': 'api.providers.StubProvider'})
+    default = getattr(settings, 'AI_DEFAULT_PROVIDER', 'stub')
+    name = ((getattr(user, 'settings', None) or {}).get('ai_provider') or default).lower()
+    path = registry.get(name) or registry[default]
+    provider = import_string(path)()
+    if getattr(settings, 'AI_CACHE_ENABLED', False):
+        from .provider_cache import CachedProvider
+        provider = CachedProvider(provider)
+    return provider
@@ -0,0 +1,357 @@
+"""
+Real-time push over WebSockets.
+
+Under ASGI, ``backend.asgi`` routes WebSocket connections on
+``REALTIME_PATH`` (``/ws/``) here. The socket authenticates with the
+session cookie (same-origin pages only) or, as the first message, with
+``{"type": "auth", "token": "<api token>"}``; it is then sent
+``{"type": "hello", "version": <sync version>}`` followed by one JSON event
+per change to the user's chats, chat messages, memories and reminders:
+
+    {"type": "reminder.updated", "id": 7, "version": 42, "data": {...}}
+    {"type": "message.created", "id": 9, "chat": 3, "data": {...}}
+    {"type": "memory.deleted", "id": 5}
+
+``data`` is the object as the REST API returns it. Bulk writers only send
+``*.updated``, so clients should treat created and updated alike, as
+upserts. ``{"type": "resync"}`` means events were dropped (a slow client, a
+transaction that changed more than ``REALTIME_MAX_BATCH`` objects, a lost
+backend connection); ``collections`` lists what to reload when known,
+otherwise reload everything, e.g. from ``/api/sync/?since=<version>``.
+
+Signal receivers queue events with ``publish``; they go out after the
+transaction commits, through the broadcaster named by
+``REALTIME_BROADCASTER``. ``LocalBroadcaster`` only reaches sockets served
+by the same process, so deployments with several processes, or with
+``run_jobs`` workers writing, need ``RedisBroadcaster``.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import threading
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import SyncCounter
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {'type': 'resync'}
+# Close codes in the 4000-4999 range the protocol leaves to applications.
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _dumps(event):
+    # Events carry serializer output, which is already JSON-native.
+    return json.dumps(event)
+
+
+# ─── Broadcasters ───────────────────────────────────────────────────────────
+
+class Subscription:
+    """One socket's queue of events; fed from any thread, read on its event loop."""
+
+    def __init__(self, broadcaster, user_id, size):
+        self.broadcaster = broadcaster
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broadcaster.unsubscribe(self)
+
+    def put(self, events):
+        try:
+            self.loop.call_soon_threadsafe(self._put, events)
+        except RuntimeError:
+            pass  # The loop has closed; the socket is gone.
+
+    def _put(self, events):
+        if self.queue.maxsize - self.queue.qsize() < len(events):
+            # Too far behind: drop what is queued and have the client reload.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            events = [RESYNC]
+        for event in events:
+            self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroadcaster:
+    """Delivers events to the sockets served by this process."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def wants(self, user_id):
+        """Whether events for ``user_id`` could reach anyone (lets writers skip building them)."""
+        return user_id in self._subscriptions
+
+    def subscribe(self, user_id):
+        """Start receiving ``user_id``'s events; call on the event loop, use as ``async with``."""
+        subscription = Subscription(self, user_id, _setting('REALTIME_QUEUE_SIZE', 256))
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, events):
+        self.deliver(user_id, events)
+
+    def deliver(self, user_id, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(events)
+
+    def connections(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+class RedisBroadcaster(LocalBroadcaster):
+    """
+    Fans events out through Redis pub/sub (``REALTIME_REDIS_URL``).
+
+    Writers publish to a per-user channel from any process; every process
+    serving sockets listens on the channel pattern and delivers locally.
+    If the listener loses its connection, local sockets are told to resync.
+    """
+
+    def __init__(self, url=None):
+        super().__init__()
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured('RedisBroadcaster requires the redis package (pip install redis).') from exc
+        self.url = url or _setting('REALTIME_REDIS_URL', '')
+        if not self.url:
+            raise ImproperlyConfigured('RedisBroadcaster requires REALTIME_REDIS_URL.')
+        self.prefix = _setting('REALTIME_REDIS_PREFIX', 'realtime:')
+        self._client = redis.Redis.from_url(self.url)
+        self._listeners = {}
+
+    def wants(self, user_id):
+        return True  # Sockets may be open in other processes.
+
+    def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._listeners:
+                self._listeners[loop] = loop.create_task(self._listen())
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, events):
+        try:
+            self._client.publish(f'{self.prefix}{user_id}', _dumps(events))
+        except Exception:
+            logger.exception('Could not publish realtime events for user %s', user_id)
+
+    async def _listen(self):
+        import redis.asyncio
+
+        delay = 1
+        while True:
+            try:
+                client = redis.asyncio.Redis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f'{self.prefix}*')
+                    delay = 1
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        user_id = int(message['channel'][len(self.prefix):])
+                        self.deliver(user_id, json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Realtime listener lost its Redis connection; retrying in %ss', delay)
+            # Anything published meanwhile is lost.
+            with self._lock:
+                user_ids = list(self._subscriptions)
+            for user_id in user_ids:
+                self.deliver(user_id, [RESYNC])
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+@functools.cache
+def get_broadcaster():
+    return import_string(_setting('REALTIME_BROADCASTER', 'api.realtime.LocalBroadcaster'))()
+
+
+# ─── Publishing ─────────────────────────────────────────────────────────────
+
+def event(kind, action, obj, data=None, **extra):
+    """Build a ``<kind>.<action>`` event for ``obj``; ``data`` is its API representation."""
+    payload = {'type': f'{kind}.{action}', 'id': obj.pk}
+    if getattr(obj, 'version', None) is not None and action != 'deleted':
+        payload['version'] = obj.version
+    payload.update(extra)
+    if data is not None:
+        payload['data'] = data
+    return payload
+
+
+COLLECTIONS = {'chat': 'chats', 'message': 'messages', 'memory': 'memories', 'reminder': 'reminders'}
+
+
+class _Publish:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.events = []
+        # Django names robust on_commit callbacks by __qualname__ when they fail.
+        self.__qualname__ = type(self).__qualname__
+
+    def __call__(self):
+        events = self.events
+        if len(events) > _setting('REALTIME_MAX_BATCH', 100):
+            kinds = dict.fromkeys(e['type'].split('.')[0] for e in events)
+            events = [{**RESYNC, 'collections': [COLLECTIONS.get(kind, kind) for kind in kinds]}]
+        get_broadcaster().publish(self.user_id, events)
+
+
+def publish(user_id, events):
+    """Send ``events`` to ``user_id``'s sockets once the current transaction commits."""
+    conn = transaction.get_connection()
+    if conn.in_atomic_block:
+        # Append to the events already queued by this transaction.
+        for _, func, _ in conn.run_on_commit:
+            if isinstance(func, _Publish) and func.user_id == user_id:
+                func.events.extend(events)
+                return
+    pending = _Publish(user_id)
+    pending.events.extend(events)
+    transaction.on_commit(pending, robust=True)
+
+
+# ─── WebSocket endpoint ─────────────────────────────────────────────────────
+
+def _headers(scope):
+    return {name.decode('latin-1'): value.decode('latin-1') for name, value in scope.get('headers', [])}
+
+
+def _same_origin(headers):
+    origin = headers.get('origin')
+    if not origin:
+        return False
+    if origin in _setting('CSRF_TRUSTED_ORIGINS', []):
+        return True
+    return urlsplit(origin).netloc == headers.get('host')
+
+
+def _session_user(headers):
+    # Cookies ride along on cross-site WebSocket handshakes too, so only
+    # trust them from our own pages.
+    if not _same_origin(headers):
+        return None
+    cookie = SimpleCookie(headers.get('cookie', '')).get(settings.SESSION_COOKIE_NAME)
+    if cookie is None:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(cookie.value)
+    user = get_user(SimpleNamespace(session=session))
+    return user if user.is_authenticated else None
+
+
+def _payload(message):
+    try:
+        payload = json.loads(message.get('text') or message.get('bytes') or b'')
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def _message_type(message):
+    return _payload(message).get('type')
+
+
+def _token_user(message):
+    from .authentication import token_user  # Web only; keeps DRF out of worker startup.
+
+    payload = _payload(message)
+    if payload.get('type') != 'auth' or not isinstance(payload.get('token'), str):
+        return None
+    user = token_user(payload['token'])
+    return user if user is not None and user.is_active else None
+
+
+def _current_version(user_id):
+    return SyncCounter.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI app for WebSocket scopes: authenticate, then stream the user's events."""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if scope['path'] != _setting('REALTIME_PATH', '/ws/'):
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    await send({'type': 'websocket.accept'})
+
+    user = await sync_to_async(_session_user)(_headers(scope))
+    if user is None:
+        try:
+            message = await asyncio.wait_for(receive(), _setting('REALTIME_AUTH_TIMEOUT', 10))
+        except asyncio.TimeoutError:
+            message = {'type': 'websocket.receive'}
+        if message['type'] == 'websocket.disconnect':
+            return
+        user = await sync_to_async(_token_user)(message)
+        if user is None:
+            await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+            return
+
+    # Subscribe before reading the version so no change falls in between.
+    async with get_broadcaster().subscribe(user.pk) as subscription:
+        version = await sync_to_async(_current_version)(user.pk)
+        await send({'type': 'websocket.send', 'text': _dumps({'type': 'hello', 'version': version})})
+
+        incoming = asyncio.ensure_future(receive())
+        outgoing = asyncio.ensure_future(subscription.get())
+        try:
+            while True:
+                done, _ = await asyncio.wait({incoming, outgoing}, return_when=asyncio.FIRST_COMPLETED)
+                if incoming in done:
+                    message = incoming.result()
+                    if message['type'] == 'websocket.disconnect':
+                        return
+                    if _message_type(message) == 'ping':
+                        await send({'type': 'websocket.send', 'text': '{"type":"pong"}'})
+                    incoming = asyncio.ensure_future(receive())
+                if outgoing in done:
+                    await send({'type': 'websocket.send', 'text': _dumps(outgoing.result())})
+                    outgoing = asyncio.ensure_future(subscription.get())
+        except OSError:
+            return  # Servers raise this for sends after the client went away.
+        finally:
+            incoming.cancel()
+            outgoing.cancel()
@@ -0,0 +1,37 @@
+"""
+orjson-backed JSON renderer.
+
+A drop-in replacement for DRF's ``JSONRenderer`` that produces the same
+bytes several times faster. Datetimes and other non-JSON types go through
+DRF's encoder, ``\\u2028``/``\\u2029`` are escaped the same way, and
+anything orjson rejects (integers beyond 64 bits, non-string keys, lone
+surrogates) falls back to the stdlib encoder, as do indented responses
+(the browsable API). The only differences are in floats: exponents are
+written ``1e-5`` rather than ``1e-05`` (below 1e-4 or from 1e16, a range
+nothing in the API returns) and NaN becomes ``null``.
+
+Registered in ``REST_FRAMEWORK`` only when orjson is installed.
+"""
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None or not self.compact \
+                or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,80 @@
+"""
+Reminder scheduling.
+
+Instead of polling every reminder, each pending reminder with a ``due_at``
+queues one ``fire_due_reminders`` job to run at that minute (see
+``api.tasks``); reminders due in the same minute share the job. When it runs,
+every reminder that has come due is marked ``fired_at`` (bumping its sync
+version, so clients see it in ``/api/sync/``) and ``reminder_due`` is sent
+for notification hooks. Run ``manage.py run_jobs`` for reminders to fire.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import Job, Reminder, SyncCounter
+
+FIRE_BATCH = 500
+
+# sender=Reminder, reminders=list of reminders that just came due
+reminder_due = Signal()
+
+
+def pending():
+    """Reminders waiting to fire; served by ``reminder_pending_due_idx``."""
+    return Reminder.objects.filter(completed=False, fired_at__isnull=True, due_at__isnull=False)
+
+
+def _slot(due_at, now):
+    # Round up to the minute so reminders due close together share a job;
+    # anything already due fires on the next run.
+    due_at = max(due_at, now)
+    slot = due_at.replace(second=0, microsecond=0)
+    return slot if slot == due_at else slot + timedelta(minutes=1)
+
+
+def schedule(reminders):
+    """Queue a firing job at the due time (to the minute) of each pending reminder."""
+    now = timezone.now()
+    due_times = {
+        _slot(r.due_at, now) for r in reminders
+        if r.due_at and not r.completed and r.fired_at is None
+    }
+    if not due_times:
+        return
+    queued = set(
+        Job.objects.filter(kind='fire_due_reminders', status=Job.QUEUED, run_at__in=due_times)
+        .values_list('run_at', flat=True)
+    )
+    for due_at in due_times - queued:
+        enqueue('fire_due_reminders', run_at=due_at)
+
+
+def fire_due(now=None):
+    """Mark every reminder due by ``now`` as fired; return how many fired."""
+    from .signals import bulk_saved
+
+    now = now or timezone.now()
+    fired = 0
+    while True:
+        with transaction.atomic():
+            batch = list(pending().filter(due_at__lte=now).order_by('due_at', 'id')[:FIRE_BATCH])
+            if not batch:
+                return fired
+            by_user = {}
+            for reminder in batch:
+                by_user.setdefault(reminder.user_id, []).append(reminder)
+            for user_id, rows in by_user.items():
+                version = SyncCounter.reserve(user_id, len(rows))
+                for i, reminder in enumerate(rows):
+                    reminder.fired_at = now
+                    reminder.updated_at = now
+                    reminder.version = version + i
+            Reminder.objects.bulk_update(batch, ['fired_at', 'updated_at', 'version'])
+            bulk_saved.send(sender=Reminder, instances=batch)
+            reminder_due.send(sender=Reminder, reminders=batch)
+        fired += len(batch)
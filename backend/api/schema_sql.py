@@ -0,0 +1,270 @@
+"""
+Offline migration SQL.
+
+``render`` compiles every migration in the project into one SQL script for a
+database vendor (``VENDORS``) without connecting to a database: the vendor's
+backend is loaded with a wrapper that refuses to connect and a schema editor
+that merges parameters itself, which is what ``sqlmigrate`` needs a live
+server for. Migrations are rendered in dependency order, one project state
+threaded through them, so the whole plan costs one pass instead of one
+process and one state rebuild per migration.
+
+Each migration's SQL is cached under a hash of its source file, the vendor
+settings and the hashes of its parents, so an unchanged tree renders from the
+cache and a changed migration re-renders itself and its descendants only.
+The output is deterministic: values Django would compute at render time
+(``auto_now`` and ``timezone.now`` defaults) are pinned to
+``SOURCE_DATE_EPOCH`` (0 when unset).
+
+Python cannot be written as SQL. A migration running Python is rendered with
+a ``-- data migration <app>.<name> must be run via manage.py migrate`` marker,
+unless it is listed in ``SCHEMA_SQL_DATA_MIGRATIONS`` (nothing to do on a new
+database) or its Python is a forward no-op; ``strict=True`` refuses to render
+it instead. The search index (api.search) that ``post_migrate`` reinstalls
+after every migrate is installed again at the end.
+"""
+
+import hashlib
+import os
+import re
+import sys
+import tempfile
+from datetime import date, datetime, time, timezone
+
+import django
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.migrations import RunPython
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.state import ProjectState
+from django.db.utils import ConnectionHandler, load_backend
+
+from . import search
+
+FORMAT_VERSION = 3
+
+VENDORS = {
+    'postgresql': 'django.db.backends.postgresql',
+    'sqlite': 'django.db.backends.sqlite3',
+}
+
+_PLACEHOLDER = re.compile(r'%s|%%')
+
+
+class LiveDatabaseRequired(Exception):
+    """A migration asked the database about its current schema, or runs Python to change it."""
+
+
+class OfflineSchemaEditor:
+    """Mixed into a vendor's schema editor: collects SQL, never touches a connection."""
+
+    pinned_now = None
+
+    def __enter__(self):
+        # Skip the transaction (and SQLite's constraint pragmas) the base
+        # class opens on the connection; the script writes BEGIN/COMMIT.
+        self.deferred_sql = []
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            for sql in self.deferred_sql:
+                self.execute(sql, None)
+
+    def execute(self, sql, params=()):
+        # PostgreSQL merges parameters with a cursor; quote_value needs none.
+        if params is not None:
+            values = iter(params)
+            sql = _PLACEHOLDER.sub(lambda m: '%' if m.group() == '%%' else self.quote_value(next(values)),
+                                   str(sql))
+        return super().execute(sql, None)
+
+    def effective_default(self, field):
+        value = self._effective_default(field)
+        generated = callable(field.default) or getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        if generated and isinstance(value, (date, time)):
+            now = self.pinned_now if settings.USE_TZ else self.pinned_now.replace(tzinfo=None)
+            if isinstance(value, datetime):
+                value = now
+            elif isinstance(value, date):
+                value = now.date()
+            else:
+                value = now.time()
+        return field.get_db_prep_save(value, self.connection)
+
+
+def _refuse_connection(self):
+    raise LiveDatabaseRequired('rendering needs a live database')
+
+
+def source_date():
+    return datetime.fromtimestamp(int(os.environ.get('SOURCE_DATE_EPOCH', 0)), tz=timezone.utc)
+
+
+def offline_connection(vendor, postgres_version=None, now=None):
+    """A ``DatabaseWrapper`` for ``vendor`` that renders DDL and cannot connect."""
+    wrapper = load_backend(VENDORS[vendor]).DatabaseWrapper
+    editor = type('OfflineSchemaEditor', (OfflineSchemaEditor, wrapper.SchemaEditorClass),
+                  {'pinned_now': now or source_date()})
+    attrs = {'SchemaEditorClass': editor, 'ensure_connection': _refuse_connection}
+    if vendor == 'postgresql':
+        # Otherwise read from the server; decides version-dependent features.
+        attrs['pg_version'] = (postgres_version or settings.SCHEMA_SQL_POSTGRES_VERSION) * 10000
+    offline = type(f'Offline{wrapper.__name__}', (wrapper,), attrs)
+    settings_dict = ConnectionHandler().configure_settings({DEFAULT_DB_ALIAS: {'ENGINE': VENDORS[vendor]}})
+    # The default alias, so routers and allow_migrate see the database the script is for.
+    return offline(settings_dict[DEFAULT_DB_ALIAS], DEFAULT_DB_ALIAS)
+
+
+def migration_plan(graph):
+    """Every migration node, each after its dependencies (ties broken by name)."""
+    plan, seen = [], set()
+    for leaf in graph.leaf_nodes():
+        for node in graph.forwards_plan(leaf):
+            if node not in seen:
+                seen.add(node)
+                plan.append(node)
+    return plan
+
+
+class SQLCache:
+    """Rendered migrations as ``<key>.sql`` files in ``path``; ``None`` disables it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        if self.path is not None:
+            try:
+                with open(os.path.join(self.path, f'{key}.sql'), encoding='utf-8') as fh:
+                    text = fh.read()
+            except FileNotFoundError:
+                pass
+            else:
+                self.hits += 1
+                return text
+        self.misses += 1
+        return None
+
+    def set(self, key, text):
+        if self.path is not None:
+            write_atomic(os.path.join(self.path, f'{key}.sql'), text)
+
+
+def write_atomic(path, text):
+    """Write ``text`` to ``path`` through a temporary file, so readers never see half of it."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _source_digest(migration, digests):
+    path = sys.modules[type(migration).__module__].__file__
+    if path not in digests:
+        with open(path, 'rb') as fh:
+            digests[path] = hashlib.sha256(fh.read()).hexdigest()
+    return digests[path]
+
+
+def _database_operations(operations):
+    for operation in operations:
+        yield operation
+        yield from _database_operations(getattr(operation, 'database_operations', ()))
+
+
+def _block(connection, title, statements, atomic=True):
+    lines = [f'-- {title}']
+    if atomic and connection.features.can_rollback_ddl:
+        lines += [connection.ops.start_transaction_sql(), *statements, connection.ops.end_transaction_sql()]
+    else:
+        lines += statements
+    return '\n'.join(lines) + '\n'
+
+
+def _needs_migrate(migration):
+    if (migration.app_label, migration.name) in getattr(settings, 'SCHEMA_SQL_DATA_MIGRATIONS', ()):
+        return False
+    return any(not operation.reduces_to_sql and getattr(operation, 'code', None) is not RunPython.noop
+               for operation in _database_operations(migration.operations))
+
+
+def _render_migration(connection, migration, state):
+    # atomic=True (the default) also keeps apply() from opening a transaction
+    # per operation; BEGIN/COMMIT follow migration.atomic below.
+    with connection.schema_editor(collect_sql=True) as editor:
+        try:
+            state = migration.apply(state, editor, collect_sql=True)
+        except LiveDatabaseRequired:
+            raise LiveDatabaseRequired(
+                f'{migration.app_label}.{migration.name} inspects the live schema and cannot be rendered offline.'
+            ) from None
+    title = f'MIGRATION: {migration.app_label} {migration.name}'
+    statements = editor.collected_sql
+    if _needs_migrate(migration):
+        statements.append(f'-- data migration {migration.app_label}.{migration.name} must be run via manage.py migrate')
+    return state, _block(connection, title, statements, migration.atomic)
+
+
+def _render_search_index(connection):
+    # What ApiConfig's post_migrate handler runs after every migrate.
+    with connection.schema_editor(collect_sql=True) as editor:
+        for sql in search.INDEX_DDL.get(connection.vendor, []):
+            editor.execute(sql, None)
+    return _block(connection, 'POST_MIGRATE: api search index', editor.collected_sql)
+
+
+def render(vendor, cache=None, postgres_version=None, now=None, strict=False):
+    """
+    Return the SQL script creating the schema from scratch on ``vendor``.
+    ``strict`` raises ``LiveDatabaseRequired`` on a data migration instead of
+    marking it.
+    """
+    connection = offline_connection(vendor, postgres_version, now)
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    graph = loader.graph
+    plan = migration_plan(graph)
+    cache = cache or SQLCache(None)
+
+    base = '|'.join(map(str, (
+        FORMAT_VERSION, vendor, django.get_version(), getattr(connection, 'pg_version', ''),
+        connection.SchemaEditorClass.pinned_now.isoformat(),
+        sorted(getattr(settings, 'SCHEMA_SQL_DATA_MIGRATIONS', ())),
+    )))
+    keys, digests, blocks = {}, {}, []
+    state = ProjectState(real_apps=loader.unmigrated_apps)
+    behind = []  # Migrations read from the cache that the state has not caught up with.
+    for node in plan:
+        migration = graph.nodes[node]
+        if strict and _needs_migrate(migration):
+            raise LiveDatabaseRequired(
+                f'{migration.app_label}.{migration.name} runs Python that cannot be rendered as SQL; write '
+                'schema changes as SQL operations and list data-only migrations in SCHEMA_SQL_DATA_MIGRATIONS.'
+            )
+        parents = sorted(keys[parent.key] for parent in graph.node_map[node].parents)
+        keys[node] = key = hashlib.sha256(
+            '|'.join([base, *node, _source_digest(migration, digests), *parents]).encode()
+        ).hexdigest()
+        text = cache.get(key)
+        if text is None:
+            for skipped in behind:
+                state = skipped.mutate_state(state, preserve=False)
+            behind = []
+            state, text = _render_migration(connection, migration, state)
+            cache.set(key, text)
+        else:
+            behind.append(migration)
+        blocks.append(text)
+    if search.INDEX_MIGRATION in graph.nodes:
+        blocks.append(_render_search_index(connection))
+
+    header = (f'-- Schema for {vendor}, generated by manage.py export_schema_sql from {len(plan)} migrations '
+              f'(Django {django.get_version()}). Do not edit.\n')
+    return '\n'.join([header, *blocks])
@@ -0,0 +1,145 @@
+"""
+Full-text search over Memory title/text/type. The text indexed is
+``search_text`` (the whole text of a truncated memory, see api.blobs) or
+else the ``snippet`` column, which then holds all of it.
+
+PostgreSQL keeps a generated ``search_vector`` tsvector column (GIN indexed)
+on ``api_memory``; SQLite keeps a contentless FTS5 table ``api_memory_fts``
+that triggers update on every insert, update and delete, so the index stays
+current even for bulk writes. ``INDEX_MIGRATION`` installs ``INDEX_DDL``.
+All DDL is idempotent: SQLite drops triggers whenever a migration rebuilds
+``api_memory``, so ``install_index`` is re-run after every migrate (see
+``ApiConfig.ready``) and at the end of ``export_schema_sql`` scripts.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Memory
+
+FTS_TABLE = 'api_memory_fts'
+INDEX_MIGRATION = ('api', '0014_memory_search_text')
+
+INDEX_DDL = {
+    'postgresql': [
+        """
+        ALTER TABLE api_memory ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(type, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(search_text, snippet, '')), 'C')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS api_memory_search_vector_gin ON api_memory USING GIN (search_vector)",
+    ],
+    # Contentless: the indexed text is no single api_memory column, so the
+    # triggers pass it in (and the old values to delete).
+    'sqlite': [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            title, text, type, content=''
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, text, type)
+            VALUES (new.id, new.title, coalesce(new.search_text, new.snippet), new.type);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text, type)
+            VALUES ('delete', old.id, old.title, coalesce(old.search_text, old.snippet), old.type);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON api_memory BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text, type)
+            VALUES ('delete', old.id, old.title, coalesce(old.search_text, old.snippet), old.type);
+            INSERT INTO {FTS_TABLE}(rowid, title, text, type)
+            VALUES (new.id, new.title, coalesce(new.search_text, new.snippet), new.type);
+        END
+        """,
+    ],
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# ─── Index maintenance ──────────────────────────────────────────────────────
+
+def install_index(conn):
+    """Create the search column/table and triggers if they are missing."""
+    with conn.cursor() as cursor:
+        for sql in INDEX_DDL.get(conn.vendor, []):
+            cursor.execute(sql)
+
+
+# ─── Queries ────────────────────────────────────────────────────────────────
+
+def _terms(query):
+    return _TOKEN_RE.findall(query.lower())[:16]
+
+
+def _postgres_ids(user_id, terms, limit, offset):
+    # Every term is a prefix match so results update while the user types.
+    tsquery = ' & '.join(f'{t}:*' for t in terms)
+    sql = (
+        "SELECT m.id FROM api_memory m, to_tsquery('english', %s) q "
+        "WHERE m.user_id = %s AND m.search_vector @@ q "
+        "ORDER BY ts_rank_cd(m.search_vector, q) DESC, m.id DESC "
+        "LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tsquery, user_id, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _sqlite_ids(user_id, terms, limit, offset):
+    match = ' '.join(f'"{t}"*' for t in terms)
+    # bm25() weights follow the FTS column order: title, text, type.
+    sql = (
+        f"SELECT m.id FROM {FTS_TABLE} f JOIN api_memory m ON m.id = f.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s AND m.user_id = %s "
+        f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0, 5.0), m.id DESC "
+        "LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, user_id, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(user_id, terms, limit, offset):
+    qs = Memory.objects.filter(user_id=user_id)
+    for term in terms:
+        qs = qs.filter(Q(title__icontains=term) | Q(preview__icontains=term) | Q(search_text__icontains=term)
+                       | Q(type__icontains=term))
+    return list(qs.order_by('-created_at', '-id').values_list('id', flat=True)[offset:offset + limit])
+
+
+def search_memories(user, query, limit=20, offset=0):
+    """
+    Return ``(memories, has_more)`` for ``user`` ranked by relevance.
+
+    ``memories`` is a list of Memory instances in rank order.
+    """
+    terms = _terms(query)
+    if not terms:
+        return [], False
+
+    if connection.vendor == 'postgresql':
+        finder = _postgres_ids
+    elif connection.vendor == 'sqlite':
+        finder = _sqlite_ids
+    else:
+        finder = _fallback_ids
+
+    # Fetch one extra row to know whether another page exists.
+    ids = finder(user.pk, terms, limit + 1, offset)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+
+    by_id = Memory.objects.defer('search_text').in_bulk(ids)
+    return [by_id[i] for i in ids if i in by_id], has_more
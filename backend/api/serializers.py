@@ -1,5 +1,13 @@
+import functools
+
 from rest_framework import serializers
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from .dates import parse_due
 from .models import Chat, ChatMessage, Memory, Reminder
 
 User = get_user_model()
@@ -52,14 +60,97 @@ class ChatMessageSerializer(serializers.ModelSerializer):
 
 
 class MemorySerializer(serializers.ModelSerializer):
+    # Takes the full text; returns the preview, with ``truncated`` set when
+    # MemoryDetailSerializer has more (see api.blobs).
+    snippet = serializers.CharField(source='preview', required=False, allow_blank=True)
+
     class Meta:
         model = Memory
-        fields = ['id', 'title', 'snippet', 'type', 'category', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'title', 'snippet', 'truncated', 'type', 'category', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'truncated', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        if 'preview' in attrs:
+            attrs['snippet'] = attrs.pop('preview')
+        return attrs
+
+
+class MemoryDetailSerializer(MemorySerializer):
+    snippet = serializers.CharField(required=False, allow_blank=True)
+
+    class Meta(MemorySerializer.Meta):
+        fields = ['id', 'title', 'snippet', 'type', 'category', 'created_at', 'updated_at']
 
 
 class ReminderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reminder
-        fields = ['id', 'text', 'completed', 'due_date', 'tag', 'notes', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'text', 'completed', 'due_date', 'due_at', 'fired_at', 'tag', 'notes', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'fired_at', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        # Clients often echo the whole object back, so only changed values count.
+        instance = self.instance
+        if 'due_date' in attrs and (instance is None or attrs['due_date'] != instance.due_date):
+            # A new due_date sets due_at, unless a new due_at is sent with it.
+            if 'due_at' not in attrs or (instance is not None and attrs['due_at'] == instance.due_at):
+                attrs['due_at'] = parse_due(attrs['due_date'])
+        if 'due_at' in attrs and (instance is None or attrs['due_at'] != instance.due_at):
+            # Re-arm the reminder only when it is due at a different time.
+            attrs['fired_at'] = None
+        return attrs
+
+
+# Fields whose to_representation returns database values unchanged.
+_PASSTHROUGH = (serializers.IntegerField, serializers.CharField, serializers.BooleanField, serializers.ChoiceField)
+
+
+def _iso_datetime(value, tz):
+    # DateTimeField.to_representation for an aware value in ISO 8601.
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+@functools.cache
+def row_encoder(serializer_class):
+    """
+    Return ``(columns, encode)`` for reading ``serializer_class`` output
+    straight from ``queryset.values(*columns)``: ``encode(rows)`` returns the
+    same list of dicts as ``serializer_class(instances, many=True).data``
+    without building model instances or running DRF's per-field machinery.
+    List endpoints use it; single objects keep going through the serializer.
+
+    Only fields backed by a concrete model column are supported.
+    """
+    model = serializer_class.Meta.model
+    columns, items = [], []
+    env = {'_iso_datetime': _iso_datetime, '_current_timezone': timezone.get_current_timezone}
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        try:
+            column = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            column = None
+        if column is None or not column.concrete or column.is_relation:
+            raise ImproperlyConfigured(f'{serializer_class.__name__}.{name} is not a plain model column.')
+        columns.append(field.source)
+        value = f'r[{field.source!r}]'
+        if type(field) in _PASSTHROUGH:
+            items.append(f'{name!r}: {value}')
+        elif type(field) is serializers.DateTimeField and settings.USE_TZ and not hasattr(field, 'timezone') \
+                and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601:
+            items.append(f'{name!r}: None if {value} is None else _iso_datetime({value}, tz)')
+        else:
+            convert = f'_f{len(env)}'
+            env[convert] = field.to_representation
+            items.append(f'{name!r}: None if {value} is None else {convert}({value})')
+
+    # One comprehension per list, with the time zone looked up once.
+    source = (
+        'def encode(rows):\n'
+        '    tz = _current_timezone()\n'
+        '    return [{' + ', '.join(items) + '} for r in rows]\n'
+    )
+    exec(compile(source, f'<row_encoder {serializer_class.__name__}>', 'exec'), env)
+    return tuple(columns), env['encode']
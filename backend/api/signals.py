@@ -0,0 +1,164 @@
+"""
+Model signal receivers: keep the memory vector index (via the job queue),
+memory blob references, the cached dashboard widgets and the API response
+cache current, and push changes to the owner's open WebSockets
+(``api.realtime``).
+
+Bulk writers (``api.batch``) bypass ``post_save``, so they send
+``bulk_saved`` with the affected instances instead.
+"""
+
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from rest_framework.authtoken.models import Token
+
+from . import dashboard, realtime, scheduler
+from .caching import invalidate
+from .jobs import enqueue
+from .models import Chat, ChatMessage, Memory, MemoryBlob, Reminder, User
+
+# sender=model class, instances=list of saved instances, created=those of them inserted
+bulk_saved = Signal()
+
+
+@receiver(post_save, sender=Memory)
+def index_memory(sender, instance, **kwargs):
+    enqueue('index_memories', ids=[instance.pk])
+
+
+@receiver(bulk_saved, sender=Memory)
+def index_memories(sender, instances, **kwargs):
+    enqueue('index_memories', ids=[m.pk for m in instances])
+
+
+@receiver(post_delete, sender=Memory)
+def unindex_memory(sender, instance, **kwargs):
+    enqueue('unindex_memories', user_id=instance.user_id, ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Memory)
+def release_body(sender, instance, **kwargs):
+    # Also runs for queryset and cascade deletes.
+    if instance.body_id:
+        MemoryBlob.release([instance.body_id])
+
+
+@receiver([post_save, post_delete], sender=Memory)
+@receiver(bulk_saved, sender=Memory)
+def refresh_memory_stats(sender, **kwargs):
+    dashboard.memories_written(*_written(kwargs))
+    for user_id in _owners(kwargs):
+        invalidate(user_id, 'memories')
+
+
+@receiver([post_save, post_delete], sender=Reminder)
+@receiver(bulk_saved, sender=Reminder)
+def refresh_reminder_stats(sender, **kwargs):
+    dashboard.reminders_written(*_written(kwargs))
+    for user_id in _owners(kwargs):
+        invalidate(user_id, 'reminders')
+
+
+@receiver(post_save, sender=Reminder)
+@receiver(bulk_saved, sender=Reminder)
+def schedule_reminders(sender, **kwargs):
+    scheduler.schedule([kwargs['instance']] if 'instance' in kwargs else kwargs['instances'])
+
+
+@receiver([post_save, post_delete], sender=Chat)
+@receiver(bulk_saved, sender=Chat)
+def refresh_chat_stats(sender, **kwargs):
+    for user_id in _owners(kwargs):
+        dashboard.schedule_refresh(user_id, 'chats')
+        invalidate(user_id, 'chats')
+
+
+# ─── Real-time push ─────────────────────────────────────────────────────────
+
+_PUSHED = {Chat: ('chat', 'ChatSerializer'), Memory: ('memory', 'MemorySerializer'),
+           Reminder: ('reminder', 'ReminderSerializer')}
+
+
+def _serializer(name):
+    # DRF's serializers are only imported once an event is built, so
+    # processes that never push (workers, commands) start without them.
+    from . import serializers
+
+    return getattr(serializers, name)
+
+
+@receiver(post_save, sender=Chat)
+@receiver(post_save, sender=Memory)
+@receiver(post_save, sender=Reminder)
+def push_saved(sender, instance, created, **kwargs):
+    if realtime.get_broadcaster().wants(instance.user_id):
+        kind, serializer = _PUSHED[sender]
+        action = 'created' if created else 'updated'
+        data = _serializer(serializer)(instance).data
+        realtime.publish(instance.user_id, [realtime.event(kind, action, instance, data)])
+
+
+@receiver(bulk_saved, sender=Chat)
+@receiver(bulk_saved, sender=Memory)
+@receiver(bulk_saved, sender=Reminder)
+def push_bulk_saved(sender, instances, **kwargs):
+    kind, serializer = _PUSHED[sender]
+    broadcaster = realtime.get_broadcaster()
+    by_owner = {}
+    for obj in instances:
+        if broadcaster.wants(obj.user_id):
+            data = _serializer(serializer)(obj).data
+            by_owner.setdefault(obj.user_id, []).append(realtime.event(kind, 'updated', obj, data))
+    for user_id, events in by_owner.items():
+        realtime.publish(user_id, events)
+
+
+@receiver(post_delete, sender=Chat)
+@receiver(post_delete, sender=Memory)
+@receiver(post_delete, sender=Reminder)
+def push_deleted(sender, instance, **kwargs):
+    if realtime.get_broadcaster().wants(instance.user_id):
+        realtime.publish(instance.user_id, [realtime.event(_PUSHED[sender][0], 'deleted', instance)])
+
+
+@receiver(post_save, sender=ChatMessage)
+def push_message(sender, instance, created, **kwargs):
+    # Messages are only ever created; deleting a chat deletes its messages.
+    user_id = instance.chat.user_id
+    if created and realtime.get_broadcaster().wants(user_id):
+        data = _serializer('ChatMessageSerializer')(instance).data
+        realtime.publish(user_id, [realtime.event('message', 'created', instance, data, chat=instance.chat_id)])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    # Also drops the user from the authentication cache (api.authentication).
+    invalidate(instance.pk, 'user')
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate(instance.user_id, 'user')
+
+
+@receiver(user_logged_out)
+def invalidate_logout(sender, user, **kwargs):
+    if user is not None:
+        invalidate(user.pk, 'user')
+
+
+def _written(kwargs):
+    # (instances, created, deleted) from post_save, post_delete or bulk_saved.
+    if 'instances' in kwargs:
+        return kwargs['instances'], kwargs.get('created', ()), False
+    instance = kwargs['instance']
+    if kwargs['signal'] is post_delete:
+        return [instance], (), True
+    return [instance], [instance] if kwargs['created'] else (), False
+
+
+def _owners(kwargs):
+    if 'instance' in kwargs:
+        return {kwargs['instance'].user_id}
+    return {obj.user_id for obj in kwargs['instances']}
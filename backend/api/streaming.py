@@ -0,0 +1,95 @@
+"""
+Server-sent event stream for a single chat turn.
+
+The provider's tokens are forwarded as ``token`` events as soon as they
+arrive; the user and AI messages are only written once the reply is
+complete, in one transaction together with ``Chat.last_message``. A new
+chat (not saved yet) is created in that transaction too, so a failed reply
+leaves nothing behind; its ``chat`` event then comes after the tokens
+rather than first.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from .jobs import enqueue
+from .models import ChatMessage
+from .serializers import ChatMessageSerializer
+
+_DONE = object()
+
+
+def sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class ReplyStream:
+    def __init__(self, chat, content, provider, history):
+        self.chat = chat
+        self.content = content
+        self.provider = provider
+        self.history = history
+        self.parts = []
+
+    def save(self):
+        reply = ''.join(self.parts)
+        with transaction.atomic():
+            if self.chat.pk is None:
+                self.chat.save()
+                enqueue('title_chat', chat_id=self.chat.id, content=self.content)
+            user_msg = ChatMessage.objects.create(chat=self.chat, role='user', content=self.content)
+            ai_msg = ChatMessage.objects.create(chat=self.chat, role='ai', content=reply)
+            self.chat.last_message = reply
+            self.chat.save(update_fields=['last_message', 'updated_at'])
+        return {
+            'chat': self.chat.id,
+            'user_message': ChatMessageSerializer(user_msg).data,
+            'ai_message': ChatMessageSerializer(ai_msg).data,
+        }
+
+    def _next_token(self, tokens):
+        token = next(tokens, _DONE)
+        if token is not _DONE:
+            self.parts.append(token)
+        return token
+
+    def events(self):
+        """Synchronous event stream, for WSGI servers."""
+        created = self.chat.pk is None
+        if not created:
+            yield sse('chat', {'id': self.chat.id})
+        try:
+            tokens = iter(self.provider.stream(self.history))
+            while (token := self._next_token(tokens)) is not _DONE:
+                yield sse('token', {'text': token})
+        except Exception as exc:
+            yield sse('error', {'error': str(exc)})
+            return
+        done = self.save()
+        if created:
+            yield sse('chat', {'id': self.chat.id})
+        yield sse('done', done)
+
+    async def aevents(self):
+        """
+        Asynchronous event stream, for ASGI servers.
+
+        Tokens come from the provider's ``astream`` so a slow provider never
+        blocks the event loop or the thread that serves the ORM.
+        """
+        created = self.chat.pk is None
+        if not created:
+            yield sse('chat', {'id': self.chat.id})
+        try:
+            async for token in self.provider.astream(self.history):
+                self.parts.append(token)
+                yield sse('token', {'text': token})
+        except Exception as exc:
+            yield sse('error', {'error': str(exc)})
+            return
+        done = await sync_to_async(self.save)()
+        if created:
+            yield sse('chat', {'id': self.chat.id})
+        yield sse('done', done)
@@ -0,0 +1,62 @@
+"""
+Per-user change feed.
+
+Chats, memories and reminders carry the owner's monotonically increasing
+``version`` (see ``SyncedModel``); deletions leave a ``Tombstone`` with its
+own version. A client remembers the ``version`` token of its last sync and
+asks for everything newer, receiving upserted rows and deleted ids.
+"""
+
+from .models import Chat, Memory, Reminder, Tombstone
+from .serializers import ChatSerializer, MemorySerializer, ReminderSerializer
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+COLLECTIONS = [
+    ('chats', Chat, ChatSerializer),
+    ('memories', Memory, MemorySerializer),
+    ('reminders', Reminder, ReminderSerializer),
+]
+
+
+def changes_since(user, since=0, limit=None):
+    """
+    Return up to ``limit`` changes with a version above ``since``, oldest
+    first, as a dict keyed by collection name plus the next ``version``
+    token and a ``has_more`` flag.
+    """
+    limit = DEFAULT_LIMIT if limit is None else min(max(limit, 1), MAX_LIMIT)
+    # Each source contributes at most limit + 1 rows; merging those and
+    # keeping the lowest ``limit`` versions never skips a change.
+    changes = []
+    for name, model, _ in COLLECTIONS:
+        rows = model.objects.filter(user=user, version__gt=since).order_by('version')[:limit + 1]
+        changes += [(obj.version, name, obj) for obj in rows]
+    tombstones = Tombstone.objects.filter(user=user, version__gt=since).order_by('version')[:limit + 1]
+    changes += [(t.version, t.model, t.object_id) for t in tombstones]
+
+    changes.sort(key=lambda change: change[0])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    names = {model._meta.model_name: name for name, model, _ in COLLECTIONS}
+    serializers = {name: serializer for name, _, serializer in COLLECTIONS}
+    upserted = {name: [] for name, _, _ in COLLECTIONS}
+    deleted = {name: [] for name, _, _ in COLLECTIONS}
+    for _, kind, payload in changes:
+        if kind in upserted:
+            upserted[kind].append(payload)
+        elif kind in names:
+            deleted[names[kind]].append(payload)
+
+    result = {
+        name: {
+            'upserted': serializers[name](upserted[name], many=True).data,
+            'deleted': deleted[name],
+        }
+        for name, _, _ in COLLECTIONS
+    }
+    result['version'] = changes[-1][0] if changes else since
+    result['has_more'] = has_more
+    return result
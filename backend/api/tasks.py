@@ -0,0 +1,42 @@
+"""
+Job handlers for work that should not run inside a request (see api.jobs).
+"""
+
+from . import context, scheduler, vectors
+from .jobs import job
+from .models import Chat, Memory
+from .providers import get_provider
+
+
+@job('index_memories', concurrency=2)
+def index_memories(ids):
+    vectors.index_memories(Memory.objects.filter(id__in=ids).select_related('body'))
+
+
+@job('unindex_memories', concurrency=2)
+def unindex_memories(user_id, ids):
+    vectors.remove_memories(user_id, ids)
+
+
+@job('title_chat', concurrency=4, max_attempts=3)
+def title_chat(chat_id, content):
+    chat = Chat.objects.select_related('user').filter(id=chat_id).first()
+    # Leave chats that were deleted or renamed in the meantime alone.
+    if chat is None or chat.title != content[:30]:
+        return
+    title = get_provider(chat.user).title(content)
+    if title:
+        chat.title = title[:255]
+        chat.save(update_fields=['title', 'updated_at'])
+
+
+@job('summarize_chat', concurrency=4, max_attempts=3)
+def summarize_chat(chat_id):
+    chat = Chat.objects.select_related('user').filter(id=chat_id).first()
+    if chat is not None:
+        context.summarize_chat(chat, get_provider(chat.user))
+
+
+@job('fire_due_reminders', concurrency=1)
+def fire_due_reminders():
+    scheduler.fire_due()
@@ -1,3 +1,655 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from django.utils import timezone
+
+from . import blobs, context, dashboard, jobs, search, vectors
+from .archive import archive_chat
+from .batch import MAX_BATCH_SIZE, run_batch
+from .commit import defer
+from .models import Chat, ChatMessage, DashboardStats, Job, Memory, MemoryBlob, Reminder, User, WorkspaceImport
+from .providers import StubProvider
+from .sync import changes_since
+from .serializers import MemorySerializer, ReminderSerializer
+from .workspace import counts, export_lines, export_records, import_lines, position
+
+LONG_TEXT = 'lorem ipsum dolor ' * 30 + 'zebraword'
+
+
+def make_user(name):
+    return User.objects.create_user(username=name, email=f'{name}@example.com', password='pw')
+
+
+# ─── Cursor pagination (api.pagination) ─────────────────────────────────────
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user('pages')
+        self.api = APIClient()
+        # A token, not force_authenticate: the async views authenticate themselves.
+        self.api.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    def walk(self, path, direction, cursor=None):
+        """Ids of every page from ``cursor`` on, following ``direction`` cursors, in display order."""
+        pages = []
+        while True:
+            params = {'limit': 2, **({direction: cursor} if cursor else {})}
+            page = self.api.get(path, params).json()
+            pages.append([row['id'] for row in page['results']])
+            cursor = page[direction]
+            if cursor is None:
+                break
+        if direction == 'before':
+            pages.reverse()
+        return [pk for ids in pages for pk in ids], page
+
+    def test_walks_both_ways_across_tied_timestamps(self):
+        reminders = [Reminder.objects.create(user=self.user, text=f'r{n}') for n in range(5)]
+        Reminder.objects.filter(pk__in=[r.pk for r in reminders[1:4]]).update(created_at=reminders[1].created_at)
+        expected = list(Reminder.objects.filter(user=self.user).order_by('-created_at', '-id')
+                        .values_list('id', flat=True))
+        for path in ('/api/reminders/', '/api/async/reminders/'):
+            with self.subTest(path=path):
+                forward, last = self.walk(path, 'after')
+                self.assertEqual(forward, expected)
+                backward, _ = self.walk(path, 'before', last['before'])
+                self.assertEqual(backward, expected[:-len(last['results'])])
+
+    def test_messages_open_on_the_newest_window(self):
+        chat = Chat.objects.create(user=self.user, title='paged')
+        messages = [ChatMessage.objects.create(chat=chat, role='user', content=str(n)).pk for n in range(5)]
+        path = f'/api/chats/{chat.pk}/messages/'
+        newest = self.api.get(path, {'limit': 2}).json()
+        self.assertEqual([row['id'] for row in newest['results']], messages[-2:])
+        self.assertIsNone(newest['after'])
+        self.assertEqual(self.walk(path, 'before')[0], messages)
+
+    def test_rejects_bad_cursors_and_limits(self):
+        self.assertEqual(self.api.get('/api/reminders/', {'after': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.api.get('/api/reminders/', {'limit': 'many'}).status_code, 400)
+
+
+# ─── Memory blobs (api.blobs) ───────────────────────────────────────────────
+
+class MemoryBlobTests(TestCase):
+    def setUp(self):
+        self.user = make_user('blobs')
+
+    def refs(self, text):
+        blob = MemoryBlob.objects.filter(hash=blobs.digest(text)).first()
+        return blob and blob.refs
+
+    def test_long_text_is_split_and_shared(self):
+        first = Memory.objects.create(user=self.user, title='a', snippet=LONG_TEXT)
+        second = Memory.objects.create(user=self.user, title='b', snippet=LONG_TEXT)
+        self.assertTrue(first.truncated)
+        self.assertEqual(first.preview, LONG_TEXT[:blobs.preview_chars()])
+        self.assertEqual(self.refs(LONG_TEXT), 2)
+        self.assertEqual(MemoryBlob.objects.count(), 1)
+        self.assertEqual(Memory.objects.get(pk=second.pk).snippet, LONG_TEXT)
+
+    def test_short_text_has_no_blob(self):
+        memory = Memory.objects.create(user=self.user, title='a', snippet='short')
+        self.assertFalse(memory.truncated)
+        self.assertIsNone(memory.body_id)
+        self.assertFalse(MemoryBlob.objects.exists())
+
+    def test_saving_the_same_text_keeps_one_reference(self):
+        memory = Memory.objects.create(user=self.user, title='a', snippet=LONG_TEXT)
+        memory.snippet = LONG_TEXT
+        memory.save()
+        memory.title = 'renamed'
+        memory.save()
+        self.assertEqual(self.refs(LONG_TEXT), 1)
+
+        memory.snippet = 'short now'
+        memory.save()
+        self.assertIsNone(self.refs(LONG_TEXT))
+        self.assertEqual(Memory.objects.get(pk=memory.pk).snippet, 'short now')
+
+    def test_batch_moves_references(self):
+        other = LONG_TEXT + ' again'
+        memory = Memory.objects.create(user=self.user, title='a', snippet=LONG_TEXT)
+        results = run_batch(self.user, Memory, MemorySerializer, {
+            'create': [{'title': 'b', 'snippet': other}],
+            'update': [{'id': memory.pk, 'snippet': other}],
+        })
+        self.assertEqual([r['status'] for r in results['create'] + results['update']], [201, 200])
+        self.assertIsNone(self.refs(LONG_TEXT))
+        self.assertEqual(self.refs(other), 2)
+        self.assertEqual(Memory.objects.get(pk=memory.pk).snippet, other)
+
+    def test_queryset_delete_releases(self):
+        first = Memory.objects.create(user=self.user, title='a', snippet=LONG_TEXT)
+        Memory.objects.create(user=self.user, title='b', snippet=LONG_TEXT)
+        Memory.objects.filter(pk=first.pk).delete()
+        self.assertEqual(self.refs(LONG_TEXT), 1)
+        Memory.objects.filter(user=self.user).delete()
+        self.assertFalse(MemoryBlob.objects.exists())
+
+    def test_cascade_delete_releases(self):
+        Memory.objects.create(user=self.user, title='a', snippet=LONG_TEXT)
+        Memory.objects.create(user=self.user, title='b', snippet=LONG_TEXT + ' again')
+        self.user.delete()
+        self.assertFalse(MemoryBlob.objects.exists())
+
+
+class MemorySearchTests(TestCase):
+    def setUp(self):
+        self.user = make_user('search')
+
+    def found(self, query):
+        return [memory.pk for memory in search.search_memories(self.user, query)[0]]
+
+    def test_matches_text_past_the_preview(self):
+        memory = Memory.objects.create(user=self.user, title='notes', snippet=LONG_TEXT)
+        self.assertEqual(self.found('zebraword'), [memory.pk])
+        self.assertEqual(search._fallback_ids(self.user.pk, ['zebraword'], 10, 0), [memory.pk])
+
+    def test_ranks_title_matches_first_and_prefix_matches(self):
+        body = Memory.objects.create(user=self.user, title='groceries', snippet='buy a telescope')
+        title = Memory.objects.create(user=self.user, title='telescope notes', snippet='lenses')
+        Memory.objects.create(user=make_user('search2'), title='telescope', snippet='not yours')
+        self.assertEqual(self.found('telescope'), [title.pk, body.pk])
+        self.assertEqual(self.found('teles'), [title.pk, body.pk])
+        self.assertEqual(self.found('telescope lenses'), [title.pk])
+        self.assertEqual(self.found('!!'), [])
+
+    def test_endpoint_pages(self):
+        for n in range(3):
+            Memory.objects.create(user=self.user, title=f'orchid {n}')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        first = client.get('/api/memories/search/', {'q': 'orchid', 'limit': 2}).json()
+        self.assertEqual((len(first['results']), first['next_offset']), (2, 2))
+        second = client.get('/api/memories/search/', {'q': 'orchid', 'limit': 2, 'offset': 2}).json()
+        self.assertEqual((len(second['results']), second['next_offset']), (1, None))
+        self.assertEqual(client.get('/api/memories/search/', {'q': 'orchid', 'limit': 'x'}).status_code, 400)
+
+    def test_index_follows_writes(self):
+        memory = Memory.objects.create(user=self.user, title='notes', snippet=LONG_TEXT)
+        memory.snippet = LONG_TEXT.replace('zebraword', 'quaggaword')
+        memory.save()
+        self.assertEqual(self.found('zebraword'), [])
+        self.assertEqual(self.found('quaggaword'), [memory.pk])
+        memory.snippet = 'short okapiword'
+        memory.save()
+        self.assertEqual(self.found('quaggaword'), [])
+        self.assertEqual(self.found('okapiword'), [memory.pk])
+        memory.delete()
+        self.assertEqual(self.found('okapiword'), [])
+
+
+# ─── Workspace export/import (api.workspace) ────────────────────────────────
+
+class Interrupted(Exception):
+    pass
+
+
+def cut_after(lines, count):
+    """The first ``count`` lines, then the connection drops."""
+    yield from lines[:count]
+    raise Interrupted
+
+
+class WorkspaceResumeTests(TestCase):
+    def setUp(self):
+        self.user = make_user('source')
+        for n in range(3):
+            chat = Chat.objects.create(user=self.user, title=f'chat {n}')
+            for i in range(3):
+                ChatMessage.objects.create(chat=chat, role='user' if i % 2 == 0 else 'ai', content=f'{n}.{i}')
+        Chat.objects.create(user=self.user, title='empty')
+        # The middle chat goes to an archive (api.archive).
+        self.archived = Chat.objects.filter(user=self.user).order_by('id')[1]
+        archive_chat(self.archived.pk, timezone.now() + timedelta(minutes=1))
+        Memory.objects.create(user=self.user, title='long', snippet=LONG_TEXT)
+        Memory.objects.create(user=self.user, title='short', snippet='short')
+        Reminder.objects.create(user=self.user, text='first')
+        Reminder.objects.create(user=self.user, text='second', due_date='Tomorrow')
+
+    def test_export_resumes_after_every_position(self):
+        records = list(export_records(self.user))
+        self.assertEqual(len(records), 4 + 9 + 2 + 2)
+        archived = [r for r in records if r['type'] == 'message' and r['chat'] == self.archived.pk]
+        self.assertEqual(len(archived), 3)
+        for i, record in enumerate(records):
+            with self.subTest(after=position(record)):
+                self.assertEqual(list(export_records(self.user, after=position(record))), records[i + 1:])
+
+    def content(self, user):
+        # Everything but the ids, which differ between accounts.
+        return [(r['type'], r['fields']) for r in export_records(user)]
+
+    def test_import_resumes_after_an_interruption(self):
+        lines = list(export_lines(self.user))
+        for cut in range(1, len(lines)):
+            with self.subTest(cut=cut):
+                target = make_user(f'target{cut}')
+                transfer = WorkspaceImport.objects.create(user=target)
+                with self.assertRaises(Interrupted):
+                    import_lines(target, cut_after(lines, cut), transfer, batch_size=2)
+
+                transfer = WorkspaceImport.objects.get(pk=transfer.pk)
+                self.assertLessEqual(transfer.lines, cut)
+                import_lines(target, lines, transfer, batch_size=2)
+                self.assertEqual(transfer.status, WorkspaceImport.DONE)
+                self.assertEqual(counts(target), counts(self.user))
+                self.assertEqual(self.content(target), self.content(self.user))
+
+
+# ─── Vector recall (api.vectors) ────────────────────────────────────────────
+
+class VectorRebuildTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(VECTOR_INDEX_DIR=directory.name))
+        self.user = make_user('vectors')
+        self.other = make_user('vectors2')
+
+    def indexed(self, user):
+        ids, _ = vectors.user_index(user.pk)._open()
+        return sorted(int(i) for i in ids if i > 0) if ids is not None else []
+
+    def rebuild(self, *args):
+        call_command('rebuild_memory_vectors', *args, stdout=mock.Mock())
+
+    def test_rebuild_indexes_and_finds(self):
+        kept = Memory.objects.create(user=self.user, title='sailing', snippet='boats and wind on the harbour')
+        Memory.objects.create(user=self.user, title='cooking', snippet='onions garlic and butter')
+        self.rebuild()
+        self.assertEqual(len(self.indexed(self.user)), 2)
+        [(best, _)] = vectors.similar_memories(self.user, 'wind boats harbour', k=1)
+        self.assertEqual(best.pk, kept.pk)
+
+    def test_rebuild_drops_deleted_memories(self):
+        kept = Memory.objects.create(user=self.user, title='a', snippet='kept')
+        gone = Memory.objects.create(user=self.user, title='b', snippet='gone')
+        only = Memory.objects.create(user=self.other, title='c', snippet='gone too')
+        self.rebuild()
+        # Deleted without the jobs that would remove them from the index.
+        Memory.objects.filter(pk__in=[gone.pk, only.pk]).delete()
+        self.rebuild()
+        self.assertEqual(self.indexed(self.user), [kept.pk])
+        self.assertEqual(self.indexed(self.other), [])
+
+    def test_rebuild_compacts_each_index_once(self):
+        for n in range(5):
+            Memory.objects.create(user=self.user, title=f'm{n}', snippet='text')
+            Memory.objects.create(user=self.other, title=f'm{n}', snippet='text')
+        with mock.patch.object(vectors.VectorIndex, 'compact', autospec=True) as compact:
+            self.rebuild()
+        self.assertEqual(sorted(c.args[0].path for c in compact.call_args_list),
+                         sorted(vectors.user_index(u.pk).path for u in (self.user, self.other)))
+
+
+# ─── Batch endpoints (api.batch) ────────────────────────────────────────────
+
+class BatchEndpointTests(TestCase):
+    def setUp(self):
+        self.user = make_user('batch')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def batch(self, body):
+        return self.api.post('/api/reminders/batch/', body, format='json')
+
+    def test_reports_every_item_in_order(self):
+        mine = Reminder.objects.create(user=self.user, text='mine')
+        gone = Reminder.objects.create(user=self.user, text='gone')
+        theirs = Reminder.objects.create(user=make_user('batch2'), text='theirs')
+        since = changes_since(self.user)['version']
+
+        response = self.batch({
+            'create': [{'text': 'new'}, {'text': ''}, {'text': 'newer', 'due_date': 'Tomorrow'}],
+            'update': [{'id': mine.pk, 'completed': True}, {'id': theirs.pk, 'text': 'stolen'}, {'id': 'x'}],
+            'delete': [gone.pk, theirs.pk, 'y'],
+        })
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([r['status'] for r in results['create']], [201, 400, 201])
+        self.assertEqual([r['status'] for r in results['update']], [200, 404, 404])
+        self.assertEqual([r['status'] for r in results['delete']], [204, 404, 404])
+        self.assertIsNotNone(results['create'][2]['data']['due_at'])
+
+        self.assertEqual(sorted(Reminder.objects.filter(user=self.user).values_list('text', flat=True)),
+                         ['mine', 'new', 'newer'])
+        self.assertTrue(Reminder.objects.get(pk=mine.pk).completed)
+        self.assertEqual(Reminder.objects.get(pk=theirs.pk).text, 'theirs')
+
+        changes = changes_since(self.user, since)
+        self.assertEqual(len(changes['reminders']['upserted']), 3)
+        self.assertEqual(changes['reminders']['deleted'], [gone.pk])
+
+    def test_rejects_malformed_batches(self):
+        for body in (['create'], {'create': {'text': 'x'}}, {'delete': list(range(MAX_BATCH_SIZE + 1))}):
+            with self.subTest(body=str(body)[:40]):
+                self.assertEqual(self.batch(body).status_code, 400)
+        self.assertFalse(Reminder.objects.exists())
+
+    def test_memory_batch(self):
+        response = self.api.post('/api/memories/batch/', {'create': [{'title': 'a', 'snippet': LONG_TEXT}]}, format='json')
+        [created] = response.json()['create']
+        self.assertEqual(created['status'], 201)
+        self.assertEqual(Memory.objects.get(pk=created['data']['id']).snippet, LONG_TEXT)
+
+
+# ─── Dashboard widgets (api.dashboard) ──────────────────────────────────────
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.user = make_user('dashboard')
+        dashboard.get_stats(self.user)
+        # Writes must move the counters without counting rows.
+        self.counts = mock.Mock(wraps=dashboard._count_fields)
+        self.enterContext(mock.patch.dict(dashboard._BUILDERS, counts=self.counts))
+
+    def stats(self):
+        stats = DashboardStats.objects.get(user=self.user)
+        return stats.active_reminders, stats.memories
+
+    def due_today(self, minutes=60):
+        return dashboard._today()[0] + timedelta(minutes=minutes)
+
+    def test_counters_follow_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reminder = Reminder.objects.create(user=self.user, text='call')
+            memory = Memory.objects.create(user=self.user, title='note')
+            Memory.objects.create(user=self.user, title='other')
+        self.assertEqual(self.stats(), (1, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reminder.completed = True
+            reminder.save()
+            reminder.save()
+            memory.title = 'renamed'
+            memory.save()
+        self.assertEqual(self.stats(), (0, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reminder = Reminder.objects.get(pk=reminder.pk)
+            reminder.completed = False
+            reminder.save()
+            memory.delete()
+        self.assertEqual(self.stats(), (1, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            Reminder.objects.filter(user=self.user).delete()
+        self.assertEqual(self.stats(), (0, 1))
+        self.counts.assert_not_called()
+
+    def test_batch_moves_counters(self):
+        first, second = (Reminder.objects.create(user=self.user, text=t) for t in ('a', 'b'))
+        with self.captureOnCommitCallbacks(execute=True):
+            run_batch(self.user, Reminder, ReminderSerializer, {
+                'create': [{'text': 'c'}, {'text': 'd', 'completed': True}],
+                'update': [{'id': first.pk, 'completed': True}],
+                'delete': [second.pk],
+            })
+        self.assertEqual(self.stats(), (1, 0))
+        self.counts.assert_not_called()
+
+    def test_unloaded_reminder_recounts(self):
+        reminder = Reminder.objects.create(user=self.user, text='call')
+        with self.captureOnCommitCallbacks(execute=True):
+            Reminder(pk=reminder.pk, user=self.user, text='call', completed=True,
+                     created_at=reminder.created_at).save()
+        self.assertEqual(self.stats(), (0, 0))
+        self.counts.assert_called_once_with(self.user.pk)
+
+    def test_due_today_counts_past_the_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(dashboard.DUE_TODAY + 2):
+                Reminder.objects.create(user=self.user, text=f'r{n}', due_at=self.due_today(n))
+            Reminder.objects.create(user=self.user, text='later', due_at=self.due_today(60 * 24 + 1))
+        stats = dashboard.get_stats(self.user)
+        self.assertEqual(len(stats.due_today), dashboard.DUE_TODAY)
+        self.assertEqual(stats.due_today_count, dashboard.DUE_TODAY + 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reminder.objects.filter(text='r0').get().delete()
+        self.assertEqual(dashboard.get_stats(self.user).due_today_count, dashboard.DUE_TODAY + 1)
+
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get('/'), f'{dashboard.DUE_TODAY + 1} due today')
+
+    def test_other_days_leave_the_list_alone(self):
+        with mock.patch.object(dashboard, 'schedule_refresh') as schedule:
+            reminder = Reminder.objects.create(user=self.user, text='later', due_at=self.due_today(60 * 24 + 1))
+            reminder.text = 'still later'
+            reminder.save()
+        schedule.assert_not_called()
+
+
+# ─── Commit callbacks (api.commit) ──────────────────────────────────────────
+
+class DeferTests(TestCase):
+    def test_merges_items_per_key(self):
+        func = mock.Mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            defer(func, 1, ['a'])
+            defer(func, 2, ['c'])
+            defer(func, 1, ['b', 'a'])
+        self.assertEqual(func.call_args_list, [mock.call(1, {'a', 'b'}), mock.call(2, {'c'})])
+
+
+# ─── Job queue (api.jobs) ───────────────────────────────────────────────────
+
+@override_settings(JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch.dict(jobs._handlers))
+        self.ran = []
+        jobs.job('test_record')(lambda **payload: self.ran.append(payload))
+        jobs.job('test_capped', concurrency=1)(lambda **payload: None)
+        jobs.job('test_failing', max_attempts=2)(mock.Mock(side_effect=RuntimeError('boom')))
+
+    def test_claims_due_jobs_once(self):
+        first = jobs.enqueue('test_record', n=1)
+        second = jobs.enqueue('test_record', n=2)
+        jobs.enqueue('test_record', delay=timedelta(hours=1), n=3)
+        claimed = jobs.claim('w1', limit=5)
+        self.assertEqual([job.pk for job in claimed], [first.pk, second.pk])
+        self.assertEqual({(job.status, job.attempts, job.locked_by) for job in claimed}, {(Job.RUNNING, 1, 'w1')})
+        self.assertEqual(jobs.claim('w2', limit=5), [])
+
+        self.assertTrue(jobs.execute(claimed[0]))
+        self.assertEqual(self.ran, [{'n': 1}])
+        self.assertFalse(Job.objects.filter(pk=first.pk).exists())
+
+    def test_concurrency_cap(self):
+        for _ in range(3):
+            jobs.enqueue('test_capped')
+        [running] = jobs.claim('w1', limit=3)
+        self.assertEqual(jobs.claim('w2', limit=3), [])
+        jobs.execute(running)
+        self.assertEqual(len(jobs.claim('w2', limit=3)), 1)
+
+    def test_failures_back_off_then_fail(self):
+        queued = jobs.enqueue('test_failing')
+        self.assertFalse(jobs.execute(jobs.claim('w1')[0]))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.QUEUED)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertEqual(jobs.claim('w1'), [])
+
+        Job.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        self.assertFalse(jobs.execute(jobs.claim('w1')[0]))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.FAILED, 2))
+        self.assertIn('boom', queued.last_error)
+
+    def test_stale_jobs_are_swept_not_claimed(self):
+        old = timezone.now() - jobs.STALE_AFTER - timedelta(minutes=1)
+        retry = jobs.enqueue('test_record', n=1)
+        spent = jobs.enqueue('test_record', n=2)
+        Job.objects.filter(pk=retry.pk).update(status=Job.RUNNING, locked_at=old, attempts=1)
+        Job.objects.filter(pk=spent.pk).update(status=Job.RUNNING, locked_at=old, attempts=5)
+        self.assertEqual(jobs.claim('w1'), [])
+
+        jobs.run_worker('w1', once=True)
+        self.assertEqual(self.ran, [{'n': 1}])
+        spent.refresh_from_db()
+        self.assertEqual(spent.status, Job.FAILED)
+
+
+# ─── Chat context (api.context) ─────────────────────────────────────────────
+
+@override_settings(JOBS_EAGER=False, CHAT_WINDOW_TOKENS=200)
+class ChatContextTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(VECTOR_INDEX_DIR=directory.name))
+        self.provider = StubProvider()
+        self.chat = Chat.objects.create(user=make_user('context'), title='long')
+        self.say(20)
+
+    def say(self, count):
+        for n in range(count):
+            ChatMessage.objects.create(chat=self.chat, role='user' if n % 2 == 0 else 'ai', content=f'{n} ' + 'word ' * 19)
+
+    def queued(self):
+        return Job.objects.filter(kind='summarize_chat').count()
+
+    def test_overflow_queues_one_summary_per_chat(self):
+        messages = context.build_context(self.chat, 'next', self.provider)
+        self.assertEqual(messages[-1], {'role': 'user', 'content': 'next'})
+        self.assertLess(len(messages), 20)
+        context.build_context(self.chat, 'again', self.provider)
+        self.assertEqual(self.queued(), 1)
+
+        other = Chat.objects.create(user=self.chat.user, title='other')
+        ChatMessage.objects.bulk_create(ChatMessage(chat=other, role='user', content='word ' * 200) for _ in range(2))
+        context.build_context(other, 'next', self.provider)
+        self.assertEqual(self.queued(), 2)
+
+        [summarize] = jobs.claim('w1', kinds=['summarize_chat'])
+        context.build_context(Chat.objects.get(pk=summarize.payload['chat_id']), 'again', self.provider)
+        self.assertEqual(self.queued(), 2)
+        jobs.execute(summarize)
+        self.assertEqual(self.queued(), 1)
+
+    def test_summary_keeps_the_newest_half_window(self):
+        self.assertTrue(context.summarize_chat(self.chat, self.provider))
+        self.chat.refresh_from_db()
+        self.assertTrue(self.chat.summary)
+        recent = context._unsummarized(self.chat)
+        self.assertLessEqual(sum(self.provider.count_tokens(m['content']) for m in recent), 100)
+        self.assertGreater(len(recent), 0)
+
+        messages = context.build_context(self.chat, 'next', self.provider)
+        self.assertEqual(messages[0]['role'], 'system')
+        self.assertIn(self.chat.summary, messages[0]['content'])
+        self.assertEqual([m['content'] for m in messages[1:-1]], [m['content'] for m in recent])
+        self.assertEqual(self.queued(), 0)
+
+
+# ─── Chat streams (api.streaming) ───────────────────────────────────────────
+
+async def _collect(parts):
+    return b''.join([part async for part in parts])
+
+
+class ChatStreamTests(TestCase):
+    PATHS = ('/api/chats/stream/', '/api/async/chats/stream/')
+
+    def setUp(self):
+        self.user = make_user('stream')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+
+    def post(self, path, body):
+        return self.client.post(path, body, content_type='application/json', **self.auth)
+
+    def events(self, response):
+        self.assertEqual(response.status_code, 200)
+        body = async_to_sync(_collect)(response.streaming_content) if response.is_async \
+            else b''.join(response.streaming_content)
+        return [line[len('event: '):] for line in body.decode().splitlines() if line.startswith('event: ')]
+
+    def test_new_chat_is_saved_with_the_reply(self):
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                events = self.events(self.post(path, {'content': f'hello from {path}'}))
+                self.assertEqual(events[-2:], ['chat', 'done'])
+                chat = Chat.objects.get(user=self.user, title__startswith='hello from')
+                self.assertEqual(chat.messages.count(), 2)
+                chat.delete()
+
+    def test_failed_reply_leaves_no_chat(self):
+        with mock.patch.object(StubProvider, '_words', side_effect=RuntimeError('provider down')):
+            for path in self.PATHS:
+                with self.subTest(path=path):
+                    self.assertEqual(self.events(self.post(path, {'content': f'fails on {path}'})), ['error'])
+        self.assertFalse(Chat.objects.exists())
+
+    def test_body_must_be_an_object(self):
+        for path in self.PATHS:
+            with self.subTest(path=path):
+                self.assertEqual(self.post(path, ['hello']).status_code, 400)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.put('/api/settings/', ['x'], format='json').status_code, 400)
+
+
+# ─── Delta sync (api.sync) ──────────────────────────────────────────────────
+
+class SyncFeedTests(TestCase):
+    def setUp(self):
+        self.user = make_user('sync')
+
+    def synced(self, user, since=0):
+        changes = changes_since(user, since)
+        return {name: len(changes[name]['upserted']) for name in ('chats', 'memories', 'reminders')}
+
+    def test_demo_seed_is_synced(self):
+        call_command('seed_data', stdout=mock.Mock())
+        user = User.objects.get(username='jane@example.com')
+        self.assertEqual(self.synced(user), {'chats': 1, 'memories': 1, 'reminders': 2})
+
+    def test_bulk_seed_is_synced(self):
+        call_command('seed_data', users=1, chats=2, messages=2, memories=3, reminders=4, stdout=mock.Mock())
+        user = User.objects.get(username__startswith='bench')
+        self.assertEqual(self.synced(user), {'chats': 2, 'memories': 3, 'reminders': 4})
+
+    def test_feed_returns_updates_and_deletions_once(self):
+        reminder = Reminder.objects.create(user=self.user, text='call')
+        memory = Memory.objects.create(user=self.user, title='note')
+        since = changes_since(self.user)['version']
+        reminder.completed = True
+        reminder.save()
+        memory_id = memory.pk
+        memory.delete()
+
+        changes = changes_since(self.user, since)
+        self.assertEqual([r['id'] for r in changes['reminders']['upserted']], [reminder.pk])
+        self.assertEqual(changes['memories']['deleted'], [memory_id])
+        self.assertEqual(changes_since(self.user, changes['version'])['version'], changes['version'])
+
+    def test_small_pages_skip_nothing(self):
+        for n in range(3):
+            Reminder.objects.create(user=self.user, text=f'r{n}')
+            Memory.objects.create(user=self.user, title=f'm{n}')
+        seen, since, has_more = [], 0, True
+        while has_more:
+            changes = changes_since(self.user, since, limit=2)
+            seen += [(name, row['id']) for name in ('memories', 'reminders') for row in changes[name]['upserted']]
+            since, has_more = changes['version'], changes['has_more']
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        Reminder.objects.create(user=self.user, text='call')
+        response = client.get('/api/sync/', {'since': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['reminders']['upserted']), 1)
+        self.assertEqual(client.get('/api/sync/', {'since': 'x'}).status_code, 400)
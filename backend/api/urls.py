@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # Pages (HTML)
@@ -20,10 +20,39 @@ urlpatterns = [
     path('api/chats/', views.chat_list),
     path('api/chats/<int:chat_id>/', views.chat_detail),
     path('api/chats/<int:chat_id>/messages/', views.chat_messages),
+    path('api/chats/stream/', views.chat_stream),
+    path('api/chats/<int:chat_id>/stream/', views.chat_stream),
     
     path('api/memories/', views.memory_list),
+    path('api/memories/search/', views.memory_search),
+    path('api/memories/similar/', views.memory_similar),
+    path('api/memories/batch/', views.memory_batch),
     path('api/memories/<int:memory_id>/', views.memory_detail),
     
     path('api/reminders/', views.reminder_list),
+    path('api/reminders/batch/', views.reminder_batch),
+    path('api/reminders/upcoming/', views.reminder_upcoming),
+    path('api/reminders/overdue/', views.reminder_overdue),
     path('api/reminders/<int:reminder_id>/', views.reminder_detail),
+
+    path('api/sync/', views.sync_view),
+
+    path('api/workspace/export/', views.workspace_export),
+    path('api/workspace/import/', views.workspace_import),
+    path('api/workspace/imports/<int:import_id>/', views.workspace_import_detail),
+
+    # Async API (ASGI-native mirrors of the chat, memory and reminder endpoints)
+    path('api/async/chats/', async_views.chat_list),
+    path('api/async/chats/<int:chat_id>/', async_views.chat_detail),
+    path('api/async/chats/<int:chat_id>/messages/', async_views.chat_messages),
+    path('api/async/chats/stream/', async_views.chat_stream),
+    path('api/async/chats/<int:chat_id>/stream/', async_views.chat_stream),
+    path('api/async/memories/', async_views.memory_list),
+    path('api/async/memories/<int:memory_id>/', async_views.memory_detail),
+    path('api/async/reminders/', async_views.reminder_list),
+    path('api/async/reminders/<int:reminder_id>/', async_views.reminder_detail),
+
+    path('api/admin/provider-cache/', views.provider_cache_view),
+
+    path('metrics', views.metrics_view),
 ]
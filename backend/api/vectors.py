@@ -0,0 +1,278 @@
+"""
+Semantic recall over Memory rows.
+
+Each user's memories are embedded by a pluggable embedder
+(``settings.MEMORY_EMBEDDER``, a local hashing embedder by default) and
+stored in a per-user, memory-mapped NumPy index under
+``settings.VECTOR_INDEX_DIR``. Vectors are L2-normalised, so cosine
+similarity is a dot product and top-k search is a chunked matrix multiply.
+"""
+
+import contextlib
+import importlib.util
+import os
+import re
+import sys
+import zlib
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .models import Memory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def _lazy_import(name):
+    # Every process imports this module at startup (api.tasks), but only the
+    # ones that embed or search pay for NumPy: it loads on first attribute use.
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = sys.modules[name] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+np = _lazy_import('numpy')
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+SEARCH_CHUNK_ROWS = 32768
+MIN_CAPACITY = 1024
+
+
+# ─── Embedders ──────────────────────────────────────────────────────────────
+
+class BaseEmbedder:
+    dim = 0
+
+    def embed(self, texts):
+        """Return a ``(len(texts), dim)`` float32 array of unit vectors."""
+        raise NotImplementedError
+
+
+class HashingEmbedder(BaseEmbedder):
+    """
+    Offline embedder: signed feature hashing of word unigrams and bigrams
+    with log-scaled term frequency. Deterministic across processes and needs
+    no model files.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _features(self, text):
+        words = _WORD_RE.findall(text.lower())
+        return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode())
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        out = np.sign(out) * np.log1p(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+def get_embedder():
+    return import_string(getattr(settings, 'MEMORY_EMBEDDER', 'api.vectors.HashingEmbedder'))()
+
+
+# ─── Index ──────────────────────────────────────────────────────────────────
+
+class VectorIndex:
+    """
+    Append-only, memory-mapped vector store for one user.
+
+    ``ids.npy`` and ``vectors.npy`` are preallocated and doubled when full;
+    an id of 0 marks an unused slot and -1 a removed one. Removed slots are
+    reclaimed by ``compact()``.
+    """
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+        self.ids_path = os.path.join(path, 'ids.npy')
+        self.vectors_path = os.path.join(path, 'vectors.npy')
+
+    @contextlib.contextmanager
+    def _lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, '.lock'), 'a') as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _open(self, mode='r'):
+        if not os.path.exists(self.ids_path):
+            return None, None
+        vectors = np.load(self.vectors_path, mmap_mode=mode)
+        if vectors.shape[1] != self.dim:
+            return None, None
+        return np.load(self.ids_path, mmap_mode=mode), vectors
+
+    def _allocate(self, capacity, ids=None, vectors=None):
+        count = 0 if ids is None else len(ids)
+        tmp_ids, tmp_vectors = self.ids_path + '.tmp', self.vectors_path + '.tmp'
+        new_ids = np.lib.format.open_memmap(tmp_ids, mode='w+', dtype=np.int64, shape=(capacity,))
+        new_vectors = np.lib.format.open_memmap(tmp_vectors, mode='w+', dtype=np.float32, shape=(capacity, self.dim))
+        if count:
+            new_ids[:count] = ids
+            new_vectors[:count] = vectors
+        new_ids.flush()
+        new_vectors.flush()
+        del new_ids, new_vectors
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_ids, self.ids_path)
+
+    @staticmethod
+    def _used(ids):
+        nonzero = np.flatnonzero(ids)
+        return int(nonzero[-1]) + 1 if len(nonzero) else 0
+
+    def upsert(self, ids, vectors):
+        if not len(ids):
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock():
+            stored_ids, stored = self._open()
+            if stored_ids is None:
+                self._allocate(max(MIN_CAPACITY, len(ids)))
+                stored_ids, stored = self._open()
+            used = self._used(stored_ids)
+            live = np.asarray(stored_ids[:used])
+            if used + len(ids) > len(stored_ids):
+                capacity = max(len(stored_ids) * 2, used + len(ids))
+                self._allocate(capacity, live, np.asarray(stored[:used]))
+            stored_ids, stored = self._open('r+')
+
+            rows = {int(obj_id): row for row, obj_id in enumerate(live)}
+            for obj_id, vector in zip(ids, vectors):
+                row = rows.get(int(obj_id))
+                if row is None:
+                    row = used
+                    used += 1
+                    stored_ids[row] = obj_id
+                stored[row] = vector
+            stored.flush()
+            stored_ids.flush()
+
+    def remove(self, ids):
+        with self._lock():
+            stored_ids, stored = self._open('r+')
+            if stored_ids is None:
+                return
+            rows = np.flatnonzero(np.isin(stored_ids, np.asarray(ids, dtype=np.int64)))
+            stored_ids[rows] = -1
+            stored[rows] = 0
+            stored_ids.flush()
+            stored.flush()
+
+    def compact(self, live_ids=None):
+        """Reclaim removed slots, and drop every id not in ``live_ids`` when given."""
+        with self._lock():
+            stored_ids, stored = self._open()
+            if stored_ids is None:
+                return
+            kept = np.asarray(stored_ids) > 0
+            if live_ids is not None:
+                kept &= np.isin(stored_ids, np.fromiter(live_ids, dtype=np.int64))
+            keep = np.flatnonzero(kept)
+            self._allocate(max(MIN_CAPACITY, len(keep) * 2), np.asarray(stored_ids[keep]), np.asarray(stored[keep]))
+
+    def search(self, queries, k=5):
+        """
+        Return, for each row of ``queries``, a list of ``(id, score)`` pairs
+        for the ``k`` most similar stored vectors, best first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        stored_ids, stored = self._open()
+        if stored_ids is None:
+            return [[] for _ in queries]
+        used = self._used(stored_ids)
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, used, SEARCH_CHUNK_ROWS):
+            stop = min(start + SEARCH_CHUNK_ROWS, used)
+            scores = queries @ np.asarray(stored[start:stop]).T
+            scores[:, np.asarray(stored_ids[start:stop]) <= 0] = -np.inf
+            rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([
+                (int(stored_ids[rows[i]]), float(scores[i]))
+                for i in order if np.isfinite(scores[i])
+            ])
+        return results
+
+
+def _index_root():
+    return getattr(settings, 'VECTOR_INDEX_DIR', os.path.join(settings.BASE_DIR, 'vector_index'))
+
+
+def user_index(user_id, embedder=None):
+    embedder = embedder or get_embedder()
+    return VectorIndex(os.path.join(_index_root(), str(user_id)), embedder.dim)
+
+
+def indexed_users():
+    """Ids of the users that have an index on disk."""
+    try:
+        names = os.listdir(_index_root())
+    except FileNotFoundError:
+        return []
+    return [int(name) for name in names if name.isdigit()]
+
+
+# ─── Memory recall ──────────────────────────────────────────────────────────
+
+def memory_text(memory):
+    return f'{memory.title}\n{memory.type}\n{memory.snippet}'
+
+
+def index_memories(memories):
+    """Embed ``memories`` and upsert them into their owners' indexes."""
+    embedder = get_embedder()
+    by_user = {}
+    for memory in memories:
+        by_user.setdefault(memory.user_id, []).append(memory)
+    for user_id, rows in by_user.items():
+        vectors = embedder.embed([memory_text(m) for m in rows])
+        user_index(user_id, embedder).upsert([m.pk for m in rows], vectors)
+
+
+def remove_memories(user_id, memory_ids):
+    user_index(user_id).remove(memory_ids)
+
+
+def similar_memories(user, text, k=5):
+    """Return up to ``k`` ``(Memory, score)`` pairs most similar to ``text``."""
+    embedder = get_embedder()
+    query = embedder.embed([text])
+    if not query.any():
+        return []
+    [hits] = user_index(user.pk, embedder).search(query, k=k)
+    # The index may briefly hold ids of rows deleted by another process.
+    by_id = Memory.objects.filter(user=user).in_bulk([obj_id for obj_id, _ in hits])
+    return [(by_id[obj_id], score) for obj_id, score in hits if obj_id in by_id and score > 0]
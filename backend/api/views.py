@@ -1,4 +1,11 @@
+import io
+from datetime import timedelta
+
 from django.shortcuts import render, redirect
+from django.http import HttpResponse, StreamingHttpResponse
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.contrib.auth.decorators import login_required
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
@@ -6,23 +13,69 @@ from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout, get_user_model
 from django.views.decorators.csrf import csrf_exempt
-from .models import Chat, ChatMessage, Memory, Reminder
+from . import archive
+from .batch import BatchError, run_batch
+from .caching import cached_collection
+from .context import build_context
+from .dashboard import get_stats
+from .metrics import registry
+from .models import BriefingState, Chat, ChatMessage, Memory, ProviderResponse, Reminder, WorkspaceImport
+from .pagination import KeysetPaginator
+from .provider_cache import stats as provider_cache_stats
+from .providers import get_provider
+from .search import search_memories
+from .streaming import ReplyStream
+from .sync import changes_since
+from .workspace import (
+    WorkspaceError, aiterate, buffered, export_lines, gzip_chunks, import_lines, parse_position, read_lines,
+)
+from .vectors import similar_memories
 from .serializers import (
     UserSerializer, RegisterSerializer, LoginSerializer,
     ChatSerializer, ChatMessageSerializer,
-    MemorySerializer, ReminderSerializer,
+    MemoryDetailSerializer, MemorySerializer, ReminderSerializer, row_encoder,
 )
 
 User = get_user_model()
 
+chat_paginator = KeysetPaginator('updated_at')
+message_paginator = KeysetPaginator('created_at', descending=False, tail=True)
+memory_paginator = KeysetPaginator('created_at')
+reminder_paginator = KeysetPaginator('created_at')
+
+
+def paginated_response(request, queryset, serializer_class, paginator):
+    # Lists read plain rows and encode them directly (see row_encoder).
+    columns, encode = row_encoder(serializer_class)
+    queryset = queryset.values(*dict.fromkeys([*columns, paginator.field, 'id']))
+    try:
+        rows, cursors = paginator.paginate(request, queryset)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': encode(rows), **cursors})
+
+
+def batch_response(request, model, serializer_class):
+    try:
+        results = run_batch(request.user, model, serializer_class, request.data)
+    except BatchError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(results)
+
 
 # ─── Template Views ───────────────────────────────────────────────────────────
 
 @login_required(login_url='/login/')
 def dashboard_view(request):
+    stats = get_stats(request.user)
+    briefing = BriefingState.objects.filter(user=request.user).select_related('memory').first()
     return render(request, 'dashboard.html', {
-        'reminder_count': Reminder.objects.filter(user=request.user, completed=False).count(),
-        'memory_count': Memory.objects.filter(user=request.user).count(),
+        'reminder_count': stats.active_reminders,
+        'memory_count': stats.memories,
+        'due_today': stats.due_today,
+        'due_today_count': stats.due_today_count,
+        'recent_chats': stats.recent_chats,
+        'briefing': briefing.memory if briefing else None,
     })
 
 
@@ -96,6 +149,7 @@ def logout_view(request):
 
 
 @api_view(['GET', 'PUT'])
+@cached_collection('user')
 def me_view(request):
     if request.method == 'GET':
         return Response(UserSerializer(request.user).data)
@@ -116,10 +170,13 @@ def password_reset_view(request):
 # ─── Settings Views ──────────────────────────────────────────────────────────
 
 @api_view(['GET', 'PUT'])
+@cached_collection('user')
 def settings_view(request):
     if request.method == 'GET':
         return Response(request.user.settings or {})
 
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Settings must be a JSON object.'}, status=status.HTTP_400_BAD_REQUEST)
     request.user.settings = request.data
     request.user.save(update_fields=['settings'])
     return Response(request.user.settings)
@@ -128,10 +185,11 @@ def settings_view(request):
 # ─── Chat Views ──────────────────────────────────────────────────────────────
 
 @api_view(['GET', 'POST'])
+@cached_collection('chats')
 def chat_list(request):
     if request.method == 'GET':
         chats = Chat.objects.filter(user=request.user)
-        return Response(ChatSerializer(chats, many=True).data)
+        return paginated_response(request, chats, ChatSerializer, chat_paginator)
 
     serializer = ChatSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -154,10 +212,11 @@ def chat_messages(request, chat_id):
         chat = Chat.objects.get(id=chat_id, user=request.user)
     except Chat.DoesNotExist:
         return Response({'error': 'Chat not found.'}, status=status.HTTP_404_NOT_FOUND)
+    if chat.archived:
+        archive.restore(chat)
 
     if request.method == 'GET':
-        messages = chat.messages.all()
-        return Response(ChatMessageSerializer(messages, many=True).data)
+        return paginated_response(request, chat.messages.all(), ChatMessageSerializer, message_paginator)
 
     serializer = ChatMessageSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -170,13 +229,48 @@ def chat_messages(request, chat_id):
     return Response(ChatMessageSerializer(msg).data, status=status.HTTP_201_CREATED)
 
 
+def _served_by_asgi(request):
+    # DRF's Request proxies Django's; only an ASGIRequest carries the ASGI scope.
+    return getattr(request, 'scope', None) is not None
+
+
+@api_view(['POST'])
+def chat_stream(request, chat_id=None):
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Body must be a JSON object.'}, status=status.HTTP_400_BAD_REQUEST)
+    content = str(request.data.get('content', '')).strip()
+    if not content:
+        return Response({'error': 'Message content is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if chat_id is None:
+        # Saved with the reply (ReplyStream.save), so a failed turn leaves no empty chat.
+        chat = Chat(user=request.user, title=content[:30])
+    else:
+        try:
+            chat = Chat.objects.get(id=chat_id, user=request.user)
+        except Chat.DoesNotExist:
+            return Response({'error': 'Chat not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if chat.archived:
+            archive.restore(chat)
+
+    provider = get_provider(request.user)
+    stream = ReplyStream(chat, content, provider, build_context(chat, content, provider))
+    # ASGI servers need an async iterator to stream without buffering.
+    events = stream.aevents() if _served_by_asgi(request) else stream.events()
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # ─── Memory Views ────────────────────────────────────────────────────────────
 
 @api_view(['GET', 'POST'])
+@cached_collection('memories')
 def memory_list(request):
     if request.method == 'GET':
         memories = Memory.objects.filter(user=request.user)
-        return Response(MemorySerializer(memories, many=True).data)
+        return paginated_response(request, memories, MemorySerializer, memory_paginator)
 
     serializer = MemorySerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -184,13 +278,51 @@ def memory_list(request):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-@api_view(['DELETE'])
+@api_view(['GET'])
+def memory_search(request):
+    query = request.query_params.get('q', '').strip()
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+    except ValueError:
+        return Response({'error': 'limit and offset must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    memories, has_more = search_memories(request.user, query, limit=limit, offset=offset)
+    return Response({
+        'query': query,
+        'results': MemorySerializer(memories, many=True).data,
+        'next_offset': offset + limit if has_more else None,
+    })
+
+
+@api_view(['GET'])
+def memory_similar(request):
+    query = request.query_params.get('q', '').strip()
+    try:
+        k = min(max(int(request.query_params.get('k', 5)), 1), 50)
+    except ValueError:
+        return Response({'error': 'k must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = []
+    for memory, score in (similar_memories(request.user, query, k=k) if query else []):
+        results.append({**MemorySerializer(memory).data, 'score': round(score, 4)})
+    return Response({'query': query, 'results': results})
+
+
+@api_view(['POST'])
+def memory_batch(request):
+    return batch_response(request, Memory, MemorySerializer)
+
+
+@api_view(['GET', 'DELETE'])
 def memory_detail(request, memory_id):
     try:
-        memory = Memory.objects.get(id=memory_id, user=request.user)
+        memory = Memory.objects.select_related('body').get(id=memory_id, user=request.user)
     except Memory.DoesNotExist:
         return Response({'error': 'Memory not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+    if request.method == 'GET':
+        return Response(MemoryDetailSerializer(memory).data)
     memory.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -198,10 +330,11 @@ def memory_detail(request, memory_id):
 # ─── Reminder Views ─────────────────────────────────────────────────────────
 
 @api_view(['GET', 'POST'])
+@cached_collection('reminders')
 def reminder_list(request):
     if request.method == 'GET':
         reminders = Reminder.objects.filter(user=request.user)
-        return Response(ReminderSerializer(reminders, many=True).data)
+        return paginated_response(request, reminders, ReminderSerializer, reminder_paginator)
 
     serializer = ReminderSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
@@ -209,7 +342,38 @@ def reminder_list(request):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-@api_view(['PUT', 'DELETE'])
+@api_view(['POST'])
+def reminder_batch(request):
+    return batch_response(request, Reminder, ReminderSerializer)
+
+
+def due_reminders_response(request, order, **window):
+    try:
+        limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+    except ValueError:
+        return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    # Range scan on reminder_user_due_idx (user, completed, due_at).
+    reminders = Reminder.objects.filter(user=request.user, completed=False, **window).order_by(*order)
+    columns, encode = row_encoder(ReminderSerializer)
+    return Response({'results': encode(reminders.values(*columns)[:limit])})
+
+
+@api_view(['GET'])
+def reminder_upcoming(request):
+    try:
+        days = min(max(int(request.query_params.get('days', 7)), 1), 366)
+    except ValueError:
+        return Response({'error': 'days must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    now = timezone.now()
+    return due_reminders_response(request, ['due_at', 'id'], due_at__gte=now, due_at__lt=now + timedelta(days=days))
+
+
+@api_view(['GET'])
+def reminder_overdue(request):
+    return due_reminders_response(request, ['-due_at', '-id'], due_at__lt=timezone.now())
+
+
+@api_view(['PUT', 'PATCH', 'DELETE'])
 def reminder_detail(request, reminder_id):
     try:
         reminder = Reminder.objects.get(id=reminder_id, user=request.user)
@@ -224,3 +388,117 @@ def reminder_detail(request, reminder_id):
     serializer.is_valid(raise_exception=True)
     serializer.save()
     return Response(serializer.data)
+
+
+# ─── Sync Views ─────────────────────────────────────────────────────────────
+
+@api_view(['GET'])
+def sync_view(request):
+    try:
+        since = max(int(request.query_params.get('since', 0)), 0)
+        limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+    except ValueError:
+        return Response({'error': 'since and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(changes_since(request.user, since=since, limit=limit))
+
+
+# ─── Workspace Export / Import ──────────────────────────────────────────────
+
+def workspace_import_data(transfer):
+    return {
+        'id': transfer.id,
+        'status': transfer.status,
+        'lines': transfer.lines,
+        'counts': transfer.counts,
+        'error': transfer.error,
+        'created_at': transfer.created_at,
+        'updated_at': transfer.updated_at,
+    }
+
+
+@api_view(['GET'])
+def workspace_export(request):
+    """
+    Stream the user's workspace as NDJSON (``?gzip=1`` to compress). After an
+    interrupted download, pass the ``position`` of the last line received as
+    ``?after=`` and append the response to what you have.
+    """
+    after = request.query_params.get('after') or None
+    if after:
+        try:
+            parse_position(after)
+        except WorkspaceError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    chunks = buffered(export_lines(request.user, after=after))
+    filename, content_type = 'workspace.ndjson', 'application/x-ndjson'
+    if request.query_params.get('gzip') in ('1', 'true'):
+        chunks = gzip_chunks(chunks)
+        filename, content_type = filename + '.gz', 'application/gzip'
+    if _served_by_asgi(request):
+        chunks = aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(['POST'])
+def workspace_import(request):
+    """
+    Import an NDJSON export (gzipped or not) sent as the request body. If it
+    is interrupted, send the same file again with ``?resume=<import id>``;
+    lines already imported are skipped.
+    """
+    resume = request.query_params.get('resume')
+    if resume:
+        transfer = WorkspaceImport.objects.filter(
+            id=int(resume) if resume.isdigit() else 0, user=request.user,
+        ).first()
+        if transfer is None:
+            return Response({'error': 'Import not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if transfer.status == WorkspaceImport.DONE:
+            return Response(workspace_import_data(transfer))
+        transfer.status = WorkspaceImport.RUNNING
+    else:
+        transfer = WorkspaceImport.objects.create(user=request.user, source='upload')
+
+    try:
+        import_lines(request.user, read_lines(request.stream or io.BytesIO()), transfer)
+    except WorkspaceError:
+        return Response(workspace_import_data(transfer), status=status.HTTP_400_BAD_REQUEST)
+    return Response(workspace_import_data(transfer), status=status.HTTP_200_OK if resume else status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+def workspace_import_detail(request, import_id):
+    try:
+        transfer = WorkspaceImport.objects.get(id=import_id, user=request.user)
+    except WorkspaceImport.DoesNotExist:
+        return Response({'error': 'Import not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(workspace_import_data(transfer))
+
+
+# ─── Admin ──────────────────────────────────────────────────────────────────
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def provider_cache_view(request):
+    """Provider response cache statistics; DELETE empties the cache."""
+    if request.method == 'DELETE':
+        deleted, _ = ProviderResponse.objects.all().delete()
+        return Response({'deleted': deleted})
+    return Response(provider_cache_stats())
+
+
+# ─── Metrics ────────────────────────────────────────────────────────────────
+
+def metrics_view(request):
+    """Prometheus text exposition of the instrumentation registry."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = settings.DEBUG or request.user.is_staff
+    if not allowed:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,414 @@
+"""
+Workspace export and import as NDJSON.
+
+An export is one JSON object per line: a ``header`` (format version and
+row counts, for progress), then every chat immediately followed by its
+messages, then memories, then reminders, and finally an ``end`` line, so a
+truncated file is detectable. Rows look like Django fixtures:
+``{"type": "memory", "id": 7, "fields": {...}}``, plus ``"chat"`` on messages. Rows are read with ``iterator()`` and written
+as they are read, and an import only has to remember the chat that the
+messages it is reading belong to, so memory use does not grow with the
+size of the workspace.
+
+Every row carries its ``id`` in the exporting database; ``position()`` of
+the last row received is a resume token for ``export_lines(after=...)``.
+Imports create new rows (ids are not preserved) in batches and commit each
+batch together with a ``WorkspaceImport`` checkpoint, so an interrupted
+import is resumed by feeding the same file to the same ``WorkspaceImport``.
+"""
+
+import heapq
+import json
+import zlib
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import blobs
+from .archive import archived_messages
+from .models import Chat, ChatArchive, ChatMessage, Memory, Reminder, SyncCounter, WorkspaceImport
+from .signals import bulk_saved
+
+FORMAT = 'workspace'
+FORMAT_VERSION = 1
+CHUNK_SIZE = 2000
+BATCH_SIZE = 1000
+
+# record type -> (model, exported columns besides id)
+RECORDS = {
+    'chat': (Chat, ('title', 'last_message', 'created_at', 'updated_at')),
+    'message': (ChatMessage, ('role', 'content', 'created_at')),
+    'memory': (Memory, ('title', 'snippet', 'type', 'category', 'created_at', 'updated_at')),
+    'reminder': (Reminder, ('text', 'completed', 'due_date', 'due_at', 'fired_at', 'tag', 'notes',
+                            'created_at', 'updated_at')),
+}
+DATETIME_FIELDS = {'created_at', 'updated_at', 'due_at', 'fired_at'}
+MEMORY_TEXT_COLUMNS = ('preview', 'body__data', 'body__compressed')
+
+
+class WorkspaceError(ValueError):
+    pass
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(record):
+    return json.dumps(record, default=_default, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+END = '{"type":"end"}\n'
+
+
+def counts(user):
+    return {
+        'chat': Chat.objects.filter(user=user).count(),
+        'message': ChatMessage.objects.filter(chat__user=user).count()
+        + (ChatArchive.objects.filter(chat__user=user).aggregate(total=Sum('messages'))['total'] or 0),
+        'memory': Memory.objects.filter(user=user).count(),
+        'reminder': Reminder.objects.filter(user=user).count(),
+    }
+
+
+# ─── Export ─────────────────────────────────────────────────────────────────
+
+def position(record):
+    """Resume token for the row ``record``: ``type:id``, or ``message:chat:id``."""
+    if record['type'] == 'message':
+        return f"message:{record['chat']}:{record['id']}"
+    return f"{record['type']}:{record['id']}"
+
+
+def parse_position(token):
+    """Return ``(type, id, chat)`` for a ``position()`` token."""
+    kind, _, rest = (token or '').partition(':')
+    try:
+        if kind == 'message':
+            chat, _, pk = rest.partition(':')
+            return kind, int(pk), int(chat)
+        if kind in RECORDS:
+            return kind, int(rest), None
+    except ValueError:
+        pass
+    raise WorkspaceError(f'Invalid resume position "{token}".')
+
+
+def _rows(kind, queryset, chunk_size):
+    model, fields = RECORDS[kind]
+    columns = ('id', 'chat_id', *fields) if kind == 'message' else ('id', *fields)
+    if kind == 'memory':
+        # The full text: the preview, or the blob when it is cut short (api.blobs).
+        columns = tuple(c for c in columns if c != 'snippet') + MEMORY_TEXT_COLUMNS
+    for row in queryset.order_by(*(['chat_id', 'id'] if kind == 'message' else ['id'])) \
+            .values(*columns).iterator(chunk_size=chunk_size):
+        record = {'type': kind, 'id': row.pop('id')}
+        if kind == 'message':
+            record['chat'] = row.pop('chat_id')
+        elif kind == 'memory':
+            preview, data, compressed = (row.pop(c) for c in MEMORY_TEXT_COLUMNS)
+            row['snippet'] = preview if data is None else blobs.decode(data, compressed)
+            row = {field: row[field] for field in fields}
+        record['fields'] = row
+        yield record
+
+
+def _archived_rows(archives, chat=None, pk=0):
+    # Messages of archived chats (api.archive), shaped like _rows('message').
+    for chat_id, message_id, role, content, created_at in archived_messages(archives):
+        if chat_id == chat and message_id <= pk:
+            continue
+        yield {'type': 'message', 'id': message_id, 'chat': chat_id,
+               'fields': {'role': role, 'content': content, 'created_at': created_at}}
+
+
+def export_records(user, after=None, chunk_size=CHUNK_SIZE):
+    """Yield ``user``'s rows in export order, starting after the ``position()`` ``after``."""
+    kind, pk, chat = parse_position(after) if after else (None, 0, None)
+    chats = Chat.objects.filter(user=user)
+    messages = ChatMessage.objects.filter(chat__user=user)
+    archives = ChatArchive.objects.filter(chat__user=user)
+    if kind == 'chat':
+        chats, messages = chats.filter(id__gt=pk), messages.filter(chat_id__gte=pk)
+        archives = archives.filter(chat_id__gte=pk)
+    elif kind == 'message':
+        chats = chats.filter(id__gt=chat)
+        messages = messages.filter(Q(chat_id=chat, id__gt=pk) | Q(chat_id__gt=chat))
+        archives = archives.filter(chat_id__gte=chat)
+
+    if kind in (None, 'chat', 'message'):
+        # Merge the two id-ordered streams so each chat's messages follow it.
+        message_rows = heapq.merge(
+            _rows('message', messages, chunk_size),
+            _archived_rows(archives, *((chat, pk) if kind == 'message' else ())),
+            key=lambda record: (record['chat'], record['id']),
+        )
+        pending = next(message_rows, None)
+        for record in _rows('chat', chats, chunk_size):
+            while pending is not None and pending['chat'] < record['id']:
+                # The rest of the chat being resumed.
+                yield pending
+                pending = next(message_rows, None)
+            yield record
+            while pending is not None and pending['chat'] == record['id']:
+                yield pending
+                pending = next(message_rows, None)
+        while pending is not None:
+            yield pending
+            pending = next(message_rows, None)
+
+    memories = Memory.objects.filter(user=user)
+    if kind == 'memory':
+        memories = memories.filter(id__gt=pk)
+    if kind != 'reminder':
+        yield from _rows('memory', memories, chunk_size)
+
+    reminders = Reminder.objects.filter(user=user)
+    if kind == 'reminder':
+        reminders = reminders.filter(id__gt=pk)
+    yield from _rows('reminder', reminders, chunk_size)
+
+
+def export_lines(user, after=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield the NDJSON lines of ``user``'s workspace. A resumed export
+    (``after`` set) omits the header, so it can be appended to the part
+    already received.
+    """
+    if not after:
+        yield header(user)
+    for record in export_records(user, after, chunk_size):
+        yield dumps(record)
+    yield END
+
+
+def header(user):
+    return dumps({
+        'type': 'header', 'format': FORMAT, 'version': FORMAT_VERSION,
+        'exported_at': timezone.now(), 'user': user.email, 'counts': counts(user),
+    })
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def aiterate(chunks):
+    """
+    Async iterator over ``chunks`` for streaming under ASGI, which would
+    otherwise read a sync iterator into memory first. Each step runs on the
+    thread that serves the ORM, where the export's cursors live.
+    """
+    done = object()
+    pull = sync_to_async(next)
+    while (chunk := await pull(chunks, done)) is not done:
+        yield chunk
+
+
+def buffered(lines, size=64 * 1024):
+    """Join lines into chunks of about ``size`` characters for fewer, larger writes."""
+    parts, length = [], 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(parts)
+            parts, length = [], 0
+    if parts:
+        yield ''.join(parts)
+
+
+# ─── Import ─────────────────────────────────────────────────────────────────
+
+def read_lines(stream, size=64 * 1024):
+    """Yield the lines of a binary NDJSON stream, gunzipping it if it is gzipped."""
+    data = stream.read(size)
+    decompressor = zlib.decompressobj(31) if data[:2] == b'\x1f\x8b' else None
+    pending = b''
+    while data:
+        if decompressor is not None:
+            try:
+                chunk = decompressor.decompress(data)
+                while decompressor.eof and decompressor.unused_data:
+                    # Concatenated gzip members, as written by export_workspace.
+                    rest = decompressor.unused_data
+                    decompressor = zlib.decompressobj(31)
+                    chunk += decompressor.decompress(rest)
+            except zlib.error:
+                raise WorkspaceError('The input is not valid gzip.')
+            data = chunk
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+        data = stream.read(size)
+    if pending:
+        yield pending
+
+
+def _parse_record(line, lineno):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise WorkspaceError(f'Line {lineno} is not valid JSON.')
+    if not isinstance(record, dict) or not isinstance(record.get('type'), str):
+        raise WorkspaceError(f'Line {lineno} is not a workspace record.')
+    return record
+
+
+def _build(kind, record, lineno, **extra):
+    """Return an unsaved ``kind`` object for ``record`` and its exported timestamps."""
+    model, fields = RECORDS[kind]
+    data = record.get('fields')
+    if not isinstance(data, dict):
+        raise WorkspaceError(f'Line {lineno}: "fields" must be an object.')
+    values = {}
+    for field in fields:
+        if field not in data:
+            continue
+        value = data[field]
+        if field in DATETIME_FIELDS and value is not None:
+            value = parse_datetime(str(value))
+            if value is None:
+                raise WorkspaceError(f'Line {lineno}: invalid {field}.')
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+        values[field] = value
+    if not isinstance(values.get('snippet', ''), str):
+        raise WorkspaceError(f'Line {lineno}: invalid snippet.')
+    stamps = {field: values.pop(field) for field in ('created_at', 'updated_at') if values.get(field)}
+    return model(**values, **extra), stamps
+
+
+def _apply(user, transfer, batch, lineno):
+    """Write one batch of parsed records and advance ``transfer`` to ``lineno``, atomically."""
+    built = {kind: [] for kind in RECORDS}
+    threads = []  # (chat or message, its chat's id in the file, line) in file order
+    for record, record_line in batch:
+        kind = record['type']
+        obj, stamps = _build(kind, record, record_line, **({} if kind == 'message' else {'user': user}))
+        built[kind].append((obj, stamps))
+        if kind == 'chat':
+            threads.append((obj, record.get('id'), record_line))
+        elif kind == 'message':
+            threads.append((obj, record.get('chat'), record_line))
+
+    now = timezone.now()
+    for reminder, _ in built['reminder']:
+        if reminder.due_at and reminder.due_at <= now and reminder.fired_at is None and not reminder.completed:
+            # Already past when imported: do not fire retroactively.
+            reminder.fired_at = reminder.due_at
+
+    objects = {kind: [obj for obj, _ in rows] for kind, rows in built.items()}
+    try:
+        _write(user, transfer, built, objects, threads, lineno)
+    except (DatabaseError, TypeError, ValidationError) as exc:
+        raise WorkspaceError(f'Lines {batch[0][1]}-{lineno}: {exc}')
+
+
+def _write(user, transfer, built, objects, threads, lineno):
+    with transaction.atomic():
+        synced = objects['chat'] + objects['memory'] + objects['reminder']
+        if synced:
+            version = SyncCounter.reserve(user.pk, len(synced))
+            for i, obj in enumerate(synced):
+                obj.version = version + i
+
+        Chat.objects.bulk_create(objects['chat'])
+        for obj, source_chat, record_line in threads:
+            if isinstance(obj, Chat):
+                transfer.source_chat_id, transfer.chat_id = source_chat, obj.pk
+            elif transfer.chat_id and source_chat == transfer.source_chat_id:
+                obj.chat_id = transfer.chat_id
+            else:
+                raise WorkspaceError(f'Line {record_line}: message for chat {source_chat}, which does not precede it.')
+        ChatMessage.objects.bulk_create(objects['message'])
+        Memory.prepare_bulk_write(objects['memory'])
+        Memory.objects.bulk_create(objects['memory'])
+        Reminder.objects.bulk_create(objects['reminder'])
+
+        # bulk_create stamps auto_now(_add) fields with the current time;
+        # put the exported timestamps back.
+        for kind, rows in built.items():
+            restamped = []
+            for obj, stamps in rows:
+                if stamps:
+                    for field, value in stamps.items():
+                        setattr(obj, field, value)
+                    restamped.append(obj)
+            if restamped:
+                fields = ['created_at'] if kind == 'message' else ['created_at', 'updated_at']
+                RECORDS[kind][0].objects.bulk_update(restamped, fields)
+
+        for kind, rows in objects.items():
+            transfer.counts[kind] = transfer.counts.get(kind, 0) + len(rows)
+        transfer.lines = lineno
+        transfer.save()
+
+        for model, kind in ((Chat, 'chat'), (Memory, 'memory'), (Reminder, 'reminder')):
+            if objects[kind]:
+                bulk_saved.send(sender=model, instances=objects[kind], created=objects[kind])
+
+
+def import_lines(user, lines, transfer, batch_size=BATCH_SIZE, progress=None):
+    """
+    Import the NDJSON ``lines`` (str or bytes) into ``user``'s workspace,
+    skipping the ``transfer.lines`` already applied, and return ``transfer``.
+    ``progress(transfer)`` is called after every batch.
+
+    Raises ``WorkspaceError`` for bad input, which fails ``transfer``, or
+    for input that stops before the end record, which leaves it resumable.
+    """
+    batch, lineno, ended = [], 0, False
+    try:
+        for lineno, line in enumerate(lines, 1):
+            if lineno <= transfer.lines or not line.strip():
+                continue
+            if ended:
+                raise WorkspaceError(f'Line {lineno}: data after the end record.')
+            record = _parse_record(line, lineno)
+            kind = record['type']
+            if kind == 'header':
+                if record.get('format') != FORMAT or record.get('version') != FORMAT_VERSION:
+                    raise WorkspaceError(f'Unsupported export format {record.get("format")!r} '
+                                         f'version {record.get("version")!r}.')
+            elif kind == 'end':
+                ended = True
+            elif kind in RECORDS:
+                batch.append((record, lineno))
+            else:
+                raise WorkspaceError(f'Line {lineno}: unknown record type {kind!r}.')
+            if len(batch) >= batch_size:
+                _apply(user, transfer, batch, lineno)
+                batch = []
+                if progress:
+                    progress(transfer)
+        if batch:
+            _apply(user, transfer, batch, lineno)
+    except WorkspaceError as exc:
+        transfer.status, transfer.error = WorkspaceImport.FAILED, str(exc)
+        transfer.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    if not ended:
+        transfer.error = 'The export ends before its end record; resume with the rest of it.'
+        transfer.save(update_fields=['error', 'updated_at'])
+        raise WorkspaceError(transfer.error)
+    transfer.lines = max(transfer.lines, lineno)
+    transfer.status, transfer.error = WorkspaceImport.DONE, ''
+    transfer.save()
+    if progress:
+        progress(transfer)
+    return transfer
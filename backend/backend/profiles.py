@@ -0,0 +1,29 @@
+"""
+Startup profiles: which settings module a process loads.
+
+``APP_PROFILE`` selects one when ``DJANGO_SETTINGS_MODULE`` is not set:
+
+- ``web`` (default): everything, for ``runserver`` and the WSGI/ASGI servers.
+- ``worker``: job workers (``run_jobs``); no admin, static files, messages,
+  CORS, middleware or URLconf, and no query log.
+- ``cli``: one-off and cron commands (``seed_data``, ``archive_chats``,
+  ``export_workspace``...); the worker's app list for short-lived processes.
+
+Run ``manage.py import_report --profile web,worker,cli`` to compare them.
+"""
+
+import os
+
+PROFILES = {
+    'web': 'backend.settings',
+    'worker': 'backend.settings_worker',
+    'cli': 'backend.settings_cli',
+}
+
+
+def settings_module(profile=None):
+    profile = profile or os.environ.get('APP_PROFILE', 'web')
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f'Unknown APP_PROFILE "{profile}"; expected one of {", ".join(PROFILES)}.') from None
@@ -2,6 +2,8 @@
 Django settings for backend project.
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -10,6 +12,9 @@ SECRET_KEY = 'django-insecure-og-=5p#_c+6rb0sn(=1y)@0vlx)k*3%*$enk$vsz=qq8w^^^e5
 
 DEBUG = True
 
+# Startup profile (backend.profiles); settings_worker and settings_cli override it.
+APP_PROFILE = 'web'
+
 ALLOWED_HOSTS = ['*']
 
 INSTALLED_APPS = [
@@ -34,6 +39,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.InstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -55,20 +61,81 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'postgres',
-        'USER': 'postgres.zqqupyyfiabrqxamgept',
-        'PASSWORD': 'Raki@512141',
-        'HOST': 'aws-0-ap-southeast-1.pooler.supabase.com',
-        'PORT': '6543',
-        'OPTIONS': {
-            'sslmode': 'require',
-            'connect_timeout': 30,
-        },
+# Database: DB_BACKEND=postgres (default, Supabase via its PgBouncer pooler)
+# or DB_BACKEND=sqlite for offline development and load testing.
+DB_BACKEND = os.environ.get('DB_BACKEND', 'postgres')
+
+if DB_BACKEND == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # WAL lets readers run alongside the single writer;
+                # IMMEDIATE transactions take the write lock up front instead
+                # of failing with "database is locked" on upgrade.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'postgres'),
+            'USER': os.environ.get('DB_USER', 'postgres.zqqupyyfiabrqxamgept'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', 'Raki@512141'),
+            'HOST': os.environ.get('DB_HOST', 'aws-0-ap-southeast-1.pooler.supabase.com'),
+            'PORT': os.environ.get('DB_PORT', '6543'),
+            # Reuse connections across requests instead of paying a TLS
+            # handshake per request; health checks drop connections the
+            # pooler has closed before they are handed to a view. Under ASGI
+            # this has no effect (Django does not reuse connections across
+            # async requests); use DB_POOL=1 there.
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 300)),
+            'CONN_HEALTH_CHECKS': True,
+            # Port 6543 is PgBouncer in transaction mode: named server-side
+            # cursors do not survive across transactions there.
+            'DISABLE_SERVER_SIDE_CURSORS': True,
+            'OPTIONS': {
+                'sslmode': 'require',
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 30)),
+                'keepalives': 1,
+                'keepalives_idle': 30,
+            },
+        }
+    }
+    if importlib.util.find_spec('psycopg'):
+        # psycopg 3 prepares statements server-side after a few executions,
+        # which a transaction pooler cannot route back to the same backend.
+        DATABASES['default']['OPTIONS']['prepare_threshold'] = None
+        if os.environ.get('DB_POOL') == '1':
+            try:
+                from psycopg_pool import ConnectionPool
+            except ImportError as exc:
+                from django.core.exceptions import ImproperlyConfigured
+
+                raise ImproperlyConfigured(
+                    'DB_POOL=1 needs the psycopg_pool package: pip install "psycopg[pool]"'
+                ) from exc
+
+            # In-process pool (psycopg_pool); Django requires CONN_MAX_AGE=0
+            # because the pool, not the request cycle, owns the connections.
+            DATABASES['default']['CONN_MAX_AGE'] = 0
+            DATABASES['default']['OPTIONS']['pool'] = {
+                'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                'check': ConnectionPool.check_connection,
+            }
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -76,6 +143,20 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'api.User'
 
+# Session logins resolve their user through the authentication cache
+# (api.authentication); sessions created under the stock ModelBackend sign in
+# again once. The cache only runs with a shared cache backend (CACHE_URL
+# below), which carries its invalidations; AUTH_CACHE_TTL=0 turns it off.
+AUTHENTICATION_BACKENDS = ['api.authentication.CachedModelBackend']
+AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', 300))
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', 10000))
+
+# Where sessions live: db (default), cache, cached_db, or signed_cookies,
+# which keeps the session in a signed cookie and skips the session-table
+# query. Signed-cookie sessions cannot be revoked server-side before they
+# expire, except by a password change.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get('SESSION_BACKEND', 'db')
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -92,10 +173,123 @@ CORS_ALLOW_CREDENTIALS = True
 # DRF
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
+if importlib.util.find_spec('orjson'):
+    # Same bytes as DRF's JSONRenderer, several times faster (api.renderers).
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+
+# AI providers: name -> provider class. Users pick one via settings.ai_provider;
+# unknown names fall back to the default.
+AI_PROVIDERS = {
+    'stub': 'api.providers.StubProvider',
+    'fake': 'api.providers.FakeProvider',
+}
+AI_DEFAULT_PROVIDER = os.environ.get('AI_DEFAULT_PROVIDER', 'stub')
+AI_STUB_DELAY = float(os.environ.get('AI_STUB_DELAY', 0))
+# The fake provider simulates a hosted model's latency: seconds before the
+# first word and between words.
+AI_FAKE_LATENCY = float(os.environ.get('AI_FAKE_LATENCY', 0.5))
+AI_FAKE_TOKEN_LATENCY = float(os.environ.get('AI_FAKE_TOKEN_LATENCY', 0.01))
+
+# Provider response cache (api.provider_cache): entry lifetime, LRU bound and
+# how long a coalesced call waits on the in-flight one before calling upstream.
+AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', '1') == '1'
+AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 86400))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 10000))
+AI_CACHE_WAIT = 120
+
+# Chats idle this long have their messages moved to compressed archives by
+# `manage.py archive_chats` (api.archive); opening one restores them.
+CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', 90))
+
+# Memory rows keep a preview of this many characters; longer texts are stored
+# once per distinct text in MemoryBlob, zlib-compressed above the byte
+# threshold (api.blobs).
+MEMORY_PREVIEW_CHARS = int(os.environ.get('MEMORY_PREVIEW_CHARS', 280))
+MEMORY_BLOB_COMPRESS_OVER = int(os.environ.get('MEMORY_BLOB_COMPRESS_OVER', 512))
+
+# `manage.py export_schema_sql` (api.schema_sql) renders migrations offline for
+# this PostgreSQL major version and caches each migration's SQL here.
+# Migrations running Python are marked in the script as needing `migrate`
+# (or fail the render with --strict), except SCHEMA_SQL_DATA_MIGRATIONS: data
+# migrations with nothing to do on a new database, and api.0002, whose search
+# index the script installs after the last migration.
+SCHEMA_SQL_POSTGRES_VERSION = int(os.environ.get('SCHEMA_SQL_POSTGRES_VERSION', 17))
+SCHEMA_SQL_CACHE_DIR = os.environ.get('SCHEMA_SQL_CACHE_DIR', str(BASE_DIR / '.schema_sql_cache'))
+SCHEMA_SQL_DATA_MIGRATIONS = [
+    ('auth', '0011_update_proxy_permissions'),
+    ('api', '0002_memory_search_index'),
+    ('api', '0004_sync_versions'),
+    ('api', '0013_memory_blobs'),
+    ('api', '0014_memory_search_text'),
+]
+
+# Chat prompt budgets in tokens (api.context): recent-message window, rolling
+# summary and injected memories, plus how many memories to consider.
+CHAT_WINDOW_TOKENS = 3000
+CHAT_SUMMARY_TOKENS = 600
+CHAT_MEMORY_TOKENS = 400
+CHAT_MEMORY_COUNT = 3
+
+# Semantic memory recall: embedder class and where per-user vector indexes live.
+MEMORY_EMBEDDER = 'api.vectors.HashingEmbedder'
+VECTOR_INDEX_DIR = BASE_DIR / 'vector_index'
+
+# Cache: process-local by default. Point CACHE_URL at Redis (or any
+# Redis-compatible server) when running more than one worker process, so
+# API cache invalidations reach every worker.
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'api',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+API_CACHE_TTL = int(os.environ.get('API_CACHE_TTL', 300))
+
+# Real-time push (api.realtime): a WebSocket at REALTIME_PATH under ASGI.
+# The local broadcaster only reaches sockets in the same process; with
+# several processes, or run_jobs workers writing, set REALTIME_REDIS_URL
+# (requires the redis package) to fan events out through Redis pub/sub.
+REALTIME_PATH = '/ws/'
+REALTIME_REDIS_URL = os.environ.get('REALTIME_REDIS_URL', '')
+REALTIME_BROADCASTER = (
+    'api.realtime.RedisBroadcaster' if REALTIME_REDIS_URL else 'api.realtime.LocalBroadcaster'
+)
+REALTIME_QUEUE_SIZE = 256
+REALTIME_MAX_BATCH = 100
+REALTIME_AUTH_TIMEOUT = 10
+
+# Background jobs (api.jobs). Requests only queue embeddings, titles and other
+# deferred work; `manage.py run_jobs` workers run it with retries, backoff and
+# per-kind concurrency caps. JOBS_EAGER=1 runs due jobs in-process after
+# commit instead, with none of those; it is only the default for the web
+# profile under DEBUG (runserver and the test runner). Workers and commands
+# always queue unless JOBS_EAGER=1 (settings_worker).
+JOBS_EAGER = os.environ.get('JOBS_EAGER', '1' if DEBUG else '0') == '1'
+
+# Instrumentation: every request reports Server-Timing and feeds /metrics.
+# /metrics needs METRICS_TOKEN as a bearer token when set, otherwise a staff
+# session (or DEBUG). PROFILE_SLOW_MS > 0 profiles a PROFILE_SAMPLE_RATE share
+# of requests and keeps cProfile dumps of the slow ones in PROFILE_DIR.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+PROFILE_SLOW_MS = int(os.environ.get('PROFILE_SLOW_MS', 0))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1))
+PROFILE_DIR = BASE_DIR / 'profiles'
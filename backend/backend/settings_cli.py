@@ -0,0 +1,15 @@
+"""
+Settings for one-off and cron commands (``APP_PROFILE=cli``, see
+``backend.profiles``): the worker's lean app list, for processes that run
+one command and exit.
+"""
+
+from .settings_worker import *  # noqa: F401,F403
+from .settings_worker import DATABASES
+
+APP_PROFILE = 'cli'
+
+# One connection for the life of the process: nothing to keep alive between
+# requests, and no health-check round trip before reusing it.
+DATABASES['default']['CONN_MAX_AGE'] = 0
+DATABASES['default']['CONN_HEALTH_CHECKS'] = False
@@ -0,0 +1,35 @@
+"""
+Settings for job workers (``APP_PROFILE=worker``, see ``backend.profiles``).
+
+The web settings without what only serves HTTP: a worker starts faster, and
+the system checks every command runs no longer import the URLconf and with it
+every view, DRF and the admin.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS
+
+APP_PROFILE = 'worker'
+
+# Long-running: do not keep every query in connection.queries.
+DEBUG = False
+# Queue jobs for the workers rather than running them in this process.
+JOBS_EAGER = os.environ.get('JOBS_EAGER', '0') == '1'
+
+WEB_ONLY_APPS = {
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'corsheaders',
+    # Only the browsable API's templates and tags; serializers and
+    # rest_framework.authtoken work without it.
+    'rest_framework',
+}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in WEB_ONLY_APPS]
+MIDDLEWARE = []
+ROOT_URLCONF = None
+# Workers render no pages; without an engine the checks skip loading every
+# app's template tag libraries.
+TEMPLATES = []
@@ -6,7 +6,10 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    from backend.profiles import settings_module
+
+    # APP_PROFILE=worker or cli loads leaner settings (see backend/profiles.py).
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module())
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc: